@@ -8,20 +8,16 @@ import numpy as np
 import joblib
 from datetime import datetime
 
+from wine_quality import registry
+from wine_quality.compiled import load_compiled_model
+from wine_quality.data import load_wine_frame
+
 def load_data():
     """Загрузка и объединение данных о винах"""
     print("📊 Загрузка данных...")
     
-    # Загрузка красных вин
-    red_wine = pd.read_csv('data/winequality-red.csv', delimiter=';')
-    red_wine['wine_type_red'] = 1
-    
-    # Загрузка белых вин
-    white_wine = pd.read_csv('data/winequality-white.csv', delimiter=';')
-    white_wine['wine_type_red'] = 0
-    
-    # Объединение данных
-    wine_data = pd.concat([red_wine, white_wine], ignore_index=True)
+    # Объединенные красные и белые вина из колоночного кэша
+    wine_data = load_wine_frame()
     
     # Стандартизация названий колонок
     wine_data.columns = [col.replace(' ', '_').lower() for col in wine_data.columns]
@@ -132,10 +128,16 @@ def test_predictions(examples):
     print("\n🔮 Тестирование предсказаний модели...")
     
     try:
-        # Загрузка модели и скейлера
-        model = joblib.load('models/best_wine_model.pkl')
-        scaler = joblib.load('models/scaler.pkl')
-        print("✅ Модель и скейлер загружены")
+        # Загрузка активной версии: скомпилированная модель уже содержит скейлер
+        _, model_dir = registry.active_model_dir('models')
+        if (model_dir / registry.COMPILED_DIRNAME).is_dir():
+            model = load_compiled_model(model_dir / registry.COMPILED_DIRNAME)
+            scaler = None
+            print("✅ Модель со вложенным скейлером загружена")
+        else:
+            model = joblib.load(model_dir / registry.MODEL_FILENAME)
+            scaler = joblib.load(model_dir / registry.SCALER_FILENAME)
+            print("✅ Модель и скейлер загружены")
         
         results = {}
         
@@ -152,18 +154,20 @@ def test_predictions(examples):
                 wine_data['wine_type_red']
             ]
             
-            # Масштабирование
-            features_scaled = scaler.transform([features])
+            # Масштабирование (не нужно, если скейлер вложен в модель)
+            features = np.array([features], dtype=np.float64)
+            if scaler is not None:
+                features = scaler.transform(features)
             
-            # Предсказание
-            prediction = model.predict(features_scaled)[0]
-            probabilities = model.predict_proba(features_scaled)[0]
+            # Предсказание: один вызов predict_proba, метка по argmax
+            probabilities = model.predict_proba(features)[0]
+            prediction = model.classes_[probabilities.argmax()]
             confidence = max(probabilities)
             
             results[wine_type] = {
                 'prediction': int(prediction),
                 'confidence': float(confidence),
-                'probabilities': {str(i+3): float(prob) for i, prob in enumerate(probabilities)}
+                'probabilities': {str(cls): float(prob) for cls, prob in zip(model.classes_, probabilities)}
             }
             
             print(f"   📊 Предсказанное качество: {prediction} баллов")
@@ -1,64 +1,36 @@
-from flask import Flask, request, jsonify, render_template
+from flask import Flask, g, request, render_template, stream_with_context
 from flask_cors import CORS
-import joblib
-import numpy as np
-import pandas as pd
-import logging
-from datetime import datetime
-import os
+from pathlib import Path
+import sys
+
+# Добавляем корневую директорию в путь
+root_dir = Path(__file__).parent.parent
+sys.path.append(str(root_dir))
+
+# Модель, статистика датасета и обработчики эндпоинтов общие с ASGI приложением
+from api import service
 
 app = Flask(__name__)
 CORS(app)
 
-# Настройка логирования
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
+def json_response(payload, status=200):
+    """JSON ответ, сериализованный кодеком сервиса (вместо jsonify)"""
+    body = payload if isinstance(payload, bytes) else service.codec.dumps(payload)
+    return app.response_class(body, status=status, mimetype='application/json')
 
-# Загрузка модели и скейлера
-MODEL_PATH = 'models/best_wine_model.pkl'
-SCALER_PATH = 'models/scaler.pkl'
-DATA_PATH_RED = 'data/winequality-red.csv'
-DATA_PATH_WHITE = 'data/winequality-white.csv'
+@app.before_request
+def start_request_timer():
+    """Отсчет времени запроса для /metrics"""
+    g.timer = service.RequestTimer(request.url_rule.rule if request.url_rule else 'unmatched')
 
-try:
-    model = joblib.load(MODEL_PATH)
-    scaler = joblib.load(SCALER_PATH)
-    
-    # Загрузка данных о винах
-    red_wines = pd.read_csv(DATA_PATH_RED, sep=';')
-    white_wines = pd.read_csv(DATA_PATH_WHITE, sep=';')
-    
-    # Добавляем тип вина
-    red_wines['wine_type_red'] = 1
-    white_wines['wine_type_red'] = 0
-    
-    # Объединяем данные
-    all_wines = pd.concat([red_wines, white_wines], ignore_index=True)
-    
-    # Переименовываем колонки для соответствия модели
-    column_mapping = {
-        'fixed acidity': 'fixed_acidity',
-        'volatile acidity': 'volatile_acidity',
-        'citric acid': 'citric_acid',
-        'residual sugar': 'residual_sugar',
-        'free sulfur dioxide': 'free_sulfur_dioxide',
-        'total sulfur dioxide': 'total_sulfur_dioxide'
-    }
-    all_wines = all_wines.rename(columns=column_mapping)
-    
-    logger.info("Модель, скейлер и данные о винах успешно загружены")
-except Exception as e:
-    logger.error(f"Ошибка загрузки модели или данных: {e}")
-    model = None
-    scaler = None
-    all_wines = None
-
-# Список признаков модели
-FEATURE_NAMES = [
-    'fixed_acidity', 'volatile_acidity', 'citric_acid', 'residual_sugar',
-    'chlorides', 'free_sulfur_dioxide', 'total_sulfur_dioxide', 'density',
-    'pH', 'sulphates', 'alcohol', 'wine_type_red'
-]
+@app.after_request
+def record_request_time(response):
+    """Полное время запроса записывается после отправки тела (в том числе потокового)"""
+    timer = g.pop('timer', None)
+    if timer is not None:
+        status = response.status_code
+        response.call_on_close(lambda: timer.finish(status))
+    return response
 
 @app.route('/')
 def home():
@@ -68,191 +40,89 @@ def home():
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Проверка состояния сервиса"""
-    status = "healthy" if model is not None else "unhealthy"
-    return jsonify({
-        'status': status,
-        'timestamp': datetime.now().isoformat(),
-        'model_loaded': model is not None
-    })
+    return json_response(service.health())
+
+@app.route('/api/ready', methods=['GET'])
+def ready():
+    """Готовность принимать трафик: модель загружена и путь запроса прогрет"""
+    return json_response(*service.readiness())
 
 @app.route('/api/predict', methods=['POST'])
 def predict():
     """Эндпоинт для предсказания качества вина"""
-    try:
-        if model is None:
-            return jsonify({'error': 'Модель не загружена'}), 500
-        
-        # Получение данных из запроса
-        data = request.get_json()
-        
-        if not data:
-            return jsonify({'error': 'Нет данных в запросе'}), 400
-        
-        # Проверка наличия всех необходимых признаков
-        missing_features = [f for f in FEATURE_NAMES if f not in data]
-        if missing_features:
-            return jsonify({
-                'error': f'Отсутствуют признаки: {missing_features}'
-            }), 400
-        
-        # Подготовка данных для предсказания
-        features = np.array([data[f] for f in FEATURE_NAMES]).reshape(1, -1)
-        
-        # Масштабирование признаков
-        features_scaled = scaler.transform(features)
-        
-        # Предсказание
-        prediction = model.predict(features_scaled)[0]
-        prediction_proba = model.predict_proba(features_scaled)[0]
-        
-        # Получение вероятностей для каждого класса
-        classes = model.classes_
-        probabilities = {str(cls): float(prob) for cls, prob in zip(classes, prediction_proba)}
-        
-        result = {
-            'prediction': int(prediction),
-            'confidence': float(max(prediction_proba)),
-            'probabilities': probabilities,
-            'timestamp': datetime.now().isoformat()
-        }
-        
-        logger.info(f"Предсказание выполнено: {prediction}")
-        return jsonify(result)
-        
-    except Exception as e:
-        logger.error(f"Ошибка при предсказании: {e}")
-        return jsonify({'error': str(e)}), 500
+    body = request.get_data()
+    g.timer.lap('read_body')
+    return json_response(*service.predict_json(body, request.is_json, g.timer))
 
 @app.route('/api/predict/batch', methods=['POST'])
 def predict_batch():
     """Эндпоинт для пакетного предсказания"""
-    try:
-        if model is None:
-            return jsonify({'error': 'Модель не загружена'}), 500
-        
-        data = request.get_json()
-        
-        if not data or 'samples' not in data:
-            return jsonify({'error': 'Нет данных для пакетного предсказания'}), 400
-        
-        samples = data['samples']
-        if not isinstance(samples, list):
-            return jsonify({'error': 'samples должен быть списком'}), 400
-        
-        results = []
-        
-        for i, sample in enumerate(samples):
-            try:
-                # Проверка наличия всех необходимых признаков
-                missing_features = [f for f in FEATURE_NAMES if f not in sample]
-                if missing_features:
-                    results.append({
-                        'index': i,
-                        'error': f'Отсутствуют признаки: {missing_features}'
-                    })
-                    continue
-                
-                # Подготовка данных
-                features = np.array([sample[f] for f in FEATURE_NAMES]).reshape(1, -1)
-                features_scaled = scaler.transform(features)
-                
-                # Предсказание
-                prediction = model.predict(features_scaled)[0]
-                prediction_proba = model.predict_proba(features_scaled)[0]
-                
-                results.append({
-                    'index': i,
-                    'prediction': int(prediction),
-                    'confidence': float(max(prediction_proba))
-                })
-                
-            except Exception as e:
-                results.append({
-                    'index': i,
-                    'error': str(e)
-                })
-        
-        return jsonify({
-            'results': results,
-            'timestamp': datetime.now().isoformat()
-        })
-        
-    except Exception as e:
-        logger.error(f"Ошибка при пакетном предсказании: {e}")
-        return jsonify({'error': str(e)}), 500
+    body = request.get_data()
+    g.timer.lap('read_body')
+    if request.mimetype == service.BINARY_CONTENT_TYPE:
+        body, status, content_type = service.predict_batch_binary(body, g.timer)
+        return app.response_class(body, status=status, content_type=content_type)
+    return json_response(*service.predict_batch_json(body, request.is_json, g.timer))
+
+@app.route('/api/predict/stream', methods=['POST'])
+def predict_stream():
+    """Потоковое предсказание: NDJSON или CSV на входе, NDJSON на выходе"""
+    error = service.stream_error(request.mimetype)
+    if error is not None:
+        payload, status = error
+        return json_response(payload, status)
+    
+    timer = g.timer
+
+    def generate():
+        # Тело читается блоками и оценивается порциями, результаты уходят клиенту сразу
+        stream = service.PredictionStream(request.mimetype, timer=timer)
+        try:
+            while True:
+                block = request.stream.read(service.STREAM_READ_BYTES)
+                if not block:
+                    break
+                output = stream.feed(block)
+                if output:
+                    yield output
+            yield stream.finish()
+        except Exception as e:
+            yield service.stream_failure(e)
+    
+    return app.response_class(stream_with_context(generate()), mimetype='application/x-ndjson')
 
 @app.route('/api/features', methods=['GET'])
 def get_features():
     """Получение списка признаков модели"""
-    return jsonify({
-        'features': FEATURE_NAMES,
-        'feature_descriptions': {
-            'fixed_acidity': 'Фиксированная кислотность (g/L)',
-            'volatile_acidity': 'Летучая кислотность (g/L)',
-            'citric_acid': 'Лимонная кислота (g/L)',
-            'residual_sugar': 'Остаточный сахар (g/L)',
-            'chlorides': 'Хлориды (g/L)',
-            'free_sulfur_dioxide': 'Свободный диоксид серы (mg/L)',
-            'total_sulfur_dioxide': 'Общий диоксид серы (mg/L)',
-            'density': 'Плотность (g/mL)',
-            'pH': 'Уровень pH',
-            'sulphates': 'Сульфаты (g/L)',
-            'alcohol': 'Содержание алкоголя (%)',
-            'wine_type_red': 'Тип вина (1 - красное, 0 - белое)'
-        }
-    })
+    return json_response(service.features_info())
+
+@app.route('/api/admin/model', methods=['GET'])
+def model_info():
+    """Активная версия модели и время ее загрузки в этом воркере"""
+    return json_response(service.model_info())
+
+@app.route('/api/drift', methods=['GET'])
+def drift():
+    """Доля входов вне распределения и дрейф признаков за скользящее окно"""
+    return json_response(*service.drift_summary())
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Метрики всех воркеров в формате Prometheus"""
+    return app.response_class(service.render_metrics(), content_type=service.METRICS_CONTENT_TYPE)
 
 @app.route('/api/best-worst-wines', methods=['GET'])
 def get_best_worst_wines():
     """Получение лучшего и худшего вина из датасета"""
-    try:
-        if all_wines is None:
-            return jsonify({'error': 'Данные о винах не загружены'}), 500
-        
-        # Находим лучшее и худшее вино по качеству
-        best_wine = all_wines.loc[all_wines['quality'].idxmax()]
-        worst_wine = all_wines.loc[all_wines['quality'].idxmin()]
-        
-        def wine_to_dict(wine_series):
-            wine_dict = wine_series.to_dict()
-            return {
-                'quality': int(wine_dict['quality']),
-                'wine_type': 'Красное' if wine_dict['wine_type_red'] == 1 else 'Белое',
-                'characteristics': {
-                    'fixed_acidity': float(wine_dict['fixed_acidity']),
-                    'volatile_acidity': float(wine_dict['volatile_acidity']),
-                    'citric_acid': float(wine_dict['citric_acid']),
-                    'residual_sugar': float(wine_dict['residual_sugar']),
-                    'chlorides': float(wine_dict['chlorides']),
-                    'free_sulfur_dioxide': float(wine_dict['free_sulfur_dioxide']),
-                    'total_sulfur_dioxide': float(wine_dict['total_sulfur_dioxide']),
-                    'density': float(wine_dict['density']),
-                    'pH': float(wine_dict['pH']),
-                    'sulphates': float(wine_dict['sulphates']),
-                    'alcohol': float(wine_dict['alcohol'])
-                }
-            }
-        
-        # Также найдем статистику
-        quality_stats = {
-            'min_quality': int(all_wines['quality'].min()),
-            'max_quality': int(all_wines['quality'].max()),
-            'avg_quality': float(all_wines['quality'].mean()),
-            'total_wines': len(all_wines),
-            'red_wines': len(all_wines[all_wines['wine_type_red'] == 1]),
-            'white_wines': len(all_wines[all_wines['wine_type_red'] == 0])
-        }
-        
-        return jsonify({
-            'best_wine': wine_to_dict(best_wine),
-            'worst_wine': wine_to_dict(worst_wine),
-            'statistics': quality_stats,
-            'timestamp': datetime.now().isoformat()
-        })
-        
-    except Exception as e:
-        logger.error(f"Ошибка при получении лучшего/худшего вина: {e}")
-        return jsonify({'error': str(e)}), 500
+    body, etag, error = service.best_worst_wines()
+    if error is not None:
+        return json_response(error, 500)
+    
+    # Ответ уже сериализован; при совпадении If-None-Match вернется 304 без тела
+    response = app.response_class(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
 
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=5001)
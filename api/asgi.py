@@ -0,0 +1,338 @@
+"""
+Асинхронное ASGI приложение сервиса предсказания качества вина
+
+Эндпоинты и форматы ответов те же, что у Flask приложения (api/app.py), обработчики
+общие (api/service.py). Соединения обслуживает цикл событий, поэтому медленные
+клиенты и загрузка больших пакетов не занимают процесс целиком: тело запроса
+читается асинхронно, а разбор JSON, инференс и сериализация ответа выполняются
+в ограниченном пуле потоков. Если в пуле уже ASGI_MAX_PENDING задач (каждый
+незавершенный поток предсказаний считается одной), запрос сразу получает 503
+вместо бесконечной очереди.
+
+Запуск:
+    uvicorn api.asgi:app --host 0.0.0.0 --port 5000 --workers 4
+"""
+
+import asyncio
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from pathlib import Path
+
+# Добавляем корневую директорию в путь
+root_dir = Path(__file__).parent.parent
+sys.path.append(str(root_dir))
+
+from api import service
+
+# Потоки для CPU-задач и предел задач в работе и в очереди пула
+SCORING_THREADS = int(os.environ.get('ASGI_SCORING_THREADS', 4))
+MAX_PENDING = int(os.environ.get('ASGI_MAX_PENDING', 1024))
+MAX_BODY_BYTES = int(os.environ.get('ASGI_MAX_BODY_BYTES', 64 * 1024 * 1024))
+
+executor = ThreadPoolExecutor(max_workers=SCORING_THREADS, thread_name_prefix='scoring')
+_pending = 0
+
+CORS_HEADERS = [
+    (b'access-control-allow-origin', b'*'),
+]
+
+
+def encode_json(payload):
+    """Сериализация кодеком сервиса (отсортированные ключи, как у jsonify во Flask)"""
+    return service.codec.dumps(payload)
+
+
+def _is_json(headers):
+    """Тело запроса объявлено как JSON (как request.get_json во Flask)"""
+    content_type = headers.get(b'content-type', b'').split(b';')[0].strip().lower()
+    return content_type == b'application/json' or (
+        content_type.startswith(b'application/') and content_type.endswith(b'+json')
+    )
+
+
+def _content_type(headers):
+    """Тип тела запроса без параметров"""
+    return headers.get(b'content-type', b'').split(b';')[0].strip().lower().decode('latin-1')
+
+
+def _etag_matches(if_none_match, etag):
+    """Совпадение If-None-Match с ETag ответа (слабое сравнение)"""
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if candidate == '*' or candidate.removeprefix('W/') == f'"{etag}"':
+            return True
+    return False
+
+
+def _handle_json(handler, body, headers, timer):
+    """Разбор тела, вызов обработчика сервиса и сериализация ответа (в пуле потоков)"""
+    timer.lap('queue_wait')
+    payload, status = handler(body, _is_json(headers), timer)
+    return payload, status, 'application/json'
+
+
+def _handle_batch(body, headers, timer):
+    """Пакет в JSON или в двоичном протоколе (в пуле потоков)"""
+    if _content_type(headers) != service.BINARY_CONTENT_TYPE:
+        return _handle_json(service.predict_batch_json, body, headers, timer)
+    timer.lap('queue_wait')
+    return service.predict_batch_binary(body, timer)
+
+
+async def send_response(send, status, body, content_type=b'application/json', headers=()):
+    """Отправка полного ответа"""
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [
+            (b'content-type', content_type),
+            (b'content-length', str(len(body)).encode()),
+            *CORS_HEADERS,
+            *headers,
+        ],
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+class BodyTooLarge(Exception):
+    """Тело запроса больше MAX_BODY_BYTES"""
+
+
+async def read_body(receive):
+    """Асинхронное чтение тела запроса; None, если клиент отключился"""
+    chunks = []
+    size = 0
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return None
+        chunk = message.get('body', b'')
+        size += len(chunk)
+        if size > MAX_BODY_BYTES:
+            raise BodyTooLarge()
+        chunks.append(chunk)
+        if not message.get('more_body', False):
+            return b''.join(chunks)
+
+
+async def predict_endpoint(scope, receive, send, task):
+    """POST эндпоинты предсказания: CPU-работа уходит в пул потоков
+
+    task(body, headers, timer) возвращает (тело, статус, Content-Type).
+    """
+    global _pending
+
+    timer = scope['timer']
+    headers = dict(scope['headers'])
+    try:
+        body = await read_body(receive)
+    except BodyTooLarge:
+        await send_response(send, 413, encode_json({'error': 'Тело запроса слишком большое'}))
+        return
+    if body is None:
+        return
+    timer.lap('read_body')
+
+    if _pending >= MAX_PENDING:
+        await send_response(send, 503, encode_json({'error': 'Сервис перегружен, повторите запрос'}))
+        return
+
+    _pending += 1
+    try:
+        loop = asyncio.get_running_loop()
+        payload, status, content_type = await loop.run_in_executor(executor, task, body, headers, timer)
+    finally:
+        _pending -= 1
+    await send_response(send, status, payload, content_type=content_type.encode())
+
+
+async def predict_stream(scope, receive, send):
+    """Потоковое предсказание: NDJSON или CSV на входе, NDJSON на выходе
+
+    Поток занимает одно место в пределе MAX_PENDING, пока не ответит целиком:
+    в пуле у него не больше одной задачи (очередной блок тела) за раз.
+    """
+    global _pending
+
+    headers = dict(scope['headers'])
+    content_type = _content_type(headers)
+    error = service.stream_error(content_type)
+    if error is not None:
+        payload, status = error
+        await send_response(send, status, encode_json(payload))
+        return
+
+    if _pending >= MAX_PENDING:
+        await send_response(send, 503, encode_json({'error': 'Сервис перегружен, повторите запрос'}))
+        return
+
+    _pending += 1
+    try:
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [(b'content-type', b'application/x-ndjson'), *CORS_HEADERS],
+        })
+
+        # Каждый блок тела разбирается и оценивается в пуле потоков по мере поступления
+        stream = service.PredictionStream(content_type, timer=scope['timer'])
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                message = await receive()
+                if message['type'] == 'http.disconnect':
+                    return
+                output = await loop.run_in_executor(executor, stream.feed, message.get('body', b''))
+                if output:
+                    await send({'type': 'http.response.body', 'body': output, 'more_body': True})
+                if not message.get('more_body', False):
+                    break
+            output = await loop.run_in_executor(executor, stream.finish)
+        except Exception as e:
+            output = service.stream_failure(e)
+        await send({'type': 'http.response.body', 'body': output})
+    finally:
+        _pending -= 1
+
+
+async def health_endpoint(scope, receive, send):
+    """Проверка состояния сервиса"""
+    await send_response(send, 200, encode_json(service.health()))
+
+
+async def ready_endpoint(scope, receive, send):
+    """Готовность принимать трафик: модель загружена и путь запроса прогрет"""
+    payload, status = service.readiness()
+    await send_response(send, status, encode_json(payload))
+
+
+async def features_endpoint(scope, receive, send):
+    """Получение списка признаков модели"""
+    await send_response(send, 200, encode_json(service.features_info()))
+
+
+async def model_info_endpoint(scope, receive, send):
+    """Активная версия модели и время ее загрузки в этом воркере"""
+    await send_response(send, 200, encode_json(service.model_info()))
+
+
+async def drift_endpoint(scope, receive, send):
+    """Доля входов вне распределения и дрейф признаков за скользящее окно"""
+    payload, status = service.drift_summary()
+    await send_response(send, status, encode_json(payload))
+
+
+async def metrics_endpoint(scope, receive, send):
+    """Метрики всех воркеров в формате Prometheus"""
+    body = service.render_metrics().encode()
+    await send_response(send, 200, body, content_type=service.METRICS_CONTENT_TYPE.encode())
+
+
+async def best_worst_endpoint(scope, receive, send):
+    """Лучшее и худшее вино из датасета с поддержкой If-None-Match"""
+    body, etag, error = service.best_worst_wines()
+    if error is not None:
+        await send_response(send, 500, encode_json(error))
+        return
+
+    headers = dict(scope['headers'])
+    cache_headers = [(b'etag', f'"{etag}"'.encode()), (b'cache-control', b'no-cache')]
+    if_none_match = headers.get(b'if-none-match', b'').decode('latin-1')
+    if if_none_match and _etag_matches(if_none_match, etag):
+        await send({
+            'type': 'http.response.start',
+            'status': 304,
+            'headers': [*CORS_HEADERS, *cache_headers],
+        })
+        await send({'type': 'http.response.body', 'body': b''})
+        return
+    await send_response(send, 200, body, headers=cache_headers)
+
+
+async def predict_single(scope, receive, send):
+    """Эндпоинт для предсказания качества вина"""
+    await predict_endpoint(scope, receive, send, partial(_handle_json, service.predict_json))
+
+
+async def predict_batch(scope, receive, send):
+    """Эндпоинт для пакетного предсказания (JSON или двоичная матрица)"""
+    await predict_endpoint(scope, receive, send, _handle_batch)
+
+
+ROUTES = {
+    '/api/health': ('GET', health_endpoint),
+    '/api/ready': ('GET', ready_endpoint),
+    '/api/features': ('GET', features_endpoint),
+    '/api/admin/model': ('GET', model_info_endpoint),
+    '/api/drift': ('GET', drift_endpoint),
+    '/metrics': ('GET', metrics_endpoint),
+    '/api/best-worst-wines': ('GET', best_worst_endpoint),
+    '/api/predict': ('POST', predict_single),
+    '/api/predict/batch': ('POST', predict_batch),
+    '/api/predict/stream': ('POST', predict_stream),
+}
+
+
+async def lifespan(receive, send):
+    """Запуск и остановка приложения"""
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            executor.shutdown(wait=True)
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    """Точка входа ASGI"""
+    if scope['type'] == 'lifespan':
+        await lifespan(receive, send)
+        return
+    if scope['type'] != 'http':
+        return
+
+    route = ROUTES.get(scope['path'])
+    timer = service.RequestTimer(scope['path'] if route is not None else 'unmatched')
+    status = None
+
+    async def timed_send(message):
+        nonlocal status
+        if message['type'] == 'http.response.start':
+            status = message['status']
+        await send(message)
+
+    try:
+        await dispatch(scope, receive, timed_send, route, timer)
+    except Exception:
+        status = status or 500
+        raise
+    finally:
+        # Полное время запроса, включая отправку тела; без ответа (клиент
+        # отключился) запрос учитывается со статусом 499
+        timer.finish(status or 499)
+
+
+async def dispatch(scope, receive, send, route, timer):
+    """Вызов эндпоинта по маршруту"""
+    if route is None:
+        await send_response(send, 404, encode_json({'error': 'Эндпоинт не найден'}))
+        return
+
+    method, endpoint = route
+    if scope['method'] == 'OPTIONS':
+        # Preflight CORS, как flask_cors в api/app.py
+        await send_response(send, 200, b'', content_type=b'text/plain', headers=[
+            (b'access-control-allow-methods', f'{method}, OPTIONS'.encode()),
+            (b'access-control-allow-headers', b'Content-Type'),
+        ])
+        return
+    if scope['method'] != method and not (method == 'GET' and scope['method'] == 'HEAD'):
+        await send_response(send, 405, encode_json({'error': 'Метод не поддерживается'}))
+        return
+
+    # Этапы запроса отмечаются в таймере из scope
+    await endpoint({**scope, 'timer': timer}, receive, send)
@@ -0,0 +1,1000 @@
+"""
+Ядро сервиса предсказания качества вина, не зависящее от веб-фреймворка
+
+Здесь загружаются модель и статистика датасета и находятся обработчики
+эндпоинтов. Обработчики принимают уже разобранный JSON и возвращают пару
+(тело ответа, HTTP статус), поэтому их используют и Flask приложение
+(api/app.py), и асинхронное ASGI приложение (api/asgi.py).
+"""
+
+import csv
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+# Добавляем корневую директорию в путь
+root_dir = Path(__file__).parent.parent
+sys.path.append(str(root_dir))
+
+from wine_quality import FEATURE_NAMES, binary, registry
+from wine_quality.batching import MicroBatcher
+from wine_quality.cache import PredictionCache, SharedPredictionCache
+from wine_quality.codec import create_codec
+from wine_quality.compiled import load_compiled_model
+from wine_quality.data import NEW_SAMPLES, load_wine_columns, to_feature_name, to_feature_names
+from wine_quality.drift import InputMonitor, input_distribution
+from wine_quality.metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, LATENCY_BUCKETS, SIZE_BUCKETS, Metrics
+from wine_quality.stats import BestWorstSnapshot
+from wine_quality.validation import FeatureSchema, feature_ranges
+
+# Настройка логирования
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Реестр версий модели: активная версия задается указателем models/CURRENT,
+# без него файлы модели берутся прямо из models/
+MODELS_DIR = 'models'
+DATA_PATH_RED = 'data/winequality-red.csv'
+DATA_PATH_WHITE = 'data/winequality-white.csv'
+# Новые размеченные образцы (scripts/update_model.py), входят в датасет сервиса
+DATA_PATH_NEW = f'data/{NEW_SAMPLES}'
+
+# Как часто каждый воркер проверяет указатель версии (0 - не следить) и
+# сколько строк датасета прогоняется через новую версию перед переключением
+MODEL_WATCH_INTERVAL = float(os.environ.get('MODEL_WATCH_INTERVAL', 2))
+MODEL_WARMUP_ROWS = 16
+MODEL_WARMUP_BATCH_ROWS = int(os.environ.get('MODEL_WARMUP_BATCH_ROWS', 1024))
+EXAMPLES_PATH = 'wine_examples.json'
+
+# Микробатчинг одиночных запросов /api/predict (по умолчанию выключен)
+MICRO_BATCH_ENABLED = os.environ.get('MICRO_BATCH_ENABLED', '0') == '1'
+MICRO_BATCH_MAX_WAIT_MS = float(os.environ.get('MICRO_BATCH_MAX_WAIT_MS', 2))
+MICRO_BATCH_MAX_SIZE = int(os.environ.get('MICRO_BATCH_MAX_SIZE', 64))
+
+# Кэш результатов /api/predict: размер (0 - выключен), время жизни записи в
+# секундах, число знаков округления признаков и общий для воркеров режим
+PREDICTION_CACHE_SIZE = int(os.environ.get('PREDICTION_CACHE_SIZE', 10000))
+PREDICTION_CACHE_TTL = float(os.environ.get('PREDICTION_CACHE_TTL', 3600))
+PREDICTION_CACHE_DECIMALS = int(os.environ.get('PREDICTION_CACHE_DECIMALS', 6))
+PREDICTION_CACHE_SHARED = os.environ.get('PREDICTION_CACHE_SHARED', '0') == '1'
+
+# Потоковое предсказание: строк в порции и предел длины одной строки входа
+STREAM_CHUNK_ROWS = int(os.environ.get('STREAM_CHUNK_ROWS', 10000))
+STREAM_MAX_LINE_BYTES = 1024 * 1024
+STREAM_READ_BYTES = 64 * 1024
+STREAM_CONTENT_TYPES = ('application/x-ndjson', 'application/jsonl', 'text/csv')
+
+# Двоичная матрица признаков в /api/predict/batch (wine_quality/binary.py)
+BINARY_CONTENT_TYPE = binary.CONTENT_TYPE
+
+# Метрики /metrics: каталог снимков воркеров для суммирования (gunicorn.conf.py
+# задает его сам; без него /metrics показывает только свой процесс) и период записи
+METRICS_DIR = os.environ.get('METRICS_DIR')
+METRICS_FLUSH_INTERVAL = float(os.environ.get('METRICS_FLUSH_INTERVAL', 1))
+
+# Проверка диапазонов признаков по обучающей выборке (wine_quality/validation.py);
+# 0 - проверять только наличие, тип и конечность
+INPUT_RANGE_CHECK = os.environ.get('INPUT_RANGE_CHECK', '1') == '1'
+
+# Оценка входов вне распределения обучающей выборки (wine_quality/drift.py, по
+# умолчанию выключена): ood_score в ответах и сводка дрейфа /api/drift по
+# последним DRIFT_WINDOW_ROWS строкам
+OOD_SCORE_ENABLED = os.environ.get('OOD_SCORE_ENABLED', '0') == '1'
+DRIFT_WINDOW_ROWS = int(os.environ.get('DRIFT_WINDOW_ROWS', 10000))
+
+# Кодек JSON: auto (msgspec/orjson, если установлены), json, orjson или msgspec
+API_JSON_CODEC = os.environ.get('API_JSON_CODEC', 'auto')
+
+FEATURE_DESCRIPTIONS = {
+    'fixed_acidity': 'Фиксированная кислотность (g/L)',
+    'volatile_acidity': 'Летучая кислотность (g/L)',
+    'citric_acid': 'Лимонная кислота (g/L)',
+    'residual_sugar': 'Остаточный сахар (g/L)',
+    'chlorides': 'Хлориды (g/L)',
+    'free_sulfur_dioxide': 'Свободный диоксид серы (mg/L)',
+    'total_sulfur_dioxide': 'Общий диоксид серы (mg/L)',
+    'density': 'Плотность (g/mL)',
+    'pH': 'Уровень pH',
+    'sulphates': 'Сульфаты (g/L)',
+    'alcohol': 'Содержание алкоголя (%)',
+    'wine_type_red': 'Тип вина (1 - красное, 0 - белое)'
+}
+
+codec = create_codec(API_JSON_CODEC)
+
+def load_wine_data():
+    """Столбцы объединенного датасета красных и белых вин из колоночного кэша"""
+    return to_feature_names(load_wine_columns(Path(DATA_PATH_RED).parent))
+
+def _metrics_info():
+    """Метки процесса в /metrics: версия обслуживаемой модели"""
+    loaded = active_model
+    if loaded is None:
+        return {'version': '', 'model_type': ''}
+    return {'version': loaded.version or 'unversioned', 'model_type': type(loaded.model).__name__}
+
+metrics = Metrics(METRICS_DIR, METRICS_FLUSH_INTERVAL, info=_metrics_info)
+metrics.histogram('wine_request_duration_seconds', 'Время обработки запроса',
+                  ('endpoint', 'status'), LATENCY_BUCKETS)
+metrics.histogram('wine_stage_duration_seconds', 'Время этапа обработки запроса',
+                  ('endpoint', 'stage'), LATENCY_BUCKETS)
+metrics.histogram('wine_inference_duration_seconds', 'Масштабирование и predict_proba одной матрицы',
+                  ('version',), LATENCY_BUCKETS)
+metrics.histogram('wine_batch_size', 'Число образцов в оцениваемой матрице',
+                  ('endpoint',), SIZE_BUCKETS)
+metrics.counter('wine_request_errors_total', 'Ответы с ошибкой', ('endpoint', 'status'))
+metrics.counter('wine_invalid_samples_total', 'Образцы пакета, не прошедшие проверку', ('endpoint',))
+metrics.counter('wine_ood_samples_total', 'Образцы вне распределения обучающей выборки', ('endpoint',))
+
+class RequestTimer:
+    """Время этапов одного запроса
+
+    lap(stage) записывает время с предыдущей отметки, finish(status) - полное
+    время запроса. Создается веб-слоем и передается обработчикам сервиса.
+    """
+
+    __slots__ = ('endpoint', 'start', 'last')
+
+    def __init__(self, endpoint):
+        self.endpoint = endpoint
+        self.start = self.last = time.perf_counter()
+
+    def lap(self, stage):
+        now = time.perf_counter()
+        metrics.observe('wine_stage_duration_seconds', (self.endpoint, stage), now - self.last)
+        self.last = now
+
+    def batch(self, rows, invalid=0):
+        """Размер оцениваемой матрицы и число отброшенных образцов"""
+        metrics.observe('wine_batch_size', (self.endpoint,), rows)
+        if invalid:
+            metrics.inc('wine_invalid_samples_total', (self.endpoint,), invalid)
+
+    def inference(self, loaded, seconds):
+        metrics.observe('wine_inference_duration_seconds', (loaded.version or 'unversioned',), seconds)
+
+    def ood(self, count):
+        if count:
+            metrics.inc('wine_ood_samples_total', (self.endpoint,), count)
+
+    def finish(self, status):
+        labels = (self.endpoint, str(status))
+        metrics.observe('wine_request_duration_seconds', labels, time.perf_counter() - self.start)
+        if status >= 400:
+            metrics.inc('wine_request_errors_total', labels)
+
+class _NoTimer:
+    """Заглушка для вызовов вне запроса (прогрев модели, скрипты)"""
+
+    def lap(self, stage):
+        pass
+
+    def batch(self, rows, invalid=0):
+        pass
+
+    def inference(self, loaded, seconds):
+        pass
+
+    def ood(self, count):
+        pass
+
+    def finish(self, status):
+        pass
+
+NO_TIMER = _NoTimer()
+
+def render_metrics():
+    """Тело ответа /metrics"""
+    return metrics.render()
+
+class LoadedModel:
+    """Загруженная версия модели: модель, скейлер и сведения о загрузке
+
+    Версия подменяется целиком одной ссылкой (active_model), поэтому запрос
+    никогда не увидит модель одной версии со скейлером другой.
+    """
+
+    def __init__(self, version, path, model, scaler, load_seconds, schema=None, monitor=None):
+        self.version = version
+        self.path = str(path)
+        self.model = model
+        self.scaler = scaler
+        # Допустимые значения признаков этой версии
+        self.schema = schema if schema is not None else FeatureSchema()
+        # Оценка OOD и сводка дрейфа входов относительно обучающей выборки этой версии
+        self.monitor = monitor
+        self.classes = model.classes_
+        # Ключи словаря вероятностей в ответе /api/predict
+        self.class_keys = [str(cls) for cls in self.classes]
+        self.load_seconds = load_seconds
+        self.warmup_seconds = 0.0
+        self.loaded_at = datetime.now().isoformat()
+
+def load_model_version():
+    """Загрузка активной версии из реестра (или плоской раскладки models/)"""
+    start = time.perf_counter()
+    version, model_dir = registry.active_model_dir(MODELS_DIR)
+    compiled_dir = model_dir / registry.COMPILED_DIRNAME
+    if compiled_dir.is_dir():
+        # Скейлер вложен в скомпилированную модель, scikit-learn не требуется.
+        # Массивы отображаются в память: воркеры gunicorn делят одни страницы
+        model = load_compiled_model(compiled_dir, mmap_mode='r')
+        scaler = None
+    else:
+        model_path = model_dir / registry.MODEL_FILENAME
+        # Без обученной модели joblib (и scikit-learn) в процесс не загружаются
+        if not model_path.is_file():
+            raise FileNotFoundError(f"Модель не найдена: {model_path}")
+        import joblib
+        model = joblib.load(model_path)
+        scaler = joblib.load(model_dir / registry.SCALER_FILENAME)
+    metadata = read_model_metadata(model_dir)
+    return LoadedModel(version, model_dir, model, scaler, time.perf_counter() - start,
+                       load_feature_schema(metadata), load_input_monitor(metadata))
+
+def read_model_metadata(model_dir):
+    """model_metadata.json версии или пустой словарь"""
+    try:
+        with open(Path(model_dir) / registry.METADATA_FILENAME) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def load_feature_schema(metadata):
+    """Схема проверки входа по диапазонам датасета из метаданных версии
+
+    Метаданные моделей, обученных до появления feature_ranges, диапазонов не
+    содержат; тогда они берутся по всему датасету.
+    """
+    if not INPUT_RANGE_CHECK:
+        return FeatureSchema()
+    ranges = metadata.get('feature_ranges')
+    if not ranges:
+        try:
+            columns = load_wine_data()
+            ranges = feature_ranges({name: columns[name] for name in FEATURE_NAMES})
+            logger.info("В метаданных модели нет feature_ranges, диапазоны признаков взяты по датасету")
+        except Exception as e:
+            logger.warning(f"Диапазоны признаков не проверяются: {e}")
+    return FeatureSchema(ranges)
+
+def load_input_monitor(metadata):
+    """Монитор OOD и дрейфа по статистике обучающей выборки из метаданных версии
+
+    Как и диапазоны, статистика старых моделей берется по всему датасету.
+    """
+    if not OOD_SCORE_ENABLED:
+        return None
+    distribution = metadata.get('input_distribution')
+    if not distribution:
+        try:
+            columns = load_wine_data()
+            distribution = input_distribution({name: columns[name] for name in FEATURE_NAMES})
+            logger.info("В метаданных модели нет input_distribution, статистика входов взята по датасету")
+        except Exception as e:
+            logger.warning(f"Оценка OOD выключена: {e}")
+            return None
+    return InputMonitor(distribution, FEATURE_NAMES, DRIFT_WINDOW_ROWS)
+
+def assess_inputs(features, loaded, timer=NO_TIMER):
+    """ood_score строк матрицы с учетом в сводке дрейфа; None, если оценка выключена"""
+    if loaded.monitor is None:
+        return None
+    scores, ood = loaded.monitor.assess(features)
+    timer.ood(ood)
+    timer.lap('ood')
+    return scores
+
+def warmup_samples():
+    """Образцы для прогрева: примеры из wine_examples.json и срез датасета"""
+    samples = []
+    try:
+        with open(EXAMPLES_PATH) as f:
+            examples = json.load(f).get('examples', {}).values()
+        samples.extend({name: example[name] for name in FEATURE_NAMES} for example in examples)
+    except (OSError, ValueError, KeyError, AttributeError):
+        pass
+    try:
+        columns = load_wine_data()
+        rows = np.linspace(0, len(columns[FEATURE_NAMES[0]]) - 1, MODEL_WARMUP_ROWS).astype(np.int64)
+        features = np.column_stack([np.asarray(columns[name], dtype=np.float64)[rows] for name in FEATURE_NAMES])
+    except Exception:
+        features = np.zeros((MODEL_WARMUP_ROWS, len(FEATURE_NAMES)))
+    samples.extend(dict(zip(FEATURE_NAMES, row)) for row in features.tolist())
+    return samples
+
+def warm_up(loaded):
+    """Одиночные строки и пакеты новой версией до переключения на нее
+
+    Первые вызовы подгружают страницы отображенных массивов и ленивое
+    состояние модели, поэтому первые запросы после переключения не медленнее
+    остальных. Ошибка здесь означает, что версия непригодна.
+    """
+    start = time.perf_counter()
+    features = np.array([[sample[name] for name in FEATURE_NAMES] for sample in warmup_samples()], dtype=np.float64)
+    for row in features:
+        score_features(row.reshape(1, -1), loaded)
+    score_features(features, loaded)
+    score_features(features[np.arange(MODEL_WARMUP_BATCH_ROWS) % len(features)], loaded)
+    loaded.warmup_seconds = time.perf_counter() - start
+
+# Состояние наблюдателя за указателем версии (свое в каждом процессе)
+_watcher_state = {
+    'pid': None,
+    'swaps': 0,
+    'previous_version': None,
+    'last_check': None,
+    'last_error': None,
+    'failed_version': None,
+}
+_watcher_lock = threading.Lock()
+
+# Пока модуль импортируется (и прогревается), наблюдатель не запускается: в
+# gunicorn с preload_app импорт идет в мастере, и поток в нем опрашивал бы
+# реестр впустую, а воркеры создавались бы fork при живом потоке
+_watcher_deferred = True
+
+def current_model():
+    """Активная версия модели; запрос берет ее один раз и работает с ней до конца
+
+    При первом вызове в процессе после импорта модуля запускает наблюдатель за
+    указателем версии (под gunicorn его заранее запускает хук post_fork).
+    """
+    if not _watcher_deferred and _watcher_state['pid'] != os.getpid():
+        start_model_watcher()
+    return active_model
+
+def start_model_watcher():
+    """Запуск наблюдателя за указателем версии в этом процессе
+
+    Потоки не переживают fork, поэтому у каждого воркера gunicorn он свой.
+    """
+    if MODEL_WATCH_INTERVAL <= 0:
+        return
+    with _watcher_lock:
+        if _watcher_state['pid'] != os.getpid():
+            _watcher_state['pid'] = os.getpid()
+            threading.Thread(target=_watch_model_versions, name='model-watcher', daemon=True).start()
+
+def _watch_model_versions():
+    """Фоновая загрузка, прогрев и атомарное переключение на новую версию"""
+    global active_model, prediction_cache
+
+    while True:
+        time.sleep(MODEL_WATCH_INTERVAL)
+        _watcher_state['last_check'] = datetime.now().isoformat()
+        try:
+            version = registry.current_version(MODELS_DIR)
+            current = active_model
+            if version is None or version == _watcher_state['failed_version']:
+                continue
+            if current is not None and version == current.version:
+                continue
+
+            loaded = load_model_version()
+            warm_up(loaded)
+
+            # Одно присваивание: запросы видят либо прежнюю, либо новую версию
+            active_model = loaded
+            if prediction_cache is None:
+                # Воркер стартовал без модели: кэш создается с первой версией
+                prediction_cache = create_prediction_cache(loaded)
+            else:
+                prediction_cache.clear()
+            _watcher_state['swaps'] += 1
+            _watcher_state['previous_version'] = current.version if current is not None else None
+            _watcher_state['last_error'] = None
+            logger.info(f"Модель переключена на версию {loaded.version} "
+                        f"(загрузка {loaded.load_seconds:.3f} с, прогрев {loaded.warmup_seconds:.3f} с)")
+            if not _readiness['ready']:
+                # Сервис стартовал без модели: прогреваем обработчики и открываем трафик
+                warm_up_service()
+        except Exception as e:
+            # Непригодная версия не загружается повторно, пока указатель не сменится
+            _watcher_state['failed_version'] = registry.current_version(MODELS_DIR)
+            _watcher_state['last_error'] = str(e)
+            logger.error(f"Ошибка загрузки новой версии модели: {e}")
+
+# Статистика датасета считается один раз и пересчитывается только при изменении файлов
+wine_stats = BestWorstSnapshot([DATA_PATH_RED, DATA_PATH_WHITE], load_wine_data, optional_paths=[DATA_PATH_NEW])
+try:
+    wine_stats.get()
+    logger.info("Данные о винах успешно загружены")
+except Exception as e:
+    logger.error(f"Ошибка загрузки данных о винах: {e}")
+
+def score_features(features, loaded=None, timer=NO_TIMER):
+    """Ядро инференса: масштабирование и один вызов predict_proba
+
+    Метка выводится как model.classes_[argmax], уверенность берется из того же
+    вектора вероятностей, поэтому деревья модели обходятся один раз.
+    В скомпилированную модель скейлер уже вложен, она принимает сырые признаки.
+    loaded - версия модели, по умолчанию активная.
+    """
+    loaded = loaded or active_model
+    start = time.perf_counter()
+    features_scaled = loaded.scaler.transform(features) if loaded.scaler is not None else features
+    timer.lap('scaling')
+    probabilities = loaded.model.predict_proba(features_scaled)
+    timer.lap('predict_proba')
+    timer.inference(loaded, time.perf_counter() - start)
+    best = probabilities.argmax(axis=1)
+    predictions = loaded.classes[best]
+    confidences = probabilities[np.arange(len(best)), best]
+    return predictions, confidences, probabilities
+
+try:
+    active_model = load_model_version()
+    warm_up(active_model)
+    logger.info(f"Модель и скейлер успешно загружены (версия: {active_model.version or 'models/'})")
+except Exception as e:
+    logger.error(f"Ошибка загрузки модели: {e}")
+    active_model = None
+
+def score_micro_batch(features, loaded):
+    """Оценка пакета микробатчера версией, которую взяли его запросы, с учетом размера в метриках"""
+    metrics.observe('wine_batch_size', ('micro_batch',), len(features))
+    return score_features(features, loaded)
+
+# Конкурентные одиночные запросы оцениваются одной матрицей
+micro_batcher = (
+    MicroBatcher(score_micro_batch, MICRO_BATCH_MAX_WAIT_MS, MICRO_BATCH_MAX_SIZE)
+    if MICRO_BATCH_ENABLED else None
+)
+
+def create_prediction_cache(loaded=None):
+    """Кэш предсказаний, сбрасываемый при смене версии или изменении файлов модели
+
+    Общему кэшу нужно число классов модели, поэтому без загруженной модели
+    кэш не создается; его создает первое переключение версии. Общий кэш,
+    созданный после fork, разделяется только потоками этого воркера.
+    """
+    loaded = loaded if loaded is not None else active_model
+    if loaded is None or PREDICTION_CACHE_SIZE <= 0:
+        return None
+    watch_paths = [
+        os.path.join(MODELS_DIR, registry.CURRENT_FILENAME),
+        os.path.join(MODELS_DIR, registry.MODEL_FILENAME),
+        os.path.join(MODELS_DIR, registry.SCALER_FILENAME),
+        os.path.join(MODELS_DIR, registry.COMPILED_DIRNAME, 'meta.json'),
+    ]
+    if PREDICTION_CACHE_SHARED:
+        # Разделяемая память создается до fork воркеров (preload_app в gunicorn.conf.py)
+        return SharedPredictionCache(len(FEATURE_NAMES), len(loaded.classes), PREDICTION_CACHE_SIZE,
+                                     PREDICTION_CACHE_TTL, PREDICTION_CACHE_DECIMALS, watch_paths)
+    return PredictionCache(PREDICTION_CACHE_SIZE, PREDICTION_CACHE_TTL, PREDICTION_CACHE_DECIMALS,
+                           watch_paths)
+
+prediction_cache = create_prediction_cache()
+
+def build_feature_matrix(samples, timer=NO_TIMER, schema=None):
+    """Проверка образцов и сборка матрицы признаков (n, 12) в порядке FEATURE_NAMES
+
+    Возвращает матрицу float64 только для корректных образцов, список их индексов
+    во входном списке и словарь ошибок {индекс: {'error': ..., 'fields': ...}}
+    для остальных. По умолчанию проверка идет по схеме активной версии.
+    """
+    if schema is None:
+        loaded = current_model()
+        schema = loaded.schema if loaded is not None else FeatureSchema()
+    features, valid_indices, errors = schema.validate(samples)
+    timer.lap('validation')
+    timer.batch(len(valid_indices), len(errors))
+    return features, valid_indices, errors
+
+def health():
+    """Состояние сервиса"""
+    loaded = current_model()
+    status = "healthy" if loaded is not None else "unhealthy"
+    result = {
+        'status': status,
+        'timestamp': datetime.now().isoformat(),
+        'model_loaded': loaded is not None,
+        'model_version': loaded.version if loaded is not None else None,
+        'ready': _readiness['ready']
+    }
+    if micro_batcher is not None:
+        result['micro_batching'] = micro_batcher.stats()
+    if prediction_cache is not None:
+        result['prediction_cache'] = prediction_cache.stats()
+    return result
+
+def features_info():
+    """Список признаков модели с описаниями и допустимыми значениями"""
+    loaded = current_model()
+    return {
+        'features': FEATURE_NAMES,
+        'feature_descriptions': FEATURE_DESCRIPTIONS,
+        'feature_ranges': loaded.schema.describe() if loaded is not None else {}
+    }
+
+def _cache_for(loaded):
+    """Кэш предсказаний, если он подходит версии (общий кэш рассчитан на число классов)"""
+    if prediction_cache is None:
+        return None
+    if getattr(prediction_cache, 'n_classes', len(loaded.classes)) != len(loaded.classes):
+        return None
+    return prediction_cache
+
+def predict(data, timer=NO_TIMER):
+    """Предсказание качества одного вина"""
+    try:
+        loaded = current_model()
+        if loaded is None:
+            return {'error': 'Модель не загружена'}, 500
+
+        if not data:
+            return {'error': 'Нет данных в запросе'}, 400
+
+        # Наличие, тип, конечность и диапазон признаков; ошибка содержит причины по полям
+        features, _, errors = loaded.schema.validate([data])
+        if errors:
+            return errors[0], 400
+        timer.lap('validation')
+        ood_scores = assess_inputs(features, loaded, timer)
+
+        # Повторные образцы берутся из кэша; ключ и оцениваемый вектор - округленные признаки
+        cache = _cache_for(loaded)
+        cached = None
+        if cache is not None:
+            features = cache.quantize(features)
+            cached = cache.get(features[0])
+            timer.lap('cache')
+
+        if cached is not None:
+            prediction, confidence, proba_row = cached
+        else:
+            # Предсказание (масштабирование выполняется внутри ядра инференса);
+            # при включенном микробатчинге строка оценивается вместе с соседними запросами
+            if micro_batcher is not None:
+                predictions, confidences, prediction_proba = micro_batcher.submit(features, loaded)
+                timer.lap('micro_batch')
+            else:
+                predictions, confidences, prediction_proba = score_features(features, loaded, timer)
+            prediction, confidence, proba_row = predictions[0], confidences[0], prediction_proba[0]
+            # Результат версии, которую уже сменили, в кэш не попадает
+            if cache is not None and loaded is active_model:
+                cache.put(features[0], prediction, confidence, proba_row)
+
+        # Получение вероятностей для каждого класса
+        probabilities = dict(zip(loaded.class_keys, np.asarray(proba_row, dtype=np.float64).tolist()))
+
+        result = {
+            'prediction': int(prediction),
+            'confidence': float(confidence),
+            'probabilities': probabilities,
+            'timestamp': datetime.now().isoformat()
+        }
+        if ood_scores is not None:
+            result['ood_score'] = float(ood_scores[0])
+
+        logger.info(f"Предсказание выполнено: {prediction}")
+        return result, 200
+
+    except Exception as e:
+        logger.error(f"Ошибка при предсказании: {e}")
+        return {'error': str(e)}, 500
+
+def predict_batch(data, timer=NO_TIMER):
+    """Пакетное предсказание качества вин"""
+    try:
+        loaded = current_model()
+        if loaded is None:
+            return {'error': 'Модель не загружена'}, 500
+
+        if not data or 'samples' not in data:
+            return {'error': 'Нет данных для пакетного предсказания'}, 400
+
+        samples = data['samples']
+        if not isinstance(samples, list):
+            return {'error': 'samples должен быть списком'}, 400
+
+        # Проверяем все образцы заранее и собираем одну матрицу признаков
+        features, valid_indices, errors = build_feature_matrix(samples, timer, loaded.schema)
+
+        results = [None] * len(samples)
+        for i, error in errors.items():
+            results[i] = {
+                'index': i,
+                **error
+            }
+
+        if valid_indices:
+            # Масштабирование и предсказание за один проход по всей матрице
+            ood_scores = assess_inputs(features, loaded, timer)
+            predictions, confidences, _ = score_features(features, loaded, timer)
+
+            for i, prediction, confidence in zip(valid_indices, predictions.tolist(), confidences.tolist()):
+                results[i] = {
+                    'index': i,
+                    'prediction': int(prediction),
+                    'confidence': float(confidence)
+                }
+            if ood_scores is not None:
+                for i, score in zip(valid_indices, ood_scores.tolist()):
+                    results[i]['ood_score'] = score
+
+        return {
+            'results': results,
+            'timestamp': datetime.now().isoformat()
+        }, 200
+
+    except Exception as e:
+        logger.error(f"Ошибка при пакетном предсказании: {e}")
+        return {'error': str(e)}, 500
+
+def _handle_json(handler, body, is_json, timer):
+    """Разбор тела, вызов обработчика и сериализация ответа; (байты, статус)
+
+    Как request.get_json(silent=True) во Flask: тело не JSON или некорректный
+    JSON дают обработчику None.
+    """
+    data = None
+    if is_json:
+        try:
+            data = codec.loads(body)
+        except ValueError:
+            data = None
+    timer.lap('json_parse')
+    payload, status = handler(data, timer)
+    body = codec.dumps(payload)
+    timer.lap('serialization')
+    return body, status
+
+def predict_json(body, is_json, timer=NO_TIMER):
+    """Предсказание одного вина по телу запроса"""
+    return _handle_json(predict, body, is_json, timer)
+
+def predict_batch_json(body, is_json, timer=NO_TIMER):
+    """Пакетное предсказание по телу запроса
+
+    Пакет без ошибок разбирается кодеком сразу в матрицу признаков, а ответ
+    собирается из массивов результатов; иначе - обычный разбор с проверкой
+    каждого образца.
+    """
+    if is_json:
+        try:
+            fast = _predict_batch_fast(body, timer)
+        except Exception as e:
+            logger.error(f"Ошибка при пакетном предсказании: {e}")
+            return codec.dumps({'error': str(e)}), 500
+        if fast is not None:
+            return fast
+    return _handle_json(predict_batch, body, is_json, timer)
+
+def _predict_batch_fast(body, timer):
+    """Пакет, целиком прошедший схему кодека, или None"""
+    loaded = current_model()
+    if loaded is None:
+        return None
+    features = codec.decode_samples(body)
+    if features is None or len(features) == 0 or not loaded.schema.row_mask(features).all():
+        return None
+    timer.lap('json_parse')
+    timer.batch(len(features))
+
+    ood_scores = assess_inputs(features, loaded, timer)
+    predictions, confidences, _ = score_features(features, loaded, timer)
+    body = codec.encode_batch_results(predictions, confidences, datetime.now().isoformat(), ood_scores)
+    timer.lap('serialization')
+    return body, 200
+
+def predict_batch_binary(body, timer=NO_TIMER):
+    """Пакетное предсказание в двоичном протоколе (wine_quality/binary.py)
+
+    Возвращает (тело, HTTP статус, Content-Type): при успехе тело двоичное,
+    при ошибке - JSON, как у остальных эндпоинтов.
+    """
+    try:
+        loaded = current_model()
+        if loaded is None:
+            return codec.dumps({'error': 'Модель не загружена'}), 500, 'application/json'
+        try:
+            features = binary.decode_matrix(body)
+        except binary.BinaryFormatError as e:
+            return codec.dumps({'error': str(e)}), 400, 'application/json'
+        timer.lap('binary_decode')
+
+        # Вероятности возвращаются в типе значений запроса; float64
+        # little-endian передается в модель без копирования
+        dtype = features.dtype
+        features = features.astype(np.float64, copy=False)
+        valid = loaded.schema.row_mask(features)
+        invalid = len(valid) - int(valid.sum())
+        timer.lap('validation')
+        timer.batch(len(features) - invalid, invalid)
+
+        probabilities = np.full((len(features), len(loaded.classes)), np.nan)
+        labels = np.full(len(features), binary.INVALID_LABEL, dtype=np.int64)
+        # Оценки OOD в двоичный ответ не входят, но учитываются в сводке дрейфа
+        if invalid == 0 and len(features):
+            assess_inputs(features, loaded, timer)
+            labels, _, probabilities = score_features(features, loaded, timer)
+        elif invalid < len(features):
+            assess_inputs(features[valid], loaded, timer)
+            labels[valid], _, probabilities[valid] = score_features(features[valid], loaded, timer)
+
+        body = binary.encode_results(probabilities, labels, loaded.classes, dtype, invalid)
+        timer.lap('serialization')
+        return body, 200, binary.CONTENT_TYPE
+    except Exception as e:
+        logger.error(f"Ошибка при двоичном пакетном предсказании: {e}")
+        return codec.dumps({'error': str(e)}), 500, 'application/json'
+
+def best_worst_wines():
+    """Сериализованный снимок лучшего и худшего вина и его ETag
+
+    Возвращает (тело, etag, None) или (None, None, тело ошибки).
+    """
+    try:
+        body, etag = wine_stats.get()
+    except Exception as e:
+        logger.error(f"Ошибка при получении лучшего/худшего вина: {e}")
+        return None, None, {'error': f'Данные о винах не загружены: {e}'}
+    return body, etag, None
+
+class PredictionStream:
+    """Потоковое предсказание для NDJSON или CSV
+
+    Тело запроса подается блоками байт произвольного размера. Записи
+    накапливаются до STREAM_CHUNK_ROWS, оцениваются одной матрицей и сразу
+    превращаются в строки NDJSON ответа, поэтому память не зависит от размера
+    входа. В CSV первая строка - заголовок с именами признаков (разделитель
+    ',' или ';', имена с пробелами как в исходном датасете допускаются).
+    """
+
+    def __init__(self, content_type, chunk_rows=STREAM_CHUNK_ROWS, timer=NO_TIMER):
+        self.is_csv = content_type == 'text/csv'
+        self.chunk_rows = chunk_rows
+        self.timer = timer
+        self.header = None
+        self.delimiter = ','
+        self.samples = []
+        self.parse_errors = {}
+        self.chunk_start = 0
+        self.carry = b''
+        self.skipping = False
+
+    def feed(self, data):
+        """Прием очередного блока тела; возвращает готовые строки ответа"""
+        output = []
+        lines = (self.carry + data).split(b'\n')
+        self.carry = lines.pop()
+
+        for line in lines:
+            if self.skipping:
+                # Конец слишком длинной строки, она уже учтена как ошибка
+                self.skipping = False
+                continue
+            self._add_line(line, output)
+
+        if len(self.carry) > STREAM_MAX_LINE_BYTES:
+            self._add_error('Строка слишком длинная', output)
+            self.carry = b''
+            self.skipping = True
+
+        return b''.join(output)
+
+    def finish(self):
+        """Конец тела: оценка оставшихся записей"""
+        output = []
+        if self.carry and not self.skipping:
+            self._add_line(self.carry, output)
+        self.carry = b''
+        if self.samples:
+            output.append(self._score_chunk())
+        return b''.join(output)
+
+    def _add_line(self, line, output):
+        """Разбор одной строки входа"""
+        line = line.strip()
+        if not line:
+            return
+
+        if self.is_csv:
+            try:
+                text = line.decode('utf-8')
+            except UnicodeDecodeError:
+                self._add_error('Строка не в кодировке UTF-8', output)
+                return
+            if self.header is None:
+                self.delimiter = ';' if ';' in text else ','
+                header = next(csv.reader([text], delimiter=self.delimiter))
+                self.header = [to_feature_name(name) for name in header]
+                return
+            values = next(csv.reader([text], delimiter=self.delimiter))
+            if len(values) != len(self.header):
+                self._add_error(f'Ожидалось {len(self.header)} значений, получено {len(values)}', output)
+                return
+            sample = dict(zip(self.header, map(_csv_value, values)))
+        else:
+            try:
+                sample = json.loads(line)
+            except ValueError:
+                self._add_error('Некорректный JSON', output)
+                return
+
+        self.samples.append(sample)
+        if len(self.samples) >= self.chunk_rows:
+            output.append(self._score_chunk())
+
+    def _add_error(self, message, output):
+        """Запись, которую не удалось разобрать, сохраняет свой номер в ответе"""
+        self.samples.append(None)
+        self.parse_errors[len(self.samples) - 1] = {'error': message}
+        if len(self.samples) >= self.chunk_rows:
+            output.append(self._score_chunk())
+
+    def _score_chunk(self):
+        """Оценка накопленной порции и сериализация в NDJSON"""
+        # Время чтения и разбора строк порции
+        self.timer.lap('read_parse')
+        loaded = current_model()
+        samples = [{} if sample is None else sample for sample in self.samples]
+        features, valid_indices, errors = build_feature_matrix(samples, self.timer, loaded.schema)
+        errors.update(self.parse_errors)
+
+        # Строки кодируются общим кодеком, как ответы остальных эндпоинтов
+        results = [None] * len(samples)
+        for i, error in errors.items():
+            results[i] = {**error, 'index': self.chunk_start + i}
+
+        if valid_indices:
+            ood_scores = assess_inputs(features, loaded, self.timer)
+            predictions, confidences, _ = score_features(features, loaded, self.timer)
+            for i, prediction, confidence in zip(valid_indices, predictions.tolist(), confidences.tolist()):
+                results[i] = {'index': self.chunk_start + i, 'prediction': int(prediction),
+                              'confidence': float(confidence)}
+            if ood_scores is not None:
+                for i, score in zip(valid_indices, ood_scores.tolist()):
+                    results[i]['ood_score'] = score
+
+        self.chunk_start += len(samples)
+        self.samples = []
+        self.parse_errors = {}
+        output = b'\n'.join(map(codec.dumps, results)) + b'\n'
+        self.timer.lap('serialization')
+        return output
+
+def _csv_value(value):
+    """Значение поля CSV: число или исходная строка (ее отклонит проверка схемы)"""
+    try:
+        return float(value)
+    except ValueError:
+        return value
+
+def stream_error(content_type):
+    """Ошибка, не позволяющая начать потоковое предсказание, или None"""
+    if current_model() is None:
+        return {'error': 'Модель не загружена'}, 500
+    if content_type not in STREAM_CONTENT_TYPES:
+        return {'error': f'Ожидается тело в формате {", ".join(STREAM_CONTENT_TYPES)}'}, 415
+    return None
+
+def stream_failure(error):
+    """Последняя строка ответа при сбое посреди потока"""
+    logger.error(f"Ошибка при потоковом предсказании: {error}")
+    return codec.dumps({'error': str(error)}) + b'\n'
+
+def model_info():
+    """Активная версия модели и сведения о ее загрузке в этом воркере"""
+    loaded = current_model()
+    info = {
+        'pid': os.getpid(),
+        'pointer_version': registry.current_version(MODELS_DIR),
+        'watch_interval_seconds': MODEL_WATCH_INTERVAL,
+        'swaps': _watcher_state['swaps'],
+        'previous_version': _watcher_state['previous_version'],
+        'last_check': _watcher_state['last_check'],
+        'last_error': _watcher_state['last_error'],
+        'timestamp': datetime.now().isoformat(),
+    }
+    if loaded is None:
+        return {'model_loaded': False, **info}
+    return {
+        'model_loaded': True,
+        'version': loaded.version,
+        'path': loaded.path,
+        'model_type': type(loaded.model).__name__,
+        'compiled': loaded.scaler is None,
+        'loaded_at': loaded.loaded_at,
+        'load_seconds': loaded.load_seconds,
+        'warmup_seconds': loaded.warmup_seconds,
+        **info,
+    }
+
+def drift_summary():
+    """Скользящая сводка дрейфа входов активной версии в этом воркере; (тело, статус)
+
+    Окно свое у каждого процесса и начинается заново при смене версии модели.
+    """
+    loaded = current_model()
+    info = {
+        'pid': os.getpid(),
+        'model_version': loaded.version if loaded is not None else None,
+        'timestamp': datetime.now().isoformat(),
+    }
+    if loaded is None:
+        return {'error': 'Модель не загружена', **info}, 500
+    if loaded.monitor is None:
+        return {'enabled': False, **info}, 200
+    return {'enabled': True, **loaded.monitor.summary(), **info}, 200
+
+# Готовность процесса принимать трафик (/api/ready); в gunicorn с preload_app
+# сервис прогревается в мастере, и воркеры получают это состояние при fork
+_readiness = {
+    'ready': False,
+    'warmup_seconds': None,
+    'warmed_at': None,
+    'error': None,
+}
+
+def warm_up_service():
+    """Прогрев полного пути запроса, после которого процесс готов
+
+    Примеры и срез датасета проходят через те же обработчики, что и запросы:
+    разбор JSON кодеком, проверку, кэш, инференс и сериализацию одиночных,
+    пакетных (JSON и двоичных) и потоковых предсказаний. Метрики при этом не
+    пишутся, кэш предсказаний и окно сводки дрейфа после прогрева сбрасываются.
+    """
+    start = time.perf_counter()
+    try:
+        samples = warmup_samples()
+        features = np.array([[sample[name] for name in FEATURE_NAMES] for sample in samples], dtype=np.float64)
+        batch = [samples[i % len(samples)] for i in range(MODEL_WARMUP_BATCH_ROWS)]
+        responses = [predict_json(json.dumps(sample).encode(), True) for sample in samples[:MODEL_WARMUP_ROWS]]
+        responses.append(predict_batch_json(json.dumps({'samples': samples}).encode(), True))
+        responses.append(predict_batch_json(json.dumps({'samples': batch}).encode(), True))
+        responses.append(predict_batch_binary(binary.encode_matrix(features))[:2])
+        stream = PredictionStream('application/x-ndjson')
+        stream.feed(''.join(json.dumps(sample) + '\n' for sample in samples).encode())
+        stream.finish()
+
+        failed = [status for _, status in responses if status != 200]
+        if failed:
+            raise RuntimeError(f'{len(failed)} запросов прогрева завершились со статусом {failed[0]}')
+        if prediction_cache is not None:
+            prediction_cache.reset()
+        loaded = current_model()
+        if loaded.monitor is not None:
+            loaded.monitor.reset()
+    except Exception as e:
+        _readiness['error'] = str(e)
+        logger.error(f"Ошибка прогрева сервиса: {e}")
+        return False
+
+    _readiness.update(ready=True, error=None, warmup_seconds=time.perf_counter() - start,
+                      warmed_at=datetime.now().isoformat())
+    logger.info(f"Сервис прогрет за {_readiness['warmup_seconds']:.3f} с и готов принимать запросы")
+    return True
+
+def readiness():
+    """Готовность процесса принимать трафик; (тело, 200 или 503)
+
+    В отличие от /api/health (процесс жив), готовность означает, что модель
+    загружена и весь путь запроса прогрет.
+    """
+    loaded = current_model()
+    ready = loaded is not None and _readiness['ready']
+    result = {
+        'ready': ready,
+        'pid': os.getpid(),
+        'model_version': loaded.version if loaded is not None else None,
+        'model_warmup_seconds': loaded.warmup_seconds if loaded is not None else None,
+        'service_warmup_seconds': _readiness['warmup_seconds'],
+        'warmed_at': _readiness['warmed_at'],
+        'error': _readiness['error'] if loaded is not None else 'Модель не загружена',
+        'timestamp': datetime.now().isoformat(),
+    }
+    return result, 200 if ready else 503
+
+if active_model is not None:
+    warm_up_service()
+_watcher_deferred = False
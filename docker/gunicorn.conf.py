@@ -0,0 +1,60 @@
+"""
+Конфигурация gunicorn для API сервиса
+
+Приложение загружается один раз в мастер-процессе (preload_app): модель,
+отображенная в память, и снимок статистики датасета создаются до fork, и
+воркеры делят эти страницы по принципу copy-on-write вместо того, чтобы
+держать собственные копии. Поэтому число воркеров на узле ограничено CPU,
+а не памятью.
+"""
+
+import gc
+import glob
+import os
+import shutil
+import tempfile
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('GUNICORN_WORKERS', 4))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))
+
+# Потоки в воркере: нужны микробатчингу (MICRO_BATCH_ENABLED=1), чтобы
+# одновременные запросы попадали в один пакет
+threads = int(os.environ.get('GUNICORN_THREADS', 1))
+
+# Загрузка api.app в мастере до запуска воркеров
+preload_app = True
+
+# Каталог, в который воркеры записывают снимки метрик; /metrics в любом воркере
+# складывает их. Если он не задан, создается временный на время работы сервера
+metrics_dir_created = 'METRICS_DIR' not in os.environ
+if metrics_dir_created:
+    os.environ['METRICS_DIR'] = tempfile.mkdtemp(prefix='wine-metrics-')
+
+
+def on_starting(server):
+    """Снимки метрик прошлого запуска не суммируются с новыми"""
+    for path in glob.glob(os.path.join(os.environ['METRICS_DIR'], '*.json')):
+        os.remove(path)
+
+
+def on_exit(server):
+    """Удаление временного каталога метрик"""
+    if metrics_dir_created:
+        shutil.rmtree(os.environ['METRICS_DIR'], ignore_errors=True)
+
+
+def post_fork(server, worker):
+    """Наблюдатель за версией модели запускается в каждом воркере, но не в мастере"""
+    from api import service
+    service.start_model_watcher()
+
+
+def when_ready(server):
+    """Заморозка объектов мастера перед fork
+
+    Сборщик мусора в воркерах не будет обходить загруженные в мастере объекты
+    и записывать в их заголовки, поэтому эти страницы не копируются.
+    """
+    gc.freeze()
+    server.log.info(f"Приложение загружено в мастере, объектов заморожено: {gc.get_freeze_count()}")
@@ -128,10 +128,27 @@ app.get('/health', async (req, res) => {
 // Прокси для API лучшего и худшего вина
 app.get('/api/best-worst-wines', async (req, res) => {
     try {
+        // Передаем If-None-Match, чтобы API мог ответить 304 без тела
+        const headers = {};
+        if (req.get('If-None-Match')) {
+            headers['If-None-Match'] = req.get('If-None-Match');
+        }
+        
         const response = await axios.get(`${API_BASE_URL}/api/best-worst-wines`, {
-            timeout: 10000
+            timeout: 10000,
+            headers,
+            validateStatus: (status) => status === 200 || status === 304
         });
         
+        if (response.headers.etag) {
+            res.set('ETag', response.headers.etag);
+            res.set('Cache-Control', 'no-cache');
+        }
+        
+        if (response.status === 304) {
+            return res.status(304).end();
+        }
+        
         res.json(response.data);
         
     } catch (error) {
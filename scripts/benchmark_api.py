@@ -0,0 +1,411 @@
+"""
+Воспроизводимый бенчмарк API: пропускная способность, задержки и ресурсы воркеров
+
+Трафик строится из строк датасета (data/winequality-*.csv) и примеров
+wine_examples.json с фиксированным зерном, поэтому при одинаковых параметрах
+запросы совпадают от запуска к запуску. Сценарии:
+- single - одиночные /api/predict;
+- small_batch - /api/predict/batch по --small-batch строк;
+- large_batch - /api/predict/batch по --large-batch строк;
+- mixed - смесь одиночных запросов, пакетов и GET /api/best-worst-wines.
+
+Сервер запускается скриптом (gunicorn с docker/gunicorn.conf.py или uvicorn),
+либо используется уже запущенный (--url), либо приложение Flask вызывается в
+этом же процессе через тестовый клиент (--server inprocess, без сети). Для
+каждого сценария выводятся RPS, p50/p95/p99 задержки и процессорное время и
+RSS каждого процесса сервера (Linux, /proc). Результаты сохраняются в JSON
+(по умолчанию benchmarks/results/<время>-<коммит>.json); --compare сравнивает
+их с прежним файлом и завершает скрипт с кодом 1 при регрессии.
+"""
+
+import argparse
+import http.client
+import json
+import os
+import platform
+import signal
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+# Добавляем корневую директорию в путь
+root_dir = Path(__file__).parent.parent
+sys.path.append(str(root_dir))
+
+from wine_quality import FEATURE_NAMES
+from wine_quality.data import load_wine_columns, to_feature_names
+
+HOST = '127.0.0.1'
+RESULTS_DIR = root_dir / "benchmarks" / "results"
+SCENARIOS = ('single', 'small_batch', 'large_batch', 'mixed')
+
+# Доли запросов в смешанном сценарии
+MIXED_WEIGHTS = {'single': 0.75, 'small_batch': 0.12, 'large_batch': 0.03, 'best_worst': 0.10}
+
+
+def load_samples():
+    """Образцы для запросов: строки датасета и примеры из wine_examples.json"""
+    columns = to_feature_names(load_wine_columns(root_dir / "data"))
+    matrix = np.column_stack([np.asarray(columns[name], dtype=np.float64) for name in FEATURE_NAMES])
+    samples = [dict(zip(FEATURE_NAMES, row)) for row in matrix.tolist()]
+
+    examples_path = root_dir / "wine_examples.json"
+    examples = []
+    if examples_path.exists():
+        with open(examples_path) as f:
+            examples = list(json.load(f).get('examples', {}).values())
+    return samples, examples
+
+
+def build_requests(scenario, n_requests, samples, examples, args, rng):
+    """Список запросов сценария: (метод, путь, тело)"""
+    def single():
+        # Примеры из wine_examples.json встречаются так же часто, как в интерфейсе
+        if examples and rng.random() < 0.1:
+            sample = examples[rng.integers(len(examples))]
+        else:
+            sample = samples[rng.integers(len(samples))]
+        return 'POST', '/api/predict', json.dumps(sample).encode()
+
+    def batch(size):
+        rows = rng.integers(len(samples), size=size)
+        return 'POST', '/api/predict/batch', json.dumps({'samples': [samples[i] for i in rows]}).encode()
+
+    makers = {
+        'single': single,
+        'small_batch': lambda: batch(args.small_batch),
+        'large_batch': lambda: batch(args.large_batch),
+        'best_worst': lambda: ('GET', '/api/best-worst-wines', None),
+    }
+    if scenario != 'mixed':
+        return [makers[scenario]() for _ in range(n_requests)]
+
+    kinds = rng.choice(list(MIXED_WEIGHTS), size=n_requests, p=list(MIXED_WEIGHTS.values()))
+    return [makers[kind]() for kind in kinds]
+
+
+class HttpTarget:
+    """Сервер на локальном порту; каждый запрос - отдельное соединение"""
+
+    def __init__(self, port, timeout):
+        self.port = port
+        self.timeout = timeout
+
+    def request(self, method, path, body):
+        connection = http.client.HTTPConnection(HOST, self.port, timeout=self.timeout)
+        try:
+            headers = {'Content-Type': 'application/json'} if body is not None else {}
+            connection.request(method, path, body=body, headers=headers)
+            response = connection.getresponse()
+            response.read()
+            return response.status
+        finally:
+            connection.close()
+
+
+class InProcessTarget:
+    """Приложение Flask в этом процессе через тестовый клиент"""
+
+    def __init__(self):
+        from api.app import app
+        self.app = app
+        self.local = threading.local()
+
+    def request(self, method, path, body):
+        client = getattr(self.local, 'client', None)
+        if client is None:
+            client = self.local.client = self.app.test_client()
+        response = client.open(path, method=method, data=body, content_type='application/json')
+        return response.status_code
+
+
+def run_requests(target, requests, concurrency):
+    """Запросы в concurrency потоках; задержки в мс (NaN - ошибка) и статусы"""
+    latencies = np.full(len(requests), np.nan)
+    statuses = [None] * len(requests)
+    position = iter(range(len(requests)))
+    lock = threading.Lock()
+
+    def client():
+        while True:
+            with lock:
+                i = next(position, None)
+            if i is None:
+                return
+            start = time.perf_counter()
+            try:
+                status = target.request(*requests[i])
+            except (OSError, http.client.HTTPException):
+                status = 'connection_error'
+            statuses[i] = status
+            if status == 200 or status == 304:
+                latencies[i] = (time.perf_counter() - start) * 1000
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, statuses, time.perf_counter() - start
+
+
+def process_tree(root_pid):
+    """pid процесса и всех его потомков (Linux)"""
+    children = {}
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                # Имя процесса в скобках может содержать пробелы
+                fields = f.read().rsplit(')', 1)[1].split()
+        except OSError:
+            continue
+        children.setdefault(int(fields[1]), []).append(int(entry))
+
+    pids, stack = [], [root_pid]
+    while stack:
+        pid = stack.pop()
+        pids.append(pid)
+        stack.extend(children.get(pid, []))
+    return sorted(pids)
+
+
+def read_usage(pid):
+    """Процессорное время (с) и RSS (МБ) процесса или None, если его нет"""
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            fields = f.read().rsplit(')', 1)[1].split()
+        with open(f'/proc/{pid}/status') as f:
+            rss_kb = next(int(line.split()[1]) for line in f if line.startswith('VmRSS:'))
+    except (OSError, StopIteration):
+        return None
+    # utime и stime - 12-е и 13-е поля после имени процесса
+    cpu_seconds = (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+    return cpu_seconds, rss_kb / 1024
+
+
+def usage_snapshot(root_pid):
+    """Ресурсы всех процессов сервера"""
+    if root_pid is None or not os.path.isdir('/proc'):
+        return {}
+    snapshot = {}
+    for pid in process_tree(root_pid):
+        usage = read_usage(pid)
+        if usage is not None:
+            snapshot[pid] = usage
+    return snapshot
+
+
+def worker_usage(before, after, elapsed, root_pid):
+    """Процессорное время, загрузка CPU и RSS каждого процесса за сценарий"""
+    workers = []
+    for pid, (cpu_after, rss) in sorted(after.items()):
+        cpu_before = before.get(pid, (0.0, 0.0))[0]
+        cpu = cpu_after - cpu_before
+        workers.append({
+            'pid': pid,
+            'role': 'worker' if pid != root_pid else ('master' if len(after) > 1 else 'process'),
+            'cpu_seconds': round(cpu, 3),
+            'cpu_percent': round(100 * cpu / elapsed, 1) if elapsed else 0.0,
+            'rss_mb': round(rss, 1),
+        })
+    return workers
+
+
+def summarize(latencies, statuses, elapsed):
+    """Пропускная способность и перцентили задержки"""
+    ok = latencies[~np.isnan(latencies)]
+    status_counts = {}
+    for status in statuses:
+        status_counts[str(status)] = status_counts.get(str(status), 0) + 1
+    result = {
+        'requests': len(statuses),
+        'errors': int(len(statuses) - len(ok)),
+        'status_counts': status_counts,
+        'seconds': round(elapsed, 3),
+        'throughput_rps': round(len(ok) / elapsed, 1) if elapsed else 0.0,
+    }
+    if len(ok):
+        p50, p95, p99 = np.percentile(ok, [50, 95, 99])
+        result['latency_ms'] = {
+            'mean': round(float(ok.mean()), 3),
+            'p50': round(float(p50), 3),
+            'p95': round(float(p95), 3),
+            'p99': round(float(p99), 3),
+            'max': round(float(ok.max()), 3),
+        }
+    return result
+
+
+def report(name, result):
+    """Строка таблицы результатов сценария"""
+    latency = result.get('latency_ms')
+    if latency is None:
+        print(f"  {name:<12} нет успешных запросов, ошибок: {result['errors']}/{result['requests']}")
+        return
+    print(f"  {name:<12} {result['throughput_rps']:9.1f} RPS   p50 {latency['p50']:8.2f}   "
+          f"p95 {latency['p95']:8.2f}   p99 {latency['p99']:8.2f} мс   "
+          f"ошибок: {result['errors']}/{result['requests']}")
+    for worker in result.get('workers', []):
+        print(f"      {worker['role']:<7} pid {worker['pid']:<7} CPU {worker['cpu_seconds']:7.2f} с "
+              f"({worker['cpu_percent']:5.1f}%)   RSS {worker['rss_mb']:7.1f} МБ")
+
+
+def wait_ready(url, timeout):
+    """Ожидание готовности сервиса (/api/ready)"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(f'{url}/api/ready', timeout=2) as response:
+                if response.status == 200:
+                    return True
+        except OSError:
+            time.sleep(0.5)
+    return False
+
+
+def start_server(server, workers, port):
+    """Запуск gunicorn или uvicorn с тем же кодом, что в Dockerfile"""
+    if server == 'gunicorn':
+        command = [sys.executable, '-m', 'gunicorn', '--config', 'docker/gunicorn.conf.py', 'api.app:app']
+    else:
+        command = [sys.executable, '-m', 'uvicorn', 'api.asgi:app', '--host', HOST, '--port', str(port),
+                   '--workers', str(workers), '--log-level', 'warning']
+    env = dict(os.environ, GUNICORN_WORKERS=str(workers), GUNICORN_BIND=f'{HOST}:{port}',
+               PYTHONPATH=str(root_dir))
+    return subprocess.Popen(command, cwd=root_dir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def git_commit():
+    """Коммит рабочего дерева; '+dirty', если есть незакоммиченные изменения"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=root_dir,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=root_dir,
+                               capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+    return commit + ('+dirty' if dirty else '')
+
+
+def compare(results, baseline_path, threshold):
+    """Сравнение с прежними результатами; True, если есть регрессия"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    print(f"\n📈 Сравнение с {baseline_path} (коммит {baseline.get('commit')}):")
+
+    regression = False
+    for name, result in results['scenarios'].items():
+        previous = baseline.get('scenarios', {}).get(name)
+        if previous is None or 'latency_ms' not in previous or 'latency_ms' not in result:
+            continue
+        rps_change = result['throughput_rps'] / previous['throughput_rps'] - 1
+        p99_change = result['latency_ms']['p99'] / previous['latency_ms']['p99'] - 1
+        worse = rps_change < -threshold or p99_change > threshold
+        regression |= worse
+        print(f"  {'❌' if worse else '✅'} {name:<12} RPS {rps_change:+7.1%}   p99 {p99_change:+7.1%}")
+    return regression
+
+
+def main():
+    """Основная функция бенчмарка"""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--server', choices=['gunicorn', 'uvicorn', 'inprocess'], default='gunicorn',
+                        help='как запускать приложение')
+    parser.add_argument('--url', help='уже запущенный сервер, например http://127.0.0.1:5000')
+    parser.add_argument('--server-pid', type=int, help='pid запущенного сервера для замера CPU/RSS (с --url)')
+    parser.add_argument('--workers', type=int, default=4, help='число процессов сервера')
+    parser.add_argument('--port', type=int, default=5057, help='порт для запуска сервера')
+    parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument('--requests', type=int, default=2000, help='запросов в сценарии')
+    parser.add_argument('--warmup', type=int, default=100, help='неучитываемых запросов перед сценарием')
+    parser.add_argument('--concurrency', type=int, default=8, help='параллельных клиентов')
+    parser.add_argument('--small-batch', type=int, default=10, help='строк в малом пакете')
+    parser.add_argument('--large-batch', type=int, default=1000, help='строк в большом пакете')
+    parser.add_argument('--seed', type=int, default=42, help='зерно генератора трафика')
+    parser.add_argument('--timeout', type=float, default=30.0, help='таймаут запроса, с')
+    parser.add_argument('--output', help='файл результатов (JSON)')
+    parser.add_argument('--compare', help='прежний файл результатов для сравнения')
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help='допустимое падение RPS или рост p99 при сравнении')
+    args = parser.parse_args()
+
+    samples, examples = load_samples()
+    process = None
+    server_pid = None
+    if args.url:
+        target = HttpTarget(int(args.url.rsplit(':', 1)[1].split('/')[0]), args.timeout)
+        server_name = f'external {args.url}'
+        server_pid = args.server_pid
+    elif args.server == 'inprocess':
+        target = InProcessTarget()
+        server_name = 'inprocess (Flask test client)'
+        server_pid = os.getpid()
+    else:
+        process = start_server(args.server, args.workers, args.port)
+        if not wait_ready(f'http://{HOST}:{args.port}', timeout=120):
+            process.kill()
+            print(f"❌ {args.server} не ответил на /api/ready")
+            sys.exit(1)
+        target = HttpTarget(args.port, args.timeout)
+        server_name = f'{args.server} x{args.workers}'
+        server_pid = process.pid
+
+    results = {
+        'commit': git_commit(),
+        'timestamp': datetime.now().isoformat(),
+        'server': server_name,
+        'python': platform.python_version(),
+        'cpu_count': os.cpu_count(),
+        'config': {key: value for key, value in vars(args).items() if key not in ('output', 'compare')},
+        'scenarios': {},
+    }
+
+    print(f"🍷 Бенчмарк API: {server_name}, клиентов: {args.concurrency}, коммит {results['commit']}")
+    try:
+        for name in args.scenarios:
+            # Свой генератор на сценарий: набор запросов не зависит от выбранных сценариев
+            rng = np.random.default_rng([args.seed, SCENARIOS.index(name)])
+            run_requests(target, build_requests(name, args.warmup, samples, examples, args, rng),
+                         args.concurrency)
+            requests = build_requests(name, args.requests, samples, examples, args, rng)
+
+            before = usage_snapshot(server_pid)
+            latencies, statuses, elapsed = run_requests(target, requests, args.concurrency)
+            after = usage_snapshot(server_pid)
+
+            result = summarize(latencies, statuses, elapsed)
+            result['workers'] = worker_usage(before, after, elapsed, server_pid)
+            results['scenarios'][name] = result
+            report(name, result)
+    finally:
+        if process is not None:
+            process.send_signal(signal.SIGTERM)
+            try:
+                process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+
+    output = Path(args.output) if args.output else (
+        RESULTS_DIR / f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{results['commit']}.json")
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
+    print(f"\n💾 Результаты сохранены: {output}")
+
+    if args.compare and compare(results, args.compare, args.threshold):
+        print(f"\n❌ Регрессия больше {args.threshold:.0%}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
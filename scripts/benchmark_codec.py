@@ -0,0 +1,128 @@
+"""
+Микробенчмарк кодеков JSON на пакете /api/predict/batch
+
+Тело из --rows строк датасета разбирается в матрицу признаков, результаты
+сериализуются в ответ, и весь обработчик service.predict_batch_json (разбор,
+инференс, сериализация) прогоняется каждым доступным кодеком. Ответы быстрых
+кодеков сверяются со стандартным json. Для сравнения тот же пакет проходит
+двоичный протокол (application/x-wine-matrix) с float64 и float32.
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+# Добавляем корневую директорию в путь
+root_dir = Path(__file__).parent.parent
+sys.path.append(str(root_dir))
+
+from api import service
+from wine_quality import FEATURE_NAMES, binary
+from wine_quality.codec import MSGSPEC_AVAILABLE, ORJSON_AVAILABLE, create_codec
+
+
+def best_time(function, repeats):
+    """Лучшее время из repeats запусков, мс"""
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times) * 1000
+
+
+def decode(codec, body):
+    """Тело запроса -> матрица признаков тем же путем, что в сервисе"""
+    features = codec.decode_samples(body)
+    if features is None:
+        features, _, _ = service.build_feature_matrix(codec.loads(body)['samples'])
+    return features
+
+
+def without_timestamp(body):
+    payload = json.loads(body)
+    payload.pop('timestamp', None)
+    return payload
+
+
+def main():
+    """Основная функция бенчмарка"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=10000, help='строк в пакете')
+    parser.add_argument('--repeats', type=int, default=10, help='повторов замера')
+    args = parser.parse_args()
+
+    if service.active_model is None:
+        print("❌ Модель не загружена, сначала запустите scripts/train_model.py")
+        sys.exit(1)
+
+    columns = service.load_wine_data()
+    matrix = np.column_stack([np.asarray(columns[name], dtype=np.float64) for name in FEATURE_NAMES])
+    # Только строки, проходящие проверку входа: иначе сравнение матриц разбора неверно
+    matrix = matrix[service.active_model.schema.row_mask(matrix)]
+    rows = matrix[np.arange(args.rows) % len(matrix)]
+    body = json.dumps({'samples': [dict(zip(FEATURE_NAMES, row)) for row in rows.tolist()]}).encode()
+    predictions, confidences, _ = service.score_features(rows)
+    timestamp = '2024-01-01T00:00:00'
+
+    names = ['json'] + (['orjson'] if ORJSON_AVAILABLE else []) + (['msgspec'] if MSGSPEC_AVAILABLE else [])
+    if len(names) > 1:
+        names.append('auto')
+    print(f"🍷 Пакет {args.rows} строк, тело {len(body) / 2**20:.1f} МБ, лучшее из {args.repeats}")
+    if len(names) == 1:
+        print("⚠️  orjson и msgspec не установлены, доступен только стандартный json")
+
+    reference = None
+    baseline = None
+    print(f"\n  {'кодек':<16} {'разбор, мс':>11} {'ответ, мс':>10} {'обработчик, мс':>15} {'ускорение':>10}")
+    for name in names:
+        codec = create_codec(name)
+        assert np.array_equal(decode(codec, body), rows)
+
+        service.codec = codec
+        response, status = service.predict_batch_json(body, True)
+        assert status == 200
+        if reference is None:
+            reference = without_timestamp(response)
+        elif without_timestamp(response) != reference:
+            print(f"❌ Ответ кодека {codec.name} отличается от json")
+            sys.exit(1)
+
+        decode_ms = best_time(lambda: decode(codec, body), args.repeats)
+        encode_ms = best_time(lambda: codec.encode_batch_results(predictions, confidences, timestamp), args.repeats)
+        handler_ms = best_time(lambda: service.predict_batch_json(body, True), args.repeats)
+        baseline = baseline or handler_ms
+        print(f"  {codec.name:<16} {decode_ms:11.1f} {encode_ms:10.1f} {handler_ms:15.1f} "
+              f"{baseline / handler_ms:9.2f}x")
+
+    # Двоичный протокол: те же строки матрицей, ответ - метки и вероятности
+    print(f"\n  {'протокол':<16} {'запрос, КБ':>11} {'ответ, КБ':>10} {'разбор, мс':>11} {'ответ, мс':>10} "
+          f"{'обработчик, мс':>15} {'ускорение':>10}")
+    json_response, _ = service.predict_batch_json(body, True)
+    print(f"  {'json':<16} {len(body) / 1024:11.0f} {len(json_response) / 1024:10.0f}")
+    _, _, probabilities = service.score_features(rows)
+    for dtype in (np.float64, np.float32):
+        request = binary.encode_matrix(rows, dtype)
+        response, status, _ = service.predict_batch_binary(request)
+        assert status == 200
+        labels, _, _, invalid = binary.decode_results(response)
+        if invalid or (dtype is np.float64 and not np.array_equal(labels, predictions)):
+            print(f"❌ Метки двоичного протокола ({np.dtype(dtype).name}) отличаются от json")
+            sys.exit(1)
+
+        decode_ms = best_time(lambda: binary.decode_matrix(request), args.repeats)
+        encode_ms = best_time(lambda: binary.encode_results(probabilities, predictions, service.active_model.classes,
+                                                            dtype), args.repeats)
+        handler_ms = best_time(lambda: service.predict_batch_binary(request), args.repeats)
+        print(f"  {'binary ' + np.dtype(dtype).name:<16} {len(request) / 1024:11.0f} {len(response) / 1024:10.0f} "
+              f"{decode_ms:11.3f} {encode_ms:10.3f} {handler_ms:15.1f} {baseline / handler_ms:9.2f}x")
+
+    print("\n✅ Ответы всех кодеков совпадают")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Бенчмарк скомпилированных SVC и k ближайших соседей против scikit-learn
+
+Кандидаты SVM и KNN обучаются с теми же параметрами, что в train_model.py,
+экспортируются в каталог скомпилированной модели и сравниваются с путем
+scaler.transform + predict_proba на одиночных запросах и пакетах.
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+import warnings
+from pathlib import Path
+
+import numpy as np
+from sklearn.model_selection import train_test_split
+from sklearn.neighbors import KNeighborsClassifier
+from sklearn.preprocessing import StandardScaler
+from sklearn.svm import SVC
+
+# Добавляем корневую директорию в путь
+root_dir = Path(__file__).parent.parent
+sys.path.append(str(root_dir))
+
+from wine_quality import FEATURE_NAMES
+from wine_quality.compiled import export_compiled_model, load_compiled_model
+from wine_quality.data import load_wine_columns, to_feature_names
+
+# SVC(probability=True) в новых версиях scikit-learn объявлен устаревшим
+warnings.filterwarnings('ignore', category=FutureWarning)
+
+CANDIDATES = {
+    'SVM': lambda: SVC(random_state=42, probability=True),
+    'KNN': lambda: KNeighborsClassifier(n_neighbors=5),
+}
+
+
+def measure(func, batches):
+    """Замер задержки каждого вызова в миллисекундах"""
+    timings = []
+    for features in batches:
+        start = time.perf_counter()
+        func(features)
+        timings.append((time.perf_counter() - start) * 1000)
+    return np.array(timings)
+
+
+def report(name, timings, rows):
+    """Вывод p50/p99 задержки и времени на строку"""
+    p50, p99 = np.percentile(timings, [50, 99])
+    print(f"  {name:<14} p50 = {p50:8.3f} мс   p99 = {p99:8.3f} мс   {p50 / rows * 1000:8.2f} мкс/строка")
+    return p50
+
+
+def main():
+    """Основная функция бенчмарка"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--repeats', type=int, default=100, help='число замеров на сценарий')
+    parser.add_argument('--batch-size', type=int, default=1000, help='размер пакета')
+    parser.add_argument('--candidates', nargs='+', choices=list(CANDIDATES), default=list(CANDIDATES))
+    args = parser.parse_args()
+
+    columns = to_feature_names(load_wine_columns())
+    X = np.column_stack([columns[name] for name in FEATURE_NAMES]).astype(np.float64)
+    y = np.asarray(columns['quality'])
+    X_train, X_test, y_train, _ = train_test_split(X, y, test_size=0.3, random_state=42, stratify=y)
+    scaler = StandardScaler().fit(X_train)
+    rng = np.random.default_rng(42)
+
+    for name in args.candidates:
+        model = CANDIDATES[name]().fit(scaler.transform(X_train), y_train)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            meta = export_compiled_model(model, scaler, Path(tmp_dir) / 'compiled_model')
+            compiled = load_compiled_model(Path(tmp_dir) / 'compiled_model')
+
+            reference = model.predict_proba(scaler.transform(X_test))
+            difference = np.abs(compiled.predict_proba(X_test) - reference).max()
+            size = meta.get('n_support_vectors', meta.get('n_samples_fit'))
+            print(f"\n🍷 {name} ({meta['kind']}, {size} опорных точек): max |Δp| = {difference:.2e} "
+                  f"на {len(X_test)} образцах")
+
+            for rows in (1, args.batch_size):
+                batches = [X_test[rng.integers(0, len(X_test), rows)] for _ in range(args.repeats)]
+                measure(compiled.predict_proba, batches[:5])
+                print(f"📊 {'одиночный запрос' if rows == 1 else f'пакет из {rows}'}:")
+                sklearn_p50 = report('scikit-learn', measure(
+                    lambda features: model.predict_proba(scaler.transform(features)), batches), rows)
+                compiled_p50 = report('скомпилирован', measure(compiled.predict_proba, batches), rows)
+                print(f"  Ускорение p50: x{sklearn_p50 / compiled_p50:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Бенчмарк ядра инференса: сравнение прежнего двойного прохода scikit-learn
+(predict + predict_proba) с ядром сервиса (один вызов predict_proba, метка
+через argmax, скомпилированный ансамбль деревьев, если он экспортирован)
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import joblib
+import numpy as np
+
+# Добавляем корневую директорию в путь
+root_dir = Path(__file__).parent.parent
+sys.path.append(str(root_dir))
+
+from api import service
+from wine_quality import registry
+from wine_quality.data import load_wine_columns, to_feature_names
+
+
+def load_samples():
+    """Загрузка реальных образцов вин в порядке признаков модели"""
+    columns = to_feature_names(load_wine_columns())
+    return np.column_stack([columns[name] for name in service.FEATURE_NAMES]).astype(np.float64)
+
+
+def make_legacy_scores():
+    """Прежний путь: масштабирование, затем predict и predict_proba по отдельности"""
+    model_dir = root_dir / service.active_model.path
+    model = joblib.load(model_dir / registry.MODEL_FILENAME)
+    scaler = joblib.load(model_dir / registry.SCALER_FILENAME)
+
+    def legacy_scores(features):
+        features_scaled = scaler.transform(features)
+        predictions = model.predict(features_scaled)
+        confidences = model.predict_proba(features_scaled).max(axis=1)
+        return predictions, confidences
+
+    return legacy_scores
+
+
+def measure(func, batches):
+    """Замер задержки каждого вызова в миллисекундах"""
+    timings = []
+    for features in batches:
+        start = time.perf_counter()
+        func(features)
+        timings.append((time.perf_counter() - start) * 1000)
+    return np.array(timings)
+
+
+def report(name, timings):
+    """Вывод p50/p99 задержки"""
+    p50, p99 = np.percentile(timings, [50, 99])
+    print(f"  {name:<28} p50 = {p50:8.3f} мс   p99 = {p99:8.3f} мс")
+    return p50, p99
+
+
+def main():
+    """Основная функция бенчмарка"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--repeats', type=int, default=200, help='число замеров на сценарий')
+    parser.add_argument('--batch-size', type=int, default=1000, help='размер пакета')
+    args = parser.parse_args()
+
+    if service.active_model is None:
+        print("❌ Модель не загружена, сначала запустите scripts/train_model.py")
+        sys.exit(1)
+
+    print(f"Модель сервиса: {type(service.active_model.model).__name__} "
+          f"(версия: {service.active_model.version or 'models/'})")
+    legacy_scores = make_legacy_scores()
+    samples = load_samples()
+    rng = np.random.default_rng(42)
+
+    scenarios = {
+        'одиночный запрос': 1,
+        f'пакет из {args.batch_size}': args.batch_size,
+    }
+
+    for title, size in scenarios.items():
+        batches = [samples[rng.integers(0, len(samples), size)] for _ in range(args.repeats)]
+
+        # Проверяем, что оба пути дают одинаковые ответы
+        legacy_pred, legacy_conf = legacy_scores(batches[0])
+        pred, conf, _ = service.score_features(batches[0])
+        assert np.array_equal(legacy_pred, pred) and np.allclose(legacy_conf, conf)
+
+        # Прогрев
+        measure(legacy_scores, batches[:5])
+        measure(service.score_features, batches[:5])
+
+        print(f"\n📊 {title} ({args.repeats} замеров):")
+        legacy_p50, legacy_p99 = report('predict + predict_proba', measure(legacy_scores, batches))
+        core_p50, core_p99 = report('ядро сервиса', measure(service.score_features, batches))
+        print(f"  Ускорение: p50 x{legacy_p50 / core_p50:.2f}, p99 x{legacy_p99 / core_p99:.2f}")
+
+
+if __name__ == "__main__":
+    main()
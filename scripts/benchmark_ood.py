@@ -0,0 +1,69 @@
+"""
+Бенчмарк оценки входов вне распределения и учета дрейфа
+
+Замеряется InputMonitor.assess (wine_quality/drift.py) - то, что сервис
+добавляет к каждому предсказанию, - рядом с инференсом активной модели на тех
+же матрицах: одиночный образец и пакеты разного размера.
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+# Добавляем корневую директорию в путь
+root_dir = Path(__file__).parent.parent
+sys.path.append(str(root_dir))
+
+from api import service
+from wine_quality import FEATURE_NAMES
+from wine_quality.drift import InputMonitor, input_distribution
+
+
+def measure(func, batches):
+    """Задержки вызовов в миллисекундах"""
+    func(batches[0])
+    timings = []
+    for features in batches:
+        start = time.perf_counter()
+        func(features)
+        timings.append((time.perf_counter() - start) * 1000)
+    return np.array(timings)
+
+
+def main():
+    """Основная функция бенчмарка"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--repeats', type=int, default=100, help='число замеров на сценарий')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1, 100, 1000], help='размеры пакетов')
+    args = parser.parse_args()
+
+    loaded = service.current_model()
+    if loaded is None:
+        sys.exit("❌ Модель не загружена")
+    columns = service.load_wine_data()
+    X = np.column_stack([np.asarray(columns[name], dtype=np.float64) for name in FEATURE_NAMES])
+    monitor = InputMonitor(input_distribution(dict(zip(FEATURE_NAMES, X.T))), FEATURE_NAMES)
+    rng = np.random.default_rng(42)
+
+    scores = monitor.score(X)
+    print(f"🍷 Порог расстояния Махаланобиса: {monitor.ood_distance:.3f}, "
+          f"вне распределения {np.mean(scores > 1):.2%} строк датасета")
+
+    for rows in args.sizes:
+        batches = [X[rng.integers(0, len(X), rows)] for _ in range(args.repeats)]
+        ood = np.percentile(measure(monitor.assess, batches), 50)
+        inference = np.percentile(measure(lambda features: service.score_features(features, loaded), batches), 50)
+        print(f"📊 {'одиночный образец' if rows == 1 else f'пакет из {rows}'}: "
+              f"OOD и дрейф {ood * 1000 / rows:7.2f} мкс/строка, "
+              f"инференс {inference * 1000 / rows:7.2f} мкс/строка ({ood / inference:.1%})")
+
+    summary = monitor.summary()
+    drifting = [name for name, info in summary['features'].items() if info['status'] != 'stable']
+    print(f"\nОкно: {summary['window_rows']} строк, признаки со сдвигом: {drifting or 'нет'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Бенчмарк тюнинга: прежний RandomizedSearchCV против successive halving с Optuna
+
+Для каждой модели с пространством поиска (scripts/train_model.py) оба способа
+перебирают одинаковое число конфигураций на одних и тех же данных и фолдах.
+Выводится время, лучший CV score и точность итоговой модели на валидационной
+выборке. Последняя строка - повторный запуск halving с тем же файлом
+исследования: он продолжает исследование, а не начинает заново.
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import accuracy_score
+from sklearn.model_selection import RandomizedSearchCV
+
+# Добавляем корневую директорию в путь
+root_dir = Path(__file__).parent.parent
+sys.path.append(str(root_dir))
+
+from wine_quality.tuning import tune_successive_halving
+
+from train_model import (LIGHTGBM_AVAILABLE, XGBOOST_AVAILABLE, load_and_prepare_data,
+                         scale_features, split_data, tuning_param_grid)
+
+
+def candidate_models():
+    """Модели, для которых определено пространство поиска"""
+    models = {'RandomForest': RandomForestClassifier(random_state=42, n_jobs=-1)}
+    if XGBOOST_AVAILABLE:
+        import xgboost as xgb
+        models['XGBoost'] = xgb.XGBClassifier(random_state=42, eval_metric='mlogloss')
+    if LIGHTGBM_AVAILABLE:
+        import lightgbm as lgb
+        models['LightGBM'] = lgb.LGBMClassifier(random_state=42, verbose=-1)
+    return models
+
+
+def report(title, seconds, cv_score, val_accuracy, note=''):
+    """Строка таблицы результатов"""
+    print(f"  {title:<22} {seconds:8.1f} с   CV = {cv_score:.4f}   Val = {val_accuracy:.4f}   {note}")
+
+
+def main():
+    """Основная функция бенчмарка"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--trials', type=int, default=30, help='число конфигураций')
+    args = parser.parse_args()
+
+    wine_data = load_and_prepare_data()
+    X_train, X_val, X_test, y_train, y_val, y_test = split_data(wine_data)
+    X_train, X_val, X_test, _ = scale_features(X_train, X_val, X_test)
+
+    for name, estimator in candidate_models().items():
+        param_grid = tuning_param_grid(name)
+        print(f"\n📊 {name}, конфигураций: {args.trials}")
+
+        start = time.perf_counter()
+        search = RandomizedSearchCV(estimator, param_grid, n_iter=args.trials, cv=3,
+                                    scoring='accuracy', random_state=42, n_jobs=-1)
+        search.fit(X_train, y_train)
+        report('RandomizedSearchCV', time.perf_counter() - start, search.best_score_,
+               accuracy_score(y_val, search.best_estimator_.predict(X_val)))
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            storage_path = Path(tmp_dir) / 'optuna.db'
+            for title in ('successive halving', 'повторный запуск'):
+                result = tune_successive_halving(estimator, param_grid, X_train, y_train,
+                                                 n_trials=args.trials, cv=3,
+                                                 storage_path=storage_path, log=lambda message: None)
+                report(title, result['seconds'], result['best_score'],
+                       accuracy_score(y_val, result['model'].predict(X_val)),
+                       f"остановлено {result['pruned_trials']} из "
+                       f"{result['complete_trials'] + result['pruned_trials']}")
+
+
+if __name__ == "__main__":
+    main()
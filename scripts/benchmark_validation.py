@@ -0,0 +1,106 @@
+"""
+Бенчмарк проверки входа: схема признаков против прежнего цикла по образцам
+
+Прежняя проверка - цикл по образцам со списком отсутствующих признаков и
+np.array по строкам; она проверяла только наличие признаков и конечность.
+FeatureSchema (wine_quality/validation.py) дополнительно проверяет тип и
+диапазоны, а пакет без ошибок обрабатывает без цикла по признакам в Python.
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+# Добавляем корневую директорию в путь
+root_dir = Path(__file__).parent.parent
+sys.path.append(str(root_dir))
+
+from wine_quality import FEATURE_NAMES
+from wine_quality.data import load_wine_columns, to_feature_names
+from wine_quality.validation import FeatureSchema, feature_ranges
+
+
+def legacy_feature_matrix(samples):
+    """Прежняя проверка из api/service.py (до схемы признаков)"""
+    rows = []
+    valid_indices = []
+    errors = {}
+    for i, sample in enumerate(samples):
+        if not isinstance(sample, dict):
+            errors[i] = 'Образец должен быть объектом с признаками'
+            continue
+        missing_features = [f for f in FEATURE_NAMES if f not in sample]
+        if missing_features:
+            errors[i] = f'Отсутствуют признаки: {missing_features}'
+            continue
+        rows.append([sample[f] for f in FEATURE_NAMES])
+        valid_indices.append(i)
+
+    features = np.array(rows, dtype=np.float64).reshape(len(rows), len(FEATURE_NAMES))
+    finite = np.isfinite(features).all(axis=1)
+    if not finite.all():
+        for i in np.asarray(valid_indices)[~finite].tolist():
+            errors[i] = 'Признаки должны быть конечными числами'
+        valid_indices = [i for i, ok in zip(valid_indices, finite.tolist()) if ok]
+        features = features[finite]
+    return features, valid_indices, errors
+
+
+def measure(func, samples, repeats):
+    """Задержки вызовов в миллисекундах"""
+    func(samples)
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func(samples)
+        timings.append((time.perf_counter() - start) * 1000)
+    return np.array(timings)
+
+
+def report(name, timings, rows):
+    """Вывод p50/p99 и времени на строку"""
+    p50, p99 = np.percentile(timings, [50, 99])
+    print(f"  {name:<16} p50 = {p50:8.3f} мс   p99 = {p99:8.3f} мс   {p50 / rows * 1000:7.2f} мкс/строка")
+    return p50
+
+
+def main():
+    """Основная функция бенчмарка"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=10000, help='строк в пакете')
+    parser.add_argument('--repeats', type=int, default=50, help='число замеров на сценарий')
+    parser.add_argument('--invalid-share', type=float, default=0.01, help='доля некорректных строк')
+    args = parser.parse_args()
+
+    columns = to_feature_names(load_wine_columns())
+    X = np.column_stack([np.asarray(columns[name], dtype=np.float64) for name in FEATURE_NAMES])
+    schema = FeatureSchema(feature_ranges(dict(zip(FEATURE_NAMES, X.T))))
+    rng = np.random.default_rng(42)
+
+    # Образцы как после json.loads: словари с float
+    samples = [dict(zip(FEATURE_NAMES, row)) for row in X[rng.integers(0, len(X), args.rows)].tolist()]
+    broken = [dict(sample) for sample in samples]
+    for i in rng.choice(args.rows, max(1, int(args.rows * args.invalid_share)), replace=False).tolist():
+        broken[i][FEATURE_NAMES[i % len(FEATURE_NAMES)]] = float('nan')
+
+    scenarios = [
+        ('одиночный образец', samples[:1]),
+        (f'пакет из {args.rows}, все корректны', samples),
+        (f'пакет из {args.rows}, {args.invalid_share:.0%} некорректны', broken),
+    ]
+    for title, batch in scenarios:
+        legacy = legacy_feature_matrix(batch)
+        compiled = schema.validate(batch)
+        assert legacy[1] == compiled[1] and np.array_equal(legacy[0], compiled[0])
+
+        print(f"\n📊 {title}:")
+        legacy_p50 = report('прежний цикл', measure(legacy_feature_matrix, batch, args.repeats), len(batch))
+        schema_p50 = report('схема признаков', measure(schema.validate, batch, args.repeats), len(batch))
+        print(f"  Ускорение p50: x{legacy_p50 / schema_p50:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""
+Проверка графа импортов и времени запуска сервиса
+
+Точки входа сервиса (api.app и api.asgi) импортируются в чистом интерпретаторе.
+Скрипт завершается с кодом 1, если среди загруженных модулей есть тяжелые
+библиотеки обучения и анализа (pandas, scikit-learn, matplotlib и т.п.) или
+импорт дольше бюджета. Запускается при сборке образа (docker/Dockerfile),
+поэтому случайный импорт pandas в сервисе ломает сборку, а не холодный старт;
+тот же запрет проверяет tests/test_serving_imports.py.
+
+Модели без скомпилированного экспорта загружаются из pickle, для них
+scikit-learn и joblib разрешены: такой образ собирается с полным
+requirements.txt. Если модель не загрузилась (например, pickle-модель в образе
+с requirements-serving.txt, где нет scikit-learn), проверка тоже не проходит:
+такой образ никогда не станет готов. --allow-missing-model отключает это
+требование для проверки графа импортов без обученной модели.
+
+С --start дополнительно замеряется время от запуска сервера до первого
+успешного ответа /api/ready (модель загружена и прогрета).
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+import urllib.request
+from pathlib import Path
+
+# Добавляем корневую директорию в путь
+root_dir = Path(__file__).parent.parent
+sys.path.append(str(root_dir))
+
+ENTRY_POINTS = ('api.app', 'api.asgi')
+
+# Библиотеки, которых не должно быть в процессе сервиса
+FORBIDDEN_MODULES = (
+    'pandas', 'sklearn', 'scipy', 'joblib', 'matplotlib', 'seaborn', 'plotly',
+    'xgboost', 'lightgbm', 'catboost', 'optuna', 'shap', 'IPython', 'PIL',
+)
+
+# Нужны только для загрузки модели из pickle
+PICKLE_MODEL_MODULES = ('sklearn', 'scipy', 'joblib', 'xgboost', 'lightgbm', 'catboost')
+
+# Бюджеты по умолчанию, секунды
+IMPORT_BUDGET = 1.5
+START_BUDGET = 5.0
+
+HOST = '127.0.0.1'
+
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - start
+from api import service
+loaded = service.active_model
+print(json.dumps({{
+    'seconds': seconds,
+    'modules': sorted({{name.split('.')[0] for name in sys.modules}}),
+    'model_loaded': loaded is not None,
+    'compiled': loaded is not None and loaded.scaler is None,
+}}))
+"""
+
+
+def probe_import(module):
+    """Импорт точки входа в отдельном интерпретаторе"""
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, '-c', _PROBE.format(module=module)], cwd=root_dir,
+                            capture_output=True, text=True, env=dict(os.environ, PYTHONPATH=str(root_dir)))
+    if result.returncode != 0:
+        raise RuntimeError(f"Импорт {module} завершился ошибкой:\n{result.stderr}")
+    report = json.loads(result.stdout.strip().splitlines()[-1])
+    report['process_seconds'] = time.perf_counter() - start
+    # Причина незагруженной модели - в журнале сервиса
+    report['model_error'] = next((line for line in reversed(result.stderr.splitlines())
+                                  if 'Ошибка загрузки модели' in line), None)
+    return report
+
+
+def forbidden_imports(report):
+    """Запрещенные библиотеки в отчете probe_import
+
+    Библиотеки из PICKLE_MODEL_MODULES разрешены, если модель загружена из pickle.
+    """
+    allowed = set(PICKLE_MODEL_MODULES) if report['model_loaded'] and not report['compiled'] else set()
+    return [name for name in FORBIDDEN_MODULES if name in report['modules'] and name not in allowed]
+
+
+def check_imports(budget, require_model=True):
+    """Проверка всех точек входа; список нарушений"""
+    failures = []
+    for module in ENTRY_POINTS:
+        report = probe_import(module)
+        heavy = [name for name in FORBIDDEN_MODULES if name in report['modules']]
+        forbidden = forbidden_imports(report)
+
+        model = 'скомпилированная' if report['compiled'] else 'pickle' if report['model_loaded'] else 'не загружена'
+        print(f"  {module:<10} импорт {report['seconds']:6.3f} с, процесс {report['process_seconds']:6.3f} с, "
+              f"модулей {len(report['modules'])}, модель: {model}")
+        if heavy and not forbidden:
+            print(f"  ⚠️  модель из pickle загружает {', '.join(heavy)}; "
+                  f"для легкого образа экспортируйте компилируемую модель")
+        if forbidden:
+            failures.append(f"{module} импортирует {', '.join(forbidden)}")
+        if require_model and not report['model_loaded']:
+            failures.append(f"{module}: модель не загружена ({report['model_error'] or 'причина не записана в журнал'})")
+        if report['seconds'] > budget:
+            failures.append(f"импорт {module} занял {report['seconds']:.3f} с при бюджете {budget} с")
+    return failures
+
+
+def measure_start(server, port, budget):
+    """Время от запуска сервера до готовности (/api/ready)"""
+    if server == 'gunicorn':
+        command = [sys.executable, '-m', 'gunicorn', '--config', 'docker/gunicorn.conf.py', 'api.app:app']
+    else:
+        command = [sys.executable, '-m', 'uvicorn', 'api.asgi:app', '--host', HOST, '--port', str(port),
+                   '--log-level', 'warning']
+    env = dict(os.environ, GUNICORN_BIND=f'{HOST}:{port}', PYTHONPATH=str(root_dir))
+    start = time.perf_counter()
+    process = subprocess.Popen(command, cwd=root_dir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        deadline = start + max(budget * 4, 30)
+        while time.perf_counter() < deadline and process.poll() is None:
+            try:
+                with urllib.request.urlopen(f'http://{HOST}:{port}/api/ready', timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - start
+            except OSError:
+                time.sleep(0.05)
+        return None
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+
+def main():
+    """Основная функция проверки"""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--budget', type=float, default=IMPORT_BUDGET, help='бюджет импорта точки входа, с')
+    parser.add_argument('--start', choices=['gunicorn', 'uvicorn'], help='замерить запуск сервера')
+    parser.add_argument('--start-budget', type=float, default=START_BUDGET, help='бюджет запуска сервера, с')
+    parser.add_argument('--port', type=int, default=5099)
+    parser.add_argument('--allow-missing-model', action='store_true',
+                        help='не требовать загруженной модели (проверка только графа импортов)')
+    args = parser.parse_args()
+
+    print("🔍 Импорт точек входа сервиса:")
+    failures = check_imports(args.budget, require_model=not args.allow_missing_model)
+
+    if args.start:
+        seconds = measure_start(args.start, args.port, args.start_budget)
+        if seconds is None:
+            failures.append(f"{args.start} не ответил на /api/ready")
+        else:
+            print(f"  {args.start}: /api/ready отвечает через {seconds:.2f} с после запуска")
+            if seconds > args.start_budget:
+                failures.append(f"запуск {args.start} занял {seconds:.2f} с при бюджете {args.start_budget} с")
+
+    if failures:
+        for failure in failures:
+            print(f"❌ {failure}")
+        sys.exit(1)
+    print("✅ Граф импортов и время запуска в пределах бюджета")
+
+
+if __name__ == "__main__":
+    main()
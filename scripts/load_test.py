@@ -0,0 +1,203 @@
+"""
+Нагрузочный тест: Flask приложение под gunicorn против ASGI приложения под uvicorn
+
+Оба сервера запускаются с одинаковым числом процессов. Сценарии:
+- много параллельных клиентов с одиночными запросами /api/predict;
+- медленные клиенты, которые открывают соединение и передают тело запроса
+  по байту, пока остальные клиенты шлют обычные запросы;
+- большие пакеты /api/predict/batch.
+
+Клиент написан на asyncio без сторонних библиотек и сам может стать узким
+местом при очень большом числе соединений; в этом случае запускайте его на
+отдельной машине.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+import urllib.request
+from pathlib import Path
+
+import numpy as np
+
+root_dir = Path(__file__).parent.parent
+
+SAMPLE_WINE = {
+    'fixed_acidity': 7.4, 'volatile_acidity': 0.7, 'citric_acid': 0.0,
+    'residual_sugar': 1.9, 'chlorides': 0.076, 'free_sulfur_dioxide': 11.0,
+    'total_sulfur_dioxide': 34.0, 'density': 0.9978, 'pH': 3.51,
+    'sulphates': 0.56, 'alcohol': 9.4, 'wine_type_red': 1
+}
+
+HOST = '127.0.0.1'
+
+
+def server_commands(workers, port):
+    """Командные строки серверов"""
+    return {
+        'Flask (gunicorn)': [sys.executable, '-m', 'gunicorn', '--config', 'docker/gunicorn.conf.py', 'api.app:app'],
+        'ASGI (uvicorn)': [sys.executable, '-m', 'uvicorn', 'api.asgi:app', '--host', HOST,
+                           '--port', str(port), '--workers', str(workers), '--log-level', 'warning'],
+    }
+
+
+def wait_ready(url, timeout):
+    """Ожидание готовности сервиса (/api/ready)"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(f'{url}/api/ready', timeout=2) as response:
+                if response.status == 200:
+                    return True
+        except OSError:
+            time.sleep(0.5)
+    return False
+
+
+async def http_post(port, path, body, timeout):
+    """POST запрос в отдельном соединении; возвращает HTTP статус"""
+    async def exchange():
+        reader, writer = await asyncio.open_connection(HOST, port)
+        try:
+            head = (f'POST {path} HTTP/1.1\r\nHost: {HOST}\r\nContent-Type: application/json\r\n'
+                    f'Content-Length: {len(body)}\r\nConnection: close\r\n\r\n')
+            writer.write(head.encode() + body)
+            await writer.drain()
+            status_line = await reader.readline()
+            await reader.read()
+            return int(status_line.split()[1])
+        finally:
+            writer.close()
+
+    return await asyncio.wait_for(exchange(), timeout)
+
+
+async def run_clients(port, path, body, clients, requests_per_client, timeout):
+    """Параллельные клиенты; возвращает задержки успешных запросов и число ошибок"""
+    latencies = []
+    errors = 0
+
+    async def client():
+        nonlocal errors
+        for _ in range(requests_per_client):
+            start = time.perf_counter()
+            try:
+                status = await http_post(port, path, body, timeout)
+            except (OSError, asyncio.TimeoutError, ValueError, IndexError):
+                status = None
+            if status == 200:
+                latencies.append((time.perf_counter() - start) * 1000)
+            else:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(clients)))
+    return np.array(latencies), errors, time.perf_counter() - start
+
+
+async def slow_client(port, body, stop):
+    """Клиент, передающий тело запроса по одному байту в секунду"""
+    try:
+        reader, writer = await asyncio.open_connection(HOST, port)
+    except OSError:
+        return
+    try:
+        head = (f'POST /api/predict HTTP/1.1\r\nHost: {HOST}\r\nContent-Type: application/json\r\n'
+                f'Content-Length: {len(body)}\r\nConnection: close\r\n\r\n')
+        writer.write(head.encode())
+        for byte in body:
+            if stop.is_set():
+                break
+            writer.write(bytes([byte]))
+            await writer.drain()
+            await asyncio.sleep(1)
+    except OSError:
+        pass
+    finally:
+        writer.close()
+
+
+async def scenario_slow_clients(port, body, slow, clients, requests_per_client, timeout):
+    """Обычные запросы на фоне медленных клиентов"""
+    stop = asyncio.Event()
+    slow_tasks = [asyncio.ensure_future(slow_client(port, body, stop)) for _ in range(slow)]
+    await asyncio.sleep(1)
+    try:
+        return await run_clients(port, '/api/predict', body, clients, requests_per_client, timeout)
+    finally:
+        stop.set()
+        await asyncio.gather(*slow_tasks, return_exceptions=True)
+
+
+def report(title, latencies, errors, elapsed):
+    """Вывод пропускной способности и задержек"""
+    total = len(latencies) + errors
+    if len(latencies):
+        p50, p99 = np.percentile(latencies, [50, 99])
+        print(f"  {title:<34} {len(latencies) / elapsed:8.1f} RPS   p50 = {p50:8.1f} мс   "
+              f"p99 = {p99:8.1f} мс   ошибок: {errors}/{total}")
+    else:
+        print(f"  {title:<34} нет успешных запросов, ошибок: {errors}/{total}")
+
+
+def run_server_scenarios(args, port):
+    """Все сценарии против одного запущенного сервера"""
+    single = json.dumps(SAMPLE_WINE).encode()
+    batch = json.dumps({'samples': [SAMPLE_WINE] * args.batch_size}).encode()
+
+    latencies, errors, elapsed = asyncio.run(run_clients(
+        port, '/api/predict', single, args.clients, args.requests, args.timeout))
+    report(f'{args.clients} параллельных клиентов', latencies, errors, elapsed)
+
+    latencies, errors, elapsed = asyncio.run(scenario_slow_clients(
+        port, single, args.slow_clients, args.clients // 4 or 1, args.requests, args.timeout))
+    report(f'+ {args.slow_clients} медленных клиентов', latencies, errors, elapsed)
+
+    latencies, errors, elapsed = asyncio.run(run_clients(
+        port, '/api/predict/batch', batch, args.batch_clients, 5, args.timeout))
+    report(f'пакеты по {args.batch_size}', latencies, errors, elapsed)
+
+
+def main():
+    """Основная функция нагрузочного теста"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--workers', type=int, default=4, help='число процессов сервера')
+    parser.add_argument('--port', type=int, default=5056, help='порт для запуска')
+    parser.add_argument('--clients', type=int, default=200, help='число параллельных клиентов')
+    parser.add_argument('--requests', type=int, default=20, help='запросов на клиента')
+    parser.add_argument('--slow-clients', type=int, default=64, help='число медленных клиентов')
+    parser.add_argument('--batch-size', type=int, default=5000, help='размер пакета')
+    parser.add_argument('--batch-clients', type=int, default=16, help='клиентов с пакетами')
+    parser.add_argument('--timeout', type=float, default=10.0, help='таймаут запроса, с')
+    args = parser.parse_args()
+
+    url = f'http://{HOST}:{args.port}'
+    env = dict(os.environ, GUNICORN_WORKERS=str(args.workers), GUNICORN_BIND=f'{HOST}:{args.port}',
+               PYTHONPATH=str(root_dir))
+
+    print(f"🍷 Нагрузочный тест, процессов сервера: {args.workers}")
+    for title, command in server_commands(args.workers, args.port).items():
+        process = subprocess.Popen(command, cwd=root_dir, env=env,
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            if not wait_ready(url, timeout=120):
+                print(f"❌ {title}: сервер не ответил на /api/ready")
+                continue
+            print(f"\n📊 {title}:")
+            run_server_scenarios(args, args.port)
+        finally:
+            process.send_signal(signal.SIGTERM)
+            try:
+                process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+
+
+if __name__ == "__main__":
+    main()
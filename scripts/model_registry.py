@@ -0,0 +1,66 @@
+"""
+Управление реестром версий модели: список версий и переключение активной
+
+Переключение меняет только указатель models/CURRENT. Запущенный сервис
+замечает его в течение MODEL_WATCH_INTERVAL секунд, загружает и прогревает
+версию в фоне и переключается на нее без перезапуска воркеров; текущую
+версию воркера показывает GET /api/admin/model.
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+# Добавляем корневую директорию в путь
+root_dir = Path(__file__).parent.parent
+sys.path.append(str(root_dir))
+
+from wine_quality import registry
+
+MODELS_DIR = root_dir / "models"
+
+
+def show_versions():
+    """Вывод версий с основными метриками"""
+    current = registry.current_version(MODELS_DIR)
+    versions = registry.list_versions(MODELS_DIR)
+    if not versions:
+        print("Реестр пуст, сначала запустите scripts/train_model.py")
+        return
+
+    print(f"{'':2}{'версия':<20} {'модель':<24} {'test acc':>9} {'строк':>7}  родитель")
+    for version in versions:
+        try:
+            with open(registry.version_dir(MODELS_DIR, version) / registry.METADATA_FILENAME) as f:
+                metadata = json.load(f)
+        except (OSError, ValueError):
+            metadata = {}
+        marker = '* ' if version == current else '  '
+        print(f"{marker}{version:<20} {metadata.get('model_type', '?'):<24} "
+              f"{metadata.get('test_accuracy', float('nan')):>9.4f} "
+              f"{metadata.get('data_shape', ['?'])[0]:>7}  {metadata.get('parent_version') or ''}")
+
+
+def main():
+    """Основная функция"""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('list', help='список версий (* - активная)')
+    activate = subparsers.add_parser('activate', help='сделать версию активной (в том числе откат)')
+    activate.add_argument('version', help='имя версии')
+    args = parser.parse_args()
+
+    if args.command == 'list':
+        show_versions()
+    else:
+        try:
+            registry.set_current(MODELS_DIR, args.version)
+        except ValueError as e:
+            print(f"❌ {e}")
+            sys.exit(1)
+        print(f"✅ Активная версия: {args.version}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,12 @@
 import pandas as pd
 import numpy as np
 import joblib
+import argparse
 import json
 import os
+import shutil
 import sys
+import time
 from pathlib import Path
 import warnings
 warnings.filterwarnings('ignore')
@@ -12,7 +15,16 @@ warnings.filterwarnings('ignore')
 root_dir = Path(__file__).parent.parent
 sys.path.append(str(root_dir))
 
-from sklearn.model_selection import train_test_split, RandomizedSearchCV, cross_val_score
+from wine_quality import registry
+from wine_quality.compiled import export_compiled_model, load_compiled_model, model_kind
+from wine_quality.data import load_wine_frame, to_feature_name
+from wine_quality.drift import input_distribution
+from wine_quality.profiling import TrainingProfiler, fits_per_fit
+from wine_quality.tuning import tune_successive_halving
+from wine_quality.validation import feature_ranges
+from wine_quality.zoo import train_candidates
+
+from sklearn.model_selection import train_test_split, RandomizedSearchCV
 from sklearn.preprocessing import StandardScaler
 from sklearn.ensemble import RandomForestClassifier, GradientBoostingClassifier
 from sklearn.linear_model import LogisticRegression
@@ -38,6 +50,21 @@ except ImportError:
     print("⚠️  LightGBM недоступен. Используем только стандартные алгоритмы sklearn.")
     LIGHTGBM_AVAILABLE = False
 
+try:
+    import optuna
+    OPTUNA_AVAILABLE = True
+except ImportError:
+    OPTUNA_AVAILABLE = False
+
+# Кэш обученных кандидатов (ключ - хэш данных и параметров модели)
+ZOO_CACHE_DIR = root_dir / "models" / "zoo_cache"
+
+# Исследования Optuna: повторный тюнинг на тех же данных продолжает их
+TUNING_STORAGE_PATH = root_dir / "models" / "tuning" / "optuna.db"
+
+# Отчеты профилирования (--profile): <версия>.json, .html и .prof
+PROFILES_DIR = root_dir / "models" / "profiles"
+
 def load_and_prepare_data():
     """Загрузка и подготовка данных"""
     print("Загрузка данных...")
@@ -55,23 +82,12 @@ def load_and_prepare_data():
         print("и поместите файлы winequality-red.csv и winequality-white.csv в папку data/")
         sys.exit(1)
     
-    red_wine = pd.read_csv(red_wine_path, sep=';')
-    white_wine = pd.read_csv(white_wine_path, sep=';')
-    
-    # Добавляем тип вина
-    red_wine['wine_type'] = 'red'
-    white_wine['wine_type'] = 'white'
-    
-    # Объединяем датасеты
-    wine_data = pd.concat([red_wine, white_wine], ignore_index=True)
-    
-    # Создаем числовую версию
-    wine_numeric = wine_data.copy()
-    wine_numeric['wine_type_red'] = (wine_numeric['wine_type'] == 'red').astype(int)
-    wine_numeric = wine_numeric.drop('wine_type', axis=1)
+    # Колоночный кэш избавляет от повторного разбора CSV
+    wine_numeric = load_wine_frame(data_dir)
+    red_count = int(wine_numeric['wine_type_red'].sum())
     
-    print(f"Загружено {len(wine_data)} образцов")
-    print(f"Красное вино: {len(red_wine)}, Белое вино: {len(white_wine)}")
+    print(f"Загружено {len(wine_numeric)} образцов")
+    print(f"Красное вино: {red_count}, Белое вино: {len(wine_numeric) - red_count}")
     
     return wine_numeric
 
@@ -127,7 +143,11 @@ def train_baseline_models(X_train, X_val, y_train, y_val):
     
     for name, model in models.items():
         print(f"  Обучение {name}...")
+        start = time.perf_counter()
+        cpu_start = time.process_time()
         model.fit(X_train, y_train)
+        fit_seconds = time.perf_counter() - start
+        cpu_seconds = time.process_time() - cpu_start
         
         train_acc = accuracy_score(y_train, model.predict(X_train))
         val_acc = accuracy_score(y_val, model.predict(X_val))
@@ -135,15 +155,23 @@ def train_baseline_models(X_train, X_val, y_train, y_val):
         results[name] = {
             'model': model,
             'train_accuracy': train_acc,
-            'val_accuracy': val_acc
+            'val_accuracy': val_acc,
+            'fit_seconds': fit_seconds,
+            'cpu_seconds': cpu_seconds,
+            'fits': fits_per_fit(model),
+            'from_cache': False
         }
         
         print(f"    Val Accuracy: {val_acc:.4f}")
     
     return results
 
-def train_advanced_models(X_train, X_val, y_train, y_val):
-    """Обучение продвинутых моделей"""
+def train_advanced_models(X_train, X_val, y_train, y_val, workers=None, budget=None, use_cache=True):
+    """Обучение продвинутых моделей
+    
+    Кандидаты и фолды кросс-валидации обучаются параллельно в пуле процессов,
+    неизмененные кандидаты берутся из кэша.
+    """
     print("\nОбучение продвинутых моделей...")
     
     models = {
@@ -161,40 +189,19 @@ def train_advanced_models(X_train, X_val, y_train, y_val):
     if LIGHTGBM_AVAILABLE:
         models['LightGBM'] = lgb.LGBMClassifier(random_state=42, verbose=-1)
     
-    results = {}
+    print(f"  Кандидатов: {len(models)}, процессов: {workers or os.cpu_count()}"
+          + (f", бюджет на кандидата: {budget} с" if budget else ""))
     
-    for name, model in models.items():
-        print(f"  Обучение {name}...")
-        
-        try:
-            model.fit(X_train, y_train)
-            
-            train_acc = accuracy_score(y_train, model.predict(X_train))
-            val_acc = accuracy_score(y_val, model.predict(X_val))
-            
-            # Кросс-валидация
-            cv_scores = cross_val_score(model, X_train, y_train, cv=3, scoring='accuracy')
-            
-            results[name] = {
-                'model': model,
-                'train_accuracy': train_acc,
-                'val_accuracy': val_acc,
-                'cv_mean': cv_scores.mean(),
-                'cv_std': cv_scores.std()
-            }
-            
-            print(f"    Val Accuracy: {val_acc:.4f} (CV: {cv_scores.mean():.4f}±{cv_scores.std():.4f})")
-            
-        except Exception as e:
-            print(f"    Ошибка при обучении {name}: {e}")
-            continue
+    results = train_candidates(
+        models, X_train, y_train, X_val, y_val, cv=3,
+        max_workers=workers, budgets=budget,
+        cache_dir=ZOO_CACHE_DIR if use_cache else None
+    )
     
     return results
 
-def tune_best_model(best_model, model_name, X_train, y_train):
-    """Тюнинг гиперпараметров лучшей модели"""
-    print(f"\nТюнинг гиперпараметров для {model_name}...")
-    
+def tuning_param_grid(model_name):
+    """Пространство поиска гиперпараметров модели или None"""
     if model_name == 'XGBoost' and XGBOOST_AVAILABLE:
         param_grid = {
             'n_estimators': [100, 200, 300],
@@ -218,21 +225,57 @@ def tune_best_model(best_model, model_name, X_train, y_train):
             'num_leaves': [31, 50, 100]
         }
     else:
-        print(f"  Параметры для {model_name} не определены, используем базовую модель")
-        return best_model
+        return None
     
-    # Randomized search для экономии времени
-    random_search = RandomizedSearchCV(
-        best_model, param_grid, n_iter=30, cv=3,
-        scoring='accuracy', random_state=42, n_jobs=-1
-    )
+    return param_grid
+
+def tune_best_model(best_model, model_name, X_train, y_train, method='halving', n_trials=30, profiler=None):
+    """Тюнинг гиперпараметров лучшей модели
     
-    random_search.fit(X_train, y_train)
+    method='halving' - successive halving по числу деревьев с исследованием
+    Optuna в TUNING_STORAGE_PATH, method='random' - RandomizedSearchCV.
+    Число обучений учитывается в profiler, если он передан.
+    """
+    print(f"\nТюнинг гиперпараметров для {model_name}...")
     
-    print(f"  Лучший CV score: {random_search.best_score_:.4f}")
-    print(f"  Лучшие параметры: {random_search.best_params_}")
+    param_grid = tuning_param_grid(model_name)
+    if param_grid is None:
+        print(f"  Параметры для {model_name} не определены, используем базовую модель")
+        return best_model
     
-    return random_search.best_estimator_
+    if method == 'halving' and not OPTUNA_AVAILABLE:
+        print("  ⚠️  Optuna недоступна, используем RandomizedSearchCV")
+        method = 'random'
+    
+    start = time.perf_counter()
+    if method == 'halving':
+        result = tune_successive_halving(
+            best_model, param_grid, X_train, y_train, n_trials=n_trials, cv=3,
+            storage_path=TUNING_STORAGE_PATH, random_state=42
+        )
+        print(f"  Испытаний: {result['complete_trials']} завершено, "
+              f"{result['pruned_trials']} остановлено на малом числе деревьев")
+        best_estimator, best_score, best_params = result['model'], result['best_score'], result['best_params']
+        fits = result['fits'] * fits_per_fit(best_model)
+    else:
+        # Randomized search для экономии времени
+        random_search = RandomizedSearchCV(
+            best_model, param_grid, n_iter=n_trials, cv=3,
+            scoring='accuracy', random_state=42, n_jobs=-1
+        )
+        random_search.fit(X_train, y_train)
+        best_estimator, best_score, best_params = (
+            random_search.best_estimator_, random_search.best_score_, random_search.best_params_)
+        # Каждая конфигурация на каждом фолде и обучение лучшей на всей выборке
+        fits = (len(random_search.cv_results_['params']) * 3 + 1) * fits_per_fit(best_model)
+    
+    print(f"  Лучший CV score: {best_score:.4f}")
+    print(f"  Лучшие параметры: {best_params}")
+    print(f"  Время тюнинга: {time.perf_counter() - start:.1f} с, обучений: {fits}")
+    if profiler is not None:
+        profiler.add_fits(fits)
+    
+    return best_estimator
 
 def evaluate_final_model(model, X_test, y_test, y):
     """Финальная оценка модели"""
@@ -252,69 +295,189 @@ def evaluate_final_model(model, X_test, y_test, y):
     
     return test_accuracy, roc_auc
 
-def save_model_and_artifacts(model, scaler, metadata, model_name):
-    """Сохранение модели и артефактов"""
+def export_fused_model(model, scaler, X_test, output_dir):
+    """Экспорт модели со вложенным скейлером и сверка с исходным конвейером"""
+    kind = model_kind(model)
+    if kind is None:
+        # Удаляем старый экспорт, чтобы сервис не использовал устаревшую модель
+        shutil.rmtree(output_dir, ignore_errors=True)
+        print(f"{type(model).__name__} не поддерживает компиляцию, сервис будет использовать pickle")
+        return None
+    
+    compiled_meta = export_compiled_model(model, scaler, output_dir)
+    fused = load_compiled_model(output_dir)
+    
+    # Эталон: scaler.transform + predict_proba. Деревья суммируются
+    # последовательно только при n_jobs=1, поэтому сравниваем в этом режиме
+    params = model.get_params()
+    if 'n_jobs' in params:
+        model.set_params(n_jobs=1)
+    reference = model.predict_proba(scaler.transform(X_test))
+    if 'n_jobs' in params:
+        model.set_params(n_jobs=params['n_jobs'])
+    
+    fused_proba = fused.predict_proba(X_test.to_numpy(dtype=np.float64))
+    max_difference = float(np.abs(fused_proba - reference).max())
+    same_labels = np.array_equal(fused_proba.argmax(axis=1), reference.argmax(axis=1))
+    
+    # Для деревьев вложение порогов точное, для остальных моделей допускаем ошибку округления
+    if kind == 'forest':
+        verified = np.array_equal(fused_proba, reference)
+    elif kind == 'neighbors':
+        # При равных расстояниях до k-го и следующего соседа выбор соседа произволен,
+        # расхождения допустимы только в таких строках
+        distances, _ = model.kneighbors(scaler.transform(X_test), n_neighbors=model.n_neighbors + 1)
+        ties = np.isclose(distances[:, -2], distances[:, -1], rtol=1e-9, atol=0)
+        differs = ~np.isclose(fused_proba, reference, rtol=1e-9, atol=1e-12).all(axis=1)
+        verified = not (differs & ~ties).any()
+    else:
+        verified = same_labels and np.allclose(fused_proba, reference, rtol=1e-9, atol=1e-12)
+    
+    if not verified:
+        shutil.rmtree(output_dir, ignore_errors=True)
+        print(f"❌ Модель со вложенным скейлером расходится с исходной (max |Δp| = {max_difference:.2e}), экспорт удален")
+        return None
+    
+    print(f"Сверка на тестовой выборке ({len(X_test)} образцов): max |Δp| = {max_difference:.2e}")
+    return {
+        'kind': kind,
+        'scaler_fused': True,
+        'verified_samples': int(len(X_test)),
+        'max_probability_difference': max_difference,
+        **{key: compiled_meta[key] for key in ('n_trees', 'n_nodes', 'max_depth', 'n_support_vectors', 'n_samples_fit')
+           if key in compiled_meta}
+    }
+
+def save_model_and_artifacts(model, scaler, metadata, model_name, X_test, models_dir=None):
+    """Сохранение модели и артефактов новой версией в реестре и ее активация
+    
+    Версия собирается в models/versions/ (по умолчанию в models/ проекта) и
+    становится активной подменой указателя CURRENT; сервис подхватывает ее без
+    перезапуска. Возвращает имя версии.
+    """
     print("\nСохранение модели...")
     
-    # Создаем директорию для моделей
-    models_dir = root_dir / "models"
-    models_dir.mkdir(exist_ok=True)
-    
-    # Сохраняем модель и скейлер
-    joblib.dump(model, models_dir / "best_wine_model.pkl")
-    joblib.dump(scaler, models_dir / "scaler.pkl")
-    
-    # Преобразуем метаданные в JSON-сериализуемый формат
-    def convert_to_serializable(obj):
-        """Преобразует объекты NumPy в стандартные типы Python"""
-        if isinstance(obj, np.integer):
-            return int(obj)
-        elif isinstance(obj, np.floating):
-            return float(obj)
-        elif isinstance(obj, np.ndarray):
-            return obj.tolist()
-        elif isinstance(obj, dict):
-            return {key: convert_to_serializable(value) for key, value in obj.items()}
-        elif isinstance(obj, list):
-            return [convert_to_serializable(item) for item in obj]
-        elif isinstance(obj, tuple):
-            return tuple(convert_to_serializable(item) for item in obj)
-        else:
-            return obj
-    
-    # Применяем преобразование к метаданным
-    serializable_metadata = convert_to_serializable(metadata)
-    
-    # Сохраняем метаданные
-    with open(models_dir / "model_metadata.json", 'w') as f:
-        json.dump(serializable_metadata, f, indent=2)
-    
-    print(f"Модель сохранена в {models_dir / 'best_wine_model.pkl'}")
-    print(f"Скейлер сохранен в {models_dir / 'scaler.pkl'}")
-    print(f"Метаданные сохранены в {models_dir / 'model_metadata.json'}")
+    # Создаем директорию для моделей и новую версию в реестре
+    models_dir = Path(models_dir) if models_dir else root_dir / "models"
+    models_dir.mkdir(parents=True, exist_ok=True)
+    version, version_dir = registry.create_version(models_dir)
+    metadata['version'] = version
+    
+    try:
+        # Сохраняем модель и скейлер
+        joblib.dump(model, version_dir / registry.MODEL_FILENAME)
+        joblib.dump(scaler, version_dir / registry.SCALER_FILENAME)
+        
+        # Модель для сервиса: скейлер вложен в пороги деревьев или коэффициенты
+        compiled_info = export_fused_model(model, scaler, X_test, version_dir / registry.COMPILED_DIRNAME)
+        if compiled_info is not None:
+            metadata['compiled_model'] = compiled_info
+        
+        # Преобразуем метаданные в JSON-сериализуемый формат
+        def convert_to_serializable(obj):
+            """Преобразует объекты NumPy в стандартные типы Python"""
+            if isinstance(obj, np.integer):
+                return int(obj)
+            elif isinstance(obj, np.floating):
+                return float(obj)
+            elif isinstance(obj, np.ndarray):
+                return obj.tolist()
+            elif isinstance(obj, dict):
+                return {key: convert_to_serializable(value) for key, value in obj.items()}
+            elif isinstance(obj, list):
+                return [convert_to_serializable(item) for item in obj]
+            elif isinstance(obj, tuple):
+                return tuple(convert_to_serializable(item) for item in obj)
+            else:
+                return obj
+        
+        # Применяем преобразование к метаданным
+        serializable_metadata = convert_to_serializable(metadata)
+        
+        # Сохраняем метаданные
+        with open(version_dir / registry.METADATA_FILENAME, 'w') as f:
+            json.dump(serializable_metadata, f, indent=2)
+    except BaseException:
+        registry.discard_version(models_dir, version)
+        raise
+    
+    # Версия неизменяема: появляется целиком и только затем становится активной
+    registry.publish_version(models_dir, version)
+    
+    version_dir = registry.version_dir(models_dir, version)
+    print(f"Модель сохранена в {version_dir / registry.MODEL_FILENAME}")
+    print(f"Скейлер сохранен в {version_dir / registry.SCALER_FILENAME}")
+    print(f"Метаданные сохранены в {version_dir / registry.METADATA_FILENAME}")
+    if compiled_info is not None:
+        print(f"Модель со вложенным скейлером сохранена в {version_dir / registry.COMPILED_DIRNAME}")
+    print(f"Активная версия: {version} ({models_dir / registry.CURRENT_FILENAME})")
+    return version
+
+def print_profile(profiler):
+    """Таблица этапов обучения"""
+    print("\nПрофиль обучения:")
+    print(f"  {'этап':<16} {'время, с':>9} {'CPU, с':>9} {'обучений':>9} {'пик RSS, МБ':>12}")
+    for record in profiler.stages:
+        rss = f"{record['peak_rss_mb']:12.1f}" if record['peak_rss_mb'] is not None else f"{'—':>12}"
+        print(f"  {record['name']:<16} {record['wall_seconds']:9.2f} {record['cpu_seconds']:9.2f} "
+              f"{record['fits']:9d} {rss}")
 
 def main():
     """Основная функция обучения"""
+    parser = argparse.ArgumentParser(description="Обучение модели качества вина")
+    parser.add_argument('--workers', type=int, default=None,
+                        help='число процессов для обучения кандидатов (по умолчанию - число ядер)')
+    parser.add_argument('--budget', type=float, default=None,
+                        help='бюджет времени на одно обучение кандидата, с')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='обучить всех кандидатов заново, не используя кэш')
+    parser.add_argument('--tuning', choices=['halving', 'random'], default='halving',
+                        help='successive halving с Optuna или RandomizedSearchCV')
+    parser.add_argument('--tune-trials', type=int, default=30,
+                        help='число конфигураций при тюнинге')
+    parser.add_argument('--profile', action='store_true',
+                        help='подробное профилирование: пик памяти по этапам и отчет в models/profiles/')
+    parser.add_argument('--cprofile', action='store_true',
+                        help='сохранить профиль cProfile самого долгого этапа (вместе с --profile)')
+    args = parser.parse_args()
+    
     print("=== НАЧАЛО ОБУЧЕНИЯ МОДЕЛИ ===")
     print(f"Время начала: {datetime.now()}")
     
+    # Время, процессорное время и число обучений по этапам
+    profiler = TrainingProfiler(memory=args.profile, cprofile=args.cprofile)
+    
     # Загрузка и подготовка данных
-    wine_data = load_and_prepare_data()
+    with profiler.stage('load_data'):
+        wine_data = load_and_prepare_data()
     
     # Разделение данных
-    X_train, X_val, X_test, y_train, y_val, y_test = split_data(wine_data)
+    with profiler.stage('split'):
+        X_train, X_val, X_test, y_train, y_val, y_test = split_data(wine_data)
     
     # Масштабирование
-    X_train_scaled, X_val_scaled, X_test_scaled, scaler = scale_features(X_train, X_val, X_test)
+    with profiler.stage('scaling'):
+        X_train_scaled, X_val_scaled, X_test_scaled, scaler = scale_features(X_train, X_val, X_test)
     
     # Обучение baseline моделей
-    baseline_results = train_baseline_models(X_train_scaled, X_val_scaled, y_train, y_val)
+    with profiler.stage('baseline_models'):
+        baseline_results = train_baseline_models(X_train_scaled, X_val_scaled, y_train, y_val)
+        profiler.add_fits(sum(result['fits'] for result in baseline_results.values()))
     
     # Обучение продвинутых моделей
-    advanced_results = train_advanced_models(X_train_scaled, X_val_scaled, y_train, y_val)
+    with profiler.stage('advanced_models'):
+        advanced_results = train_advanced_models(
+            X_train_scaled, X_val_scaled, y_train, y_val,
+            workers=args.workers, budget=args.budget, use_cache=not args.no_cache
+        )
+        profiler.add_fits(sum(result.get('fits', 0) for result in advanced_results.values()
+                              if not result['from_cache']))
     
     # Выбор лучшей модели
     all_results = {**baseline_results, **advanced_results}
+    for name, result in all_results.items():
+        profiler.add_candidate(name, **{key: result.get(key) for key in (
+            'fit_seconds', 'cpu_seconds', 'fits', 'peak_rss_mb', 'from_cache', 'val_accuracy')})
     best_model_name = max(all_results.keys(), key=lambda x: all_results[x]['val_accuracy'])
     best_model = all_results[best_model_name]['model']
     
@@ -322,10 +485,13 @@ def main():
     print(f"Валидационная точность: {all_results[best_model_name]['val_accuracy']:.4f}")
     
     # Тюнинг лучшей модели
-    tuned_model = tune_best_model(best_model, best_model_name, X_train_scaled, y_train)
+    with profiler.stage('tuning'):
+        tuned_model = tune_best_model(best_model, best_model_name, X_train_scaled, y_train,
+                                      method=args.tuning, n_trials=args.tune_trials, profiler=profiler)
     
     # Финальная оценка
-    test_accuracy, roc_auc = evaluate_final_model(tuned_model, X_test_scaled, y_test, wine_data['quality'])
+    with profiler.stage('evaluation'):
+        test_accuracy, roc_auc = evaluate_final_model(tuned_model, X_test_scaled, y_test, wine_data['quality'])
     
     # Метаданные модели
     metadata = {
@@ -338,7 +504,11 @@ def main():
         'training_size': int(len(X_train)),
         'features_count': int(len(X_train.columns)),
         'training_date': datetime.now().isoformat(),
-        'data_shape': [int(wine_data.shape[0]), int(wine_data.shape[1])]
+        'data_shape': [int(wine_data.shape[0]), int(wine_data.shape[1])],
+        # Диапазоны признаков всего датасета для проверки входа сервиса (wine_quality/validation.py)
+        'feature_ranges': feature_ranges(wine_data.drop('quality', axis=1), to_name=to_feature_name),
+        # Статистика обучающей выборки для оценки OOD и дрейфа (wine_quality/drift.py)
+        'input_distribution': input_distribution(X_train, to_name=to_feature_name)
     }
     
     # Важность признаков (если доступна)
@@ -346,8 +516,20 @@ def main():
         feature_importance = dict(zip(X_train.columns, tuned_model.feature_importances_))
         metadata['feature_importance'] = {k: float(v) for k, v in feature_importance.items()}
     
+    # Профиль этапов до сохранения попадает в метаданные версии
+    metadata['training_profile'] = profiler.report()
+    
     # Сохранение модели
-    save_model_and_artifacts(tuned_model, scaler, metadata, best_model_name)
+    with profiler.stage('save'):
+        version = save_model_and_artifacts(tuned_model, scaler, metadata, best_model_name, X_test)
+    
+    print_profile(profiler)
+    if args.profile or args.cprofile:
+        paths = profiler.write(PROFILES_DIR, version)
+        print(f"Отчет профилирования: {', '.join(str(path) for path in paths)}")
+        if args.cprofile:
+            print(f"\nСамые затратные функции этапа {profiler.slowest_stage()['name']}:")
+            print(profiler.top_functions())
     
     print(f"\n=== ОБУЧЕНИЕ ЗАВЕРШЕНО ===")
     print(f"Время окончания: {datetime.now()}")
@@ -0,0 +1,213 @@
+"""
+Инкрементальное обновление модели новыми размеченными образцами
+
+Новые строки (CSV в формате датасета, разделитель ';') дописываются в
+data/winequality-new.csv. Обновляются только строки, которых модель еще не
+видела (после data_shape из метаданных): ансамбль деревьев сохраняет прежний
+скейлер и получает новые деревья (warm_start); для логистической регрессии
+скейлер учитывает новые строки в накопленных среднем и дисперсии, а модель
+дообучается с текущих коэффициентов. Результат публикуется новой
+версией в реестре (models/versions/<версия>/) и становится активной.
+
+Обновление заменяется полным запуском scripts/train_model.py, если:
+- модель не поддерживает обновление или в новых строках есть новые классы;
+- обнаружен дрейф: точность текущей модели на новых строках ниже
+  валидационной больше чем на --drift-tolerance, либо среднее признака новых
+  строк сдвинуто относительно обучающих строк того же типа вина больше чем на
+  --max-mean-shift стандартных отклонений;
+- логистическая регрессия в масштабе обновленного скейлера дает не те
+  вероятности, что прежняя модель (больше RESCALE_TOLERANCE);
+- обновленная модель на отложенной тестовой выборке хуже прежней больше чем
+  на --accuracy-tolerance.
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.metrics import accuracy_score, roc_auc_score
+
+# Добавляем корневую директорию в путь
+root_dir = Path(__file__).parent.parent
+sys.path.append(str(root_dir))
+
+from wine_quality import registry
+from wine_quality.data import append_samples, to_feature_name
+from wine_quality.drift import input_distribution
+from wine_quality.incremental import (RESCALE_TOLERANCE, check_rescaled, grow_model, mean_shift,
+                                      prepare_update, supports_update)
+from wine_quality.validation import feature_ranges
+
+from train_model import load_and_prepare_data, save_model_and_artifacts, split_data
+
+MODELS_DIR = root_dir / "models"
+
+# Меньше строк недостаточно для оценки точности на новых данных
+MIN_DRIFT_ROWS = 30
+
+
+def read_samples(path, wine_type):
+    """Чтение новых образцов; без столбца wine_type_red нужен --wine-type"""
+    samples = pd.read_csv(path, sep=';')
+    if 'wine_type_red' not in samples.columns:
+        if wine_type is None:
+            raise ValueError("В файле нет столбца wine_type_red, укажите --wine-type")
+        samples['wine_type_red'] = int(wine_type == 'red')
+    return {name: samples[name].to_numpy() for name in samples.columns}
+
+
+def full_retrain(reasons):
+    """Полное переобучение вместо инкрементального обновления"""
+    print("\n⚠️  Инкрементальное обновление невозможно:")
+    for reason in reasons:
+        print(f"  - {reason}")
+    print("Запускаем полное переобучение (scripts/train_model.py)...")
+    subprocess.run([sys.executable, str(root_dir / "scripts" / "train_model.py")], check=True)
+
+
+def main():
+    """Основная функция обновления"""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('samples', nargs='?', help='CSV с новыми размеченными образцами')
+    parser.add_argument('--wine-type', choices=['red', 'white'], help='тип вина для всех строк файла')
+    parser.add_argument('--accuracy-tolerance', type=float, default=0.01,
+                        help='допустимое падение точности на тестовой выборке')
+    parser.add_argument('--drift-tolerance', type=float, default=0.10,
+                        help='допустимое отставание точности на новых строках от валидационной')
+    parser.add_argument('--max-mean-shift', type=float, default=1.0,
+                        help='допустимый сдвиг среднего признака, в стандартных отклонениях')
+    parser.add_argument('--no-fallback', action='store_true',
+                        help='не запускать полное переобучение, только сообщить причину')
+    args = parser.parse_args()
+
+    print("=== ИНКРЕМЕНТАЛЬНОЕ ОБНОВЛЕНИЕ МОДЕЛИ ===")
+    start = time.perf_counter()
+
+    if args.samples:
+        appended = append_samples(read_samples(args.samples, args.wine_type))
+        print(f"Добавлено {appended} новых образцов в data/winequality-new.csv")
+
+    # Активная версия реестра (или плоская раскладка models/)
+    _, model_dir = registry.active_model_dir(MODELS_DIR)
+    with open(model_dir / registry.METADATA_FILENAME) as f:
+        metadata = json.load(f)
+    model = joblib.load(model_dir / registry.MODEL_FILENAME)
+    scaler = joblib.load(model_dir / registry.SCALER_FILENAME)
+
+    wine_data = load_and_prepare_data()
+    seen_rows = metadata['data_shape'][0]
+    base_rows = metadata.get('base_rows', seen_rows)
+    new_data = wine_data.iloc[seen_rows:]
+    if new_data.empty:
+        print("Новых образцов нет, модель актуальна")
+        return
+
+    # Разбиение исходного датасета то же, что при полном обучении: валидационная
+    # и тестовая выборки не участвуют в обучении и служат эталоном
+    X_train, X_val, X_test, y_train, y_val, y_test = split_data(wine_data.iloc[:base_rows])
+    added_data = wine_data.iloc[base_rows:]
+    X_new, y_new = new_data.drop('quality', axis=1), new_data['quality']
+    print(f"Новых образцов: {len(new_data)}, ранее добавленных: {seen_rows - base_rows}")
+
+    # Проверки перед обновлением
+    reasons = []
+    X_seen = pd.concat([X_train, wine_data.iloc[base_rows:seen_rows].drop('quality', axis=1)])
+    shift = mean_shift(X_seen, X_new, by='wine_type_red')
+    new_rows_accuracy = None
+    if not supports_update(model):
+        reasons.append(f"модель {type(model).__name__} не поддерживает обновление")
+    elif not set(np.unique(y_new)) <= set(model.classes_):
+        reasons.append(f"новые классы: {sorted(set(np.unique(y_new)) - set(model.classes_))}")
+    else:
+        X_new_scaled = pd.DataFrame(scaler.transform(X_new), columns=X_new.columns, index=X_new.index)
+        new_rows_accuracy = accuracy_score(y_new, model.predict(X_new_scaled))
+        print(f"Точность текущей модели на новых строках: {new_rows_accuracy:.4f} "
+              f"(валидационная: {metadata['validation_accuracy']:.4f})")
+        if len(new_data) >= MIN_DRIFT_ROWS and new_rows_accuracy < metadata['validation_accuracy'] - args.drift_tolerance:
+            reasons.append(f"дрейф: точность на новых строках {new_rows_accuracy:.4f}")
+    print(f"Наибольший сдвиг среднего признака: {shift:.2f} ст. откл.")
+    if shift > args.max_mean_shift:
+        reasons.append(f"дрейф: сдвиг среднего признака {shift:.2f} ст. откл.")
+
+    if reasons:
+        if not args.no_fallback:
+            full_retrain(reasons)
+        else:
+            print("\n❌ Обновление отменено: " + "; ".join(reasons))
+        return
+
+    # Ансамбль остается в прежнем масштабе, линейная модель переводится в
+    # масштаб обновленного скейлера; до дообучения она обязана давать прежние
+    # вероятности
+    updated, new_scaler = prepare_update(model, scaler, X_new)
+    X_seen_all = pd.concat([X_seen, X_new])
+    rescale_error = check_rescaled(model, scaler, updated, new_scaler, X_seen_all)
+    if rescale_error > RESCALE_TOLERANCE:
+        reason = f"модель в новом масштабе расходится с прежней (Δp = {rescale_error:.2e})"
+        if not args.no_fallback:
+            full_retrain([reason])
+        else:
+            print(f"\n❌ Обновление отменено: {reason}")
+        return
+
+    def scaled(X):
+        return pd.DataFrame(new_scaler.transform(X), columns=X.columns, index=X.index)
+
+    pool = pd.concat([X_train, added_data.drop('quality', axis=1)])
+    pool_labels = pd.concat([y_train, added_data['quality']])
+    updated, added_trees = grow_model(updated, scaled(pool), pool_labels, len(new_data))
+
+    test_accuracy = accuracy_score(y_test, updated.predict(scaled(X_test)))
+    val_accuracy = accuracy_score(y_val, updated.predict(scaled(X_val)))
+    roc_auc = roc_auc_score(y_test, updated.predict_proba(scaled(X_test)), multi_class='ovr')
+    print(f"Добавлено деревьев: {added_trees}")
+    print(f"Точность на тестовой выборке: {test_accuracy:.4f} (была {metadata['test_accuracy']:.4f})")
+
+    if test_accuracy < metadata['test_accuracy'] - args.accuracy_tolerance:
+        reason = f"точность обновленной модели упала до {test_accuracy:.4f}"
+        if not args.no_fallback:
+            full_retrain([reason])
+        else:
+            print(f"\n❌ Обновление отменено: {reason}")
+        return
+
+    metadata.update({
+        'parent_version': metadata.get('version'),
+        'test_accuracy': float(test_accuracy),
+        'roc_auc': float(roc_auc),
+        'validation_accuracy': float(val_accuracy),
+        'training_size': int(len(pool)),
+        'training_date': datetime.now().isoformat(),
+        'data_shape': [int(wine_data.shape[0]), int(wine_data.shape[1])],
+        'base_rows': int(base_rows),
+        'feature_ranges': feature_ranges(wine_data.drop('quality', axis=1), to_name=to_feature_name),
+        'input_distribution': input_distribution(pool, to_name=to_feature_name),
+        'update': {
+            'new_rows': int(len(new_data)),
+            'added_trees': int(added_trees),
+            'new_rows_accuracy_before': new_rows_accuracy,
+            'max_mean_shift': shift,
+            'seconds': time.perf_counter() - start,
+        },
+    })
+    if hasattr(updated, 'feature_importances_'):
+        metadata['feature_importance'] = {
+            name: float(value) for name, value in zip(X_train.columns, updated.feature_importances_)
+        }
+
+    version = save_model_and_artifacts(updated, new_scaler, metadata, type(updated).__name__, X_test,
+                                       models_dir=MODELS_DIR)
+
+    print(f"\n=== ОБНОВЛЕНИЕ ЗАВЕРШЕНО за {time.perf_counter() - start:.1f} с ===")
+    print(f"Активная версия: {version}")
+
+
+if __name__ == "__main__":
+    main()
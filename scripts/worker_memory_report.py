@@ -0,0 +1,162 @@
+"""
+Отчет о памяти воркеров gunicorn: RSS, PSS, общие и приватные страницы
+каждого процесса до и после загрузки приложения в мастере (preload)
+
+Работает только в Linux (читает /proc/<pid>/smaps_rollup). PSS делит общие
+страницы поровну между процессами, поэтому сумма PSS - реальный расход памяти.
+"""
+
+import argparse
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+import urllib.request
+from pathlib import Path
+
+root_dir = Path(__file__).parent.parent
+
+SAMPLE_WINE = {
+    'fixed_acidity': 7.4, 'volatile_acidity': 0.7, 'citric_acid': 0.0,
+    'residual_sugar': 1.9, 'chlorides': 0.076, 'free_sulfur_dioxide': 11.0,
+    'total_sulfur_dioxide': 34.0, 'density': 0.9978, 'pH': 3.51,
+    'sulphates': 0.56, 'alcohol': 9.4, 'wine_type_red': 1
+}
+
+MEMORY_FIELDS = ('Rss', 'Pss', 'Shared_Clean', 'Shared_Dirty', 'Private_Clean', 'Private_Dirty')
+
+
+def scenarios(workers, bind):
+    """Командные строки gunicorn: прежняя из Dockerfile и с конфигурацией preload"""
+    base = [sys.executable, '-m', 'gunicorn']
+    return {
+        'без preload': base + ['--bind', bind, '--workers', str(workers), '--timeout', '120', 'api.app:app'],
+        'preload + mmap': base + ['--config', 'docker/gunicorn.conf.py', 'api.app:app'],
+    }
+
+
+def read_memory(pid):
+    """Показатели памяти процесса в мегабайтах"""
+    values = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            name, _, rest = line.partition(':')
+            if name in MEMORY_FIELDS:
+                values[name] = int(rest.split()[0]) / 1024
+    return {
+        'rss': values['Rss'],
+        'pss': values['Pss'],
+        'shared': values['Shared_Clean'] + values['Shared_Dirty'],
+        'private': values['Private_Clean'] + values['Private_Dirty'],
+    }
+
+
+def child_pids(parent_pid):
+    """Процессы-потомки мастера gunicorn"""
+    pids = []
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                # Имя процесса в скобках может содержать пробелы
+                fields = f.read().rsplit(')', 1)[1].split()
+        except OSError:
+            continue
+        if int(fields[1]) == parent_pid:
+            pids.append(int(entry))
+    return sorted(pids)
+
+
+def wait_ready(url, timeout):
+    """Ожидание готовности сервиса (/api/ready)"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(f'{url}/api/ready', timeout=2) as response:
+                if response.status == 200:
+                    return True
+        except OSError:
+            time.sleep(0.5)
+    return False
+
+
+def send_traffic(url, n_requests):
+    """Запросы ко всем эндпоинтам, чтобы воркеры прошли горячий путь"""
+    body = json.dumps({'samples': [SAMPLE_WINE] * 100}).encode()
+    for _ in range(n_requests):
+        for path, data in (('/api/predict', json.dumps(SAMPLE_WINE).encode()),
+                           ('/api/predict/batch', body)):
+            request = urllib.request.Request(f'{url}{path}', data=data,
+                                             headers={'Content-Type': 'application/json'})
+            urllib.request.urlopen(request, timeout=30).read()
+        urllib.request.urlopen(f'{url}/api/best-worst-wines', timeout=30).read()
+
+
+def measure_scenario(command, workers, url, n_requests, env):
+    """Запуск gunicorn, прогрев и замер памяти мастера и воркеров"""
+    process = subprocess.Popen(command, cwd=root_dir, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        if not wait_ready(url, timeout=120):
+            raise RuntimeError('gunicorn не ответил на /api/ready')
+
+        # Ждем, пока поднимутся все воркеры
+        deadline = time.time() + 60
+        while len(child_pids(process.pid)) < workers and time.time() < deadline:
+            time.sleep(0.5)
+
+        send_traffic(url, n_requests)
+        master = read_memory(process.pid)
+        worker_memory = [read_memory(pid) for pid in child_pids(process.pid)]
+        return master, worker_memory
+    finally:
+        process.send_signal(signal.SIGTERM)
+        process.wait(timeout=60)
+
+
+def report(title, master, worker_memory):
+    """Вывод таблицы памяти по процессам"""
+    print(f"\n📊 {title}:")
+    print(f"  {'процесс':<12} {'RSS':>9} {'PSS':>9} {'общая':>9} {'приватная':>10}  (МБ)")
+    rows = [('мастер', master)] + [(f'воркер {i}', m) for i, m in enumerate(worker_memory, 1)]
+    for name, m in rows:
+        print(f"  {name:<12} {m['rss']:9.1f} {m['pss']:9.1f} {m['shared']:9.1f} {m['private']:10.1f}")
+
+    total_rss = sum(m['rss'] for _, m in rows)
+    total_pss = sum(m['pss'] for _, m in rows)
+    print(f"  Сумма RSS: {total_rss:.1f} МБ, реальный расход (сумма PSS): {total_pss:.1f} МБ")
+    return total_pss
+
+
+def main():
+    """Основная функция отчета"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--workers', type=int, default=4, help='число воркеров gunicorn')
+    parser.add_argument('--port', type=int, default=5055, help='порт для запуска')
+    parser.add_argument('--requests', type=int, default=50, help='число циклов прогревочных запросов')
+    args = parser.parse_args()
+
+    if not os.path.exists('/proc/self/smaps_rollup'):
+        print("❌ Нужен Linux с /proc/<pid>/smaps_rollup")
+        sys.exit(1)
+
+    bind = f'127.0.0.1:{args.port}'
+    url = f'http://{bind}'
+    env = dict(os.environ, GUNICORN_WORKERS=str(args.workers), GUNICORN_BIND=bind,
+               PYTHONPATH=str(root_dir))
+
+    print(f"🍷 Память сервиса с {args.workers} воркерами")
+    totals = {}
+    for title, command in scenarios(args.workers, bind).items():
+        master, worker_memory = measure_scenario(command, args.workers, url, args.requests, env)
+        totals[title] = report(title, master, worker_memory)
+
+    before, after = totals.values()
+    print(f"\n✅ Экономия памяти: {before - after:.1f} МБ ({before / after:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Инкрементальное обновление начинается с модели, которая предсказывает как прежняя
+
+prepare_update не должен менять вероятности модели до дообучения: ансамбль
+деревьев остается в прежнем масштабе, линейная модель пересчитывается в
+масштаб обновленного скейлера.
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+pytest.importorskip('sklearn')
+
+from sklearn.ensemble import GradientBoostingClassifier, RandomForestClassifier
+from sklearn.linear_model import LogisticRegression
+from sklearn.preprocessing import StandardScaler
+
+# Добавляем корневую директорию в путь
+root_dir = Path(__file__).parent.parent
+sys.path.append(str(root_dir))
+
+from wine_quality import FEATURE_NAMES
+from wine_quality.data import load_wine_columns, to_feature_names
+from wine_quality.incremental import RESCALE_TOLERANCE, check_rescaled, prepare_update
+
+
+def wine_data():
+    """Признаки и качество всего датасета; соседние значения близки к порогам деревьев"""
+    columns = load_wine_columns()
+    named = to_feature_names(columns)
+    X = np.column_stack([np.asarray(named[name], dtype=np.float64) for name in FEATURE_NAMES])
+    return X, np.asarray(columns['quality'])
+
+
+@pytest.mark.parametrize('model', [
+    RandomForestClassifier(n_estimators=30, random_state=0),
+    GradientBoostingClassifier(n_estimators=20, random_state=0),
+    LogisticRegression(max_iter=1000),
+], ids=lambda model: type(model).__name__)
+def test_prepared_model_reproduces_original(model):
+    rows, quality = wine_data()
+    order = np.random.default_rng(0).permutation(len(rows))
+    seen, new = order[:5000], order[5000:]
+    scaler = StandardScaler().fit(rows[seen])
+    model.fit(scaler.transform(rows[seen]), quality[seen])
+
+    updated, new_scaler = prepare_update(model, scaler, rows[new])
+
+    np.testing.assert_allclose(updated.predict_proba(new_scaler.transform(rows)),
+                               model.predict_proba(scaler.transform(rows)), rtol=0, atol=RESCALE_TOLERANCE)
+    assert check_rescaled(model, scaler, updated, new_scaler, rows) <= RESCALE_TOLERANCE
@@ -0,0 +1,26 @@
+"""
+Точки входа сервиса не импортируют библиотеки обучения
+
+Та же проверка, что scripts/check_serving_imports.py при сборке образа, но в
+обычном прогоне тестов: api.app и api.asgi импортируются в чистом
+интерпретаторе, и в нем не должно быть pandas, optuna и других библиотек
+обучения (scikit-learn допускается только для модели из pickle).
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+# Добавляем корневую директорию и scripts в путь
+root_dir = Path(__file__).parent.parent
+sys.path.append(str(root_dir))
+sys.path.append(str(root_dir / 'scripts'))
+
+from check_serving_imports import ENTRY_POINTS, forbidden_imports, probe_import
+
+
+@pytest.mark.parametrize('module', ENTRY_POINTS)
+def test_entry_point_has_no_training_imports(module):
+    report = probe_import(module)
+    assert forbidden_imports(report) == [], f"{module} импортирует библиотеки обучения"
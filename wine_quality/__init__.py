@@ -0,0 +1,13 @@
+"""
+Общий код проекта Wine Quality ML, используемый скриптами обучения и API
+
+Модули пакета зависят только от NumPy, чтобы их можно было импортировать
+в процессе сервиса без scikit-learn.
+"""
+
+# Список признаков модели в порядке столбцов матрицы признаков
+FEATURE_NAMES = [
+    'fixed_acidity', 'volatile_acidity', 'citric_acid', 'residual_sugar',
+    'chlorides', 'free_sulfur_dioxide', 'total_sulfur_dioxide', 'density',
+    'pH', 'sulphates', 'alcohol', 'wine_type_red'
+]
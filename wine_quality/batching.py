@@ -0,0 +1,153 @@
+"""
+Микробатчинг одиночных предсказаний
+
+Конкурентные запросы с одним образцом складываются в очередь; фоновый поток
+ждет не дольше max_wait_ms (или пока не наберется max_batch строк), оценивает
+все собранные строки одним вызовом ядра инференса и раздает результаты
+ожидающим запросам. Запросы с разным контекстом (версией модели, которую
+запрос взял в начале) оцениваются отдельными вызовами. Имеет смысл, когда воркер обслуживает несколько запросов
+одновременно (gunicorn с потоками, сервер разработки Flask).
+"""
+
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+
+# Границы гистограммы размеров пакетов
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+
+class _Pending:
+    """Ожидающий запрос: признаки и место для результата"""
+
+    __slots__ = ('features', 'context', 'done', 'result', 'error')
+
+    def __init__(self, features, context):
+        self.features = features
+        self.context = context
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class MicroBatcher:
+    """Объединение конкурентных запросов в один вызов score_fn
+
+    score_fn(features, context) принимает матрицу признаков и контекст
+    запросов пакета и возвращает кортеж массивов, первая ось которых
+    соответствует строкам матрицы.
+    """
+
+    def __init__(self, score_fn, max_wait_ms=2.0, max_batch=64):
+        self.score_fn = score_fn
+        self.max_wait = max_wait_ms / 1000
+        self.max_batch = max_batch
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+        self._batches = 0
+        self._rows = 0
+        self._max_seen = 0
+        self._wait_seconds = 0.0
+        self._histogram = [0] * (len(BATCH_SIZE_BUCKETS) + 1)
+
+    def submit(self, features, context=None):
+        """Оценка матрицы признаков в составе общего пакета (блокирует до результата)
+
+        Строки оцениваются вместе только с запросами того же контекста.
+        """
+        self._ensure_thread()
+        pending = _Pending(features, context)
+        self._queue.put(pending)
+        pending.done.wait()
+        if pending.error is not None:
+            raise pending.error
+        return pending.result
+
+    def stats(self):
+        """Метрики достигнутого размера пакета"""
+        with self._lock:
+            histogram = {f'le_{bound}': count for bound, count in zip(BATCH_SIZE_BUCKETS, self._histogram)}
+            histogram[f'gt_{BATCH_SIZE_BUCKETS[-1]}'] = self._histogram[-1]
+            return {
+                'max_wait_ms': self.max_wait * 1000,
+                'max_batch': self.max_batch,
+                'batches': self._batches,
+                'rows': self._rows,
+                'avg_batch_size': self._rows / self._batches if self._batches else 0.0,
+                'max_batch_size': self._max_seen,
+                'avg_wait_ms': self._wait_seconds / self._batches * 1000 if self._batches else 0.0,
+                'batch_size_histogram': histogram,
+            }
+
+    def _ensure_thread(self):
+        """Запуск фонового потока (после fork воркера поток запускается заново)"""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self._queue = queue.Queue()
+                self._thread = threading.Thread(target=self._run, name='micro-batcher', daemon=True)
+                self._thread.start()
+                self._pid = os.getpid()
+
+    def _run(self):
+        """Цикл сбора пакетов"""
+        while True:
+            first = self._queue.get()
+            started = time.perf_counter()
+            deadline = started + self.max_wait
+            pending = [first]
+            rows = len(first.features)
+
+            while rows < self.max_batch:
+                timeout = deadline - time.perf_counter()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                pending.append(item)
+                rows += len(item.features)
+
+            self._record(rows, time.perf_counter() - started)
+            # Обычно контекст у всех один; при смене версии модели пакет делится
+            groups = {}
+            for item in pending:
+                groups.setdefault(id(item.context), []).append(item)
+            for group in groups.values():
+                self._score(group)
+
+    def _score(self, pending):
+        """Один вызов score_fn для ожидающих запросов одного контекста и раздача результатов"""
+        try:
+            features = np.concatenate([item.features for item in pending])
+            outputs = self.score_fn(features, pending[0].context)
+            offset = 0
+            for item in pending:
+                end = offset + len(item.features)
+                item.result = tuple(output[offset:end] for output in outputs)
+                offset = end
+        except Exception as e:
+            for item in pending:
+                item.error = e
+        finally:
+            for item in pending:
+                item.done.set()
+
+    def _record(self, rows, waited):
+        """Учет размера пакета"""
+        with self._lock:
+            self._batches += 1
+            self._rows += rows
+            self._max_seen = max(self._max_seen, rows)
+            self._wait_seconds += waited
+            bucket = next((i for i, bound in enumerate(BATCH_SIZE_BUCKETS) if rows <= bound),
+                          len(BATCH_SIZE_BUCKETS))
+            self._histogram[bucket] += 1
@@ -0,0 +1,103 @@
+"""
+Двоичный протокол пакетного предсказания для внутренних клиентов
+
+Клиент, у которого признаки уже в массиве, отправляет в /api/predict/batch
+тело с Content-Type application/x-wine-matrix вместо JSON:
+
+    заголовок 16 байт, little-endian: магия b'WQM1', тип значений (uint8:
+    4 - float32, 8 - float64), резерв (uint8), число столбцов (uint16, ровно
+    len(FEATURE_NAMES)), число строк (uint32), резерв (uint32);
+    затем матрица rows x cols в порядке FEATURE_NAMES, по строкам.
+
+Матрица оборачивается np.frombuffer без копирования. Ответ - тот же формат:
+
+    заголовок 16 байт: магия b'WQR1', тип значений, резерв, число классов
+    (uint16), число строк (uint32), число некорректных строк (uint32);
+    матрица вероятностей rows x classes в типе значений запроса, метки
+    (int32, rows) и классы модели (int32, classes) - порядок столбцов
+    вероятностей.
+
+Строки, которые не проходят проверку схемы признаков сервиса
+(wine_quality/validation.py), не оцениваются: метка -1, вероятности NaN.
+Это строки с NaN или бесконечностями, а при проверке диапазонов (в сервисе
+INPUT_RANGE_CHECK=1, по умолчанию) - и со значениями вне границ признака или
+недопустимым значением категориального признака (wine_type_red не 0 и не 1).
+Их число - в заголовке ответа.
+Вероятности идут сразу за заголовком, поэтому в ответе они выровнены и тоже
+читаются без копирования (decode_results).
+"""
+
+import struct
+
+import numpy as np
+
+from wine_quality import FEATURE_NAMES
+
+CONTENT_TYPE = 'application/x-wine-matrix'
+
+REQUEST_MAGIC = b'WQM1'
+RESPONSE_MAGIC = b'WQR1'
+HEADER = struct.Struct('<4sBBHII')
+DTYPES = {4: np.dtype('<f4'), 8: np.dtype('<f8')}
+LABEL_DTYPE = np.dtype('<i4')
+INVALID_LABEL = -1
+
+
+class BinaryFormatError(ValueError):
+    """Тело не соответствует двоичному протоколу"""
+
+
+def encode_matrix(features, dtype=np.float64):
+    """Тело запроса из матрицы признаков (n, 12) в порядке FEATURE_NAMES"""
+    dtype = np.dtype(dtype).newbyteorder('<')
+    features = np.ascontiguousarray(features, dtype=dtype)
+    if features.ndim != 2 or features.shape[1] != len(FEATURE_NAMES):
+        raise BinaryFormatError(f'Ожидается матрица (n, {len(FEATURE_NAMES)}), получено {features.shape}')
+    header = HEADER.pack(REQUEST_MAGIC, dtype.itemsize, 0, features.shape[1], features.shape[0], 0)
+    return header + features.tobytes()
+
+
+def decode_matrix(body):
+    """Матрица признаков из тела запроса без копирования (только для чтения)"""
+    if len(body) < HEADER.size:
+        raise BinaryFormatError('Тело короче заголовка')
+    magic, itemsize, _, cols, rows, _ = HEADER.unpack_from(body)
+    if magic != REQUEST_MAGIC:
+        raise BinaryFormatError(f'Неизвестная сигнатура {magic!r}, ожидается {REQUEST_MAGIC!r}')
+    if itemsize not in DTYPES:
+        raise BinaryFormatError(f'Неподдерживаемый размер значения {itemsize}, ожидается 4 или 8')
+    if cols != len(FEATURE_NAMES):
+        raise BinaryFormatError(f'Ожидается {len(FEATURE_NAMES)} столбцов, получено {cols}')
+    expected = HEADER.size + rows * cols * itemsize
+    if len(body) != expected:
+        raise BinaryFormatError(f'Размер тела {len(body)} байт, по заголовку {expected}')
+    return np.frombuffer(body, dtype=DTYPES[itemsize], count=rows * cols, offset=HEADER.size).reshape(rows, cols)
+
+
+def encode_results(probabilities, labels, classes, dtype, invalid=0):
+    """Тело ответа: вероятности, метки и классы модели"""
+    dtype = np.dtype(dtype).newbyteorder('<')
+    rows, n_classes = probabilities.shape
+    header = HEADER.pack(RESPONSE_MAGIC, dtype.itemsize, 0, n_classes, rows, invalid)
+    return b''.join([
+        header,
+        np.ascontiguousarray(probabilities, dtype=dtype).tobytes(),
+        np.ascontiguousarray(labels, dtype=LABEL_DTYPE).tobytes(),
+        np.ascontiguousarray(classes, dtype=LABEL_DTYPE).tobytes(),
+    ])
+
+
+def decode_results(body):
+    """Разбор ответа для клиента: (метки, вероятности, классы, число некорректных строк)"""
+    if len(body) < HEADER.size:
+        raise BinaryFormatError('Тело короче заголовка')
+    magic, itemsize, _, n_classes, rows, invalid = HEADER.unpack_from(body)
+    if magic != RESPONSE_MAGIC or itemsize not in DTYPES:
+        raise BinaryFormatError(f'Неизвестный формат ответа {magic!r}')
+    offset = HEADER.size
+    probabilities = np.frombuffer(body, dtype=DTYPES[itemsize], count=rows * n_classes, offset=offset)
+    offset += probabilities.nbytes
+    labels = np.frombuffer(body, dtype=LABEL_DTYPE, count=rows, offset=offset)
+    offset += labels.nbytes
+    classes = np.frombuffer(body, dtype=LABEL_DTYPE, count=n_classes, offset=offset)
+    return labels, probabilities.reshape(rows, n_classes), classes, invalid
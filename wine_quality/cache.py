@@ -0,0 +1,270 @@
+"""
+Кэш результатов предсказания по квантованному вектору признаков
+
+Ключ - значения признаков, округленные до заданного числа знаков. При промахе
+модель оценивает уже округленный вектор, поэтому результат зависит только от
+ключа. Записи вытесняются по LRU и устаревают через ttl секунд; кэш целиком
+сбрасывается, когда меняется любой из отслеживаемых файлов модели.
+
+PredictionCache хранит записи в памяти процесса. SharedPredictionCache
+хранит их в анонимной разделяемой памяти: созданный в мастере gunicorn до fork
+(preload_app) кэш общий для всех воркеров, поэтому попадания тоже общие.
+"""
+
+import mmap
+import multiprocessing
+import os
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+import numpy as np
+
+# Как часто проверять, не изменились ли файлы модели
+SOURCE_CHECK_INTERVAL = 1.0
+
+
+class _SourceWatcher:
+    """Размер и время модификации файлов модели с редкой проверкой"""
+
+    def __init__(self, paths):
+        self.paths = list(paths)
+        self.signature = self._signature()
+        self.checked_at = time.monotonic()
+
+    def _signature(self):
+        signature = []
+        for path in self.paths:
+            try:
+                stat = os.stat(path)
+                signature.append((stat.st_size, stat.st_mtime_ns))
+            except OSError:
+                signature.append(None)
+        return signature
+
+    def changed(self):
+        """True, если файлы изменились с прошлой проверки"""
+        now = time.monotonic()
+        if now - self.checked_at < SOURCE_CHECK_INTERVAL:
+            return False
+        self.checked_at = now
+        signature = self._signature()
+        if signature == self.signature:
+            return False
+        self.signature = signature
+        return True
+
+
+class PredictionCache:
+    """LRU/TTL кэш предсказаний в памяти процесса"""
+
+    def __init__(self, max_size=10000, ttl=3600.0, decimals=6, watch_paths=()):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.decimals = decimals
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._watcher = _SourceWatcher(watch_paths)
+        self._counters = dict.fromkeys(('hits', 'misses', 'evictions', 'expired', 'invalidations'), 0)
+
+    def quantize(self, features):
+        """Округление признаков; -0.0 приводится к 0.0, чтобы ключи совпадали"""
+        return np.round(np.asarray(features, dtype=np.float64), self.decimals) + 0.0
+
+    def get(self, row):
+        """Результат для квантованной строки признаков или None"""
+        self._check_sources()
+        key = row.tobytes()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._counters['misses'] += 1
+                return None
+            expires_at, result = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self._counters['expired'] += 1
+                self._counters['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._counters['hits'] += 1
+            return result
+
+    def put(self, row, prediction, confidence, probabilities):
+        """Сохранение результата для квантованной строки признаков"""
+        key = row.tobytes()
+        result = (prediction, float(confidence), np.array(probabilities, dtype=np.float64))
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self._counters['evictions'] += 1
+
+    def clear(self):
+        """Сброс всех записей (смена модели)"""
+        with self._lock:
+            self._entries.clear()
+            self._counters['invalidations'] += 1
+
+    def reset(self):
+        """Сброс записей и счетчиков (после прогрева сервиса)"""
+        with self._lock:
+            self._entries.clear()
+            self._counters = dict.fromkeys(self._counters, 0)
+
+    def stats(self):
+        """Счетчики кэша для /api/health"""
+        with self._lock:
+            lookups = self._counters['hits'] + self._counters['misses']
+            return {
+                'shared': False,
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl_seconds': self.ttl,
+                'decimals': self.decimals,
+                **self._counters,
+                'hit_rate': self._counters['hits'] / lookups if lookups else 0.0,
+            }
+
+    def _check_sources(self):
+        if self._watcher.changed():
+            self.clear()
+
+
+class SharedPredictionCache:
+    """Кэш предсказаний в разделяемой памяти для всех воркеров
+
+    Таблица множественно-ассоциативная: ключ хэшируется в набор из WAYS
+    слотов, при вставке вытесняется пустой, устаревший или давнее всего
+    использованный слот. Доступ к набору защищен одной из LOCK_STRIPES
+    межпроцессных блокировок. Сброс кэша увеличивает номер поколения в
+    заголовке, записи прошлых поколений считаются пустыми.
+    """
+
+    WAYS = 4
+    LOCK_STRIPES = 64
+
+    # Столбцы слота: поколение (0 - пусто), срок жизни, последнее обращение,
+    # метка класса, уверенность, затем ключ и вероятности классов
+    _GENERATION, _EXPIRES, _USED, _PREDICTION, _CONFIDENCE = range(5)
+    _KEY = 5
+
+    # Заголовок: поколение и счетчики
+    _HEADER_FIELDS = ('generation', 'hits', 'misses', 'evictions', 'expired', 'invalidations')
+
+    def __init__(self, n_features, n_classes, max_size=10000, ttl=3600.0, decimals=6, watch_paths=()):
+        self.ttl = ttl
+        self.decimals = decimals
+        self.n_classes = n_classes
+        self.n_sets = max(1, max_size // self.WAYS)
+        self.max_size = self.n_sets * self.WAYS
+        self._proba = self._KEY + n_features
+        width = self._proba + n_classes
+
+        header_bytes = len(self._HEADER_FIELDS) * 8
+        self._buffer = mmap.mmap(-1, header_bytes + self.max_size * width * 8)
+        self._header = np.frombuffer(self._buffer, dtype=np.int64, count=len(self._HEADER_FIELDS))
+        self._slots = np.frombuffer(self._buffer, dtype=np.float64, offset=header_bytes).reshape(
+            self.n_sets, self.WAYS, width)
+        self._header[0] = 1
+
+        self._header_lock = multiprocessing.Lock()
+        self._locks = [multiprocessing.Lock() for _ in range(self.LOCK_STRIPES)]
+        self._watcher = _SourceWatcher(watch_paths)
+
+    def quantize(self, features):
+        """Округление признаков; -0.0 приводится к 0.0, чтобы ключи совпадали"""
+        return np.round(np.asarray(features, dtype=np.float64), self.decimals) + 0.0
+
+    def get(self, row):
+        """Результат для квантованной строки признаков или None"""
+        self._check_sources()
+        set_index = zlib.crc32(row.tobytes()) % self.n_sets
+        generation = self._header[0]
+        now = time.time()
+
+        with self._locks[set_index % self.LOCK_STRIPES]:
+            slots = self._slots[set_index]
+            for slot in slots:
+                if slot[self._GENERATION] != generation or not np.array_equal(slot[self._KEY:self._proba], row):
+                    continue
+                if slot[self._EXPIRES] < now:
+                    slot[self._GENERATION] = 0
+                    self._count('expired', 'misses')
+                    return None
+                slot[self._USED] = now
+                # Метки классов (оценки качества) - целые числа
+                result = (int(slot[self._PREDICTION]), float(slot[self._CONFIDENCE]),
+                          slot[self._proba:].copy())
+                self._count('hits')
+                return result
+
+        self._count('misses')
+        return None
+
+    def put(self, row, prediction, confidence, probabilities):
+        """Сохранение результата для квантованной строки признаков"""
+        set_index = zlib.crc32(row.tobytes()) % self.n_sets
+        generation = self._header[0]
+        now = time.time()
+
+        with self._locks[set_index % self.LOCK_STRIPES]:
+            slots = self._slots[set_index]
+            live = (slots[:, self._GENERATION] == generation) & (slots[:, self._EXPIRES] >= now)
+            same_key = live & (slots[:, self._KEY:self._proba] == row).all(axis=1)
+            if same_key.any():
+                way = int(same_key.argmax())
+            elif not live.all():
+                way = int((~live).argmax())
+            else:
+                way = int(slots[:, self._USED].argmin())
+                self._count('evictions')
+
+            slot = slots[way]
+            slot[self._EXPIRES] = now + self.ttl
+            slot[self._USED] = now
+            slot[self._PREDICTION] = prediction
+            slot[self._CONFIDENCE] = confidence
+            slot[self._KEY:self._proba] = row
+            slot[self._proba:] = probabilities
+            slot[self._GENERATION] = generation
+
+    def clear(self):
+        """Сброс всех записей во всех воркерах (смена модели)"""
+        with self._header_lock:
+            self._header[0] += 1
+            self._header[self._HEADER_FIELDS.index('invalidations')] += 1
+
+    def reset(self):
+        """Сброс записей и счетчиков во всех воркерах (после прогрева сервиса)"""
+        with self._header_lock:
+            self._header[0] += 1
+            self._header[1:] = 0
+
+    def stats(self):
+        """Счетчики кэша для /api/health (общие для всех воркеров)"""
+        with self._header_lock:
+            counters = {name: int(value) for name, value in zip(self._HEADER_FIELDS, self._header)}
+        generation = counters.pop('generation')
+        live = (self._slots[:, :, self._GENERATION] == generation) & (self._slots[:, :, self._EXPIRES] >= time.time())
+        lookups = counters['hits'] + counters['misses']
+        return {
+            'shared': True,
+            'size': int(live.sum()),
+            'max_size': self.max_size,
+            'ttl_seconds': self.ttl,
+            'decimals': self.decimals,
+            **counters,
+            'hit_rate': counters['hits'] / lookups if lookups else 0.0,
+        }
+
+    def _count(self, *names):
+        with self._header_lock:
+            for name in names:
+                self._header[self._HEADER_FIELDS.index(name)] += 1
+
+    def _check_sources(self):
+        if self._watcher.changed():
+            self.clear()
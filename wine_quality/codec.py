@@ -0,0 +1,133 @@
+"""
+Кодеки JSON для API: стандартный json и быстрые orjson и msgspec
+
+Codec разбирает тела запросов и сериализует ответы. Быстрые библиотеки
+необязательны: без них используется стандартный модуль json.
+
+- msgspec разбирает пакет {"samples": [...]} сразу по схеме из FEATURE_NAMES,
+  без промежуточных словарей, и значения попадают в матрицу NumPy
+  (decode_samples). Если хотя бы один образец не проходит схему (нет признака,
+  строка вместо числа), decode_samples возвращает None, и запрос разбирается
+  обычным путем с проверкой каждого образца и прежними сообщениями об ошибках.
+- orjson сериализует массивы результатов целиком (OPT_SERIALIZE_NUMPY), ответ
+  пакета собирается из готовых байтов, без словаря и чисел Python на строку.
+
+Тело, которое быстрая библиотека не разобрала (например, NaN в JSON),
+разбирается стандартным json, поэтому принимаются те же запросы, что и раньше.
+Ключи ответов отсортированы, как у jsonify во Flask; быстрые кодеки пишут
+не-ASCII символы в UTF-8 без экранирования.
+"""
+
+import itertools
+import json
+
+import numpy as np
+
+from wine_quality import FEATURE_NAMES
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+try:
+    import msgspec
+    MSGSPEC_AVAILABLE = True
+except ImportError:
+    MSGSPEC_AVAILABLE = False
+
+CODEC_NAMES = ('auto', 'json', 'orjson', 'msgspec')
+
+if MSGSPEC_AVAILABLE:
+    # Образец - ровно признаки модели; лишние поля игнорируются, как и раньше
+    Sample = msgspec.defstruct('Sample', [(name, float) for name in FEATURE_NAMES])
+    BatchRequest = msgspec.defstruct('BatchRequest', [('samples', list[Sample])])
+
+
+class Codec:
+    """Разбор запросов и сериализация ответов выбранными библиотеками
+
+    decoder и encoder - 'json', 'orjson' или 'msgspec'.
+    """
+
+    def __init__(self, decoder='json', encoder='json'):
+        self.decoder = decoder
+        self.encoder = encoder
+        self.name = decoder if decoder == encoder else f'{decoder}+{encoder}'
+        if decoder == 'msgspec':
+            self._batch_decoder = msgspec.json.Decoder(BatchRequest)
+        if encoder == 'msgspec':
+            self._encoder = msgspec.json.Encoder(order='sorted')
+
+    def loads(self, body):
+        """Разбор JSON; ValueError, если тело не JSON"""
+        if self.decoder != 'json':
+            try:
+                return orjson.loads(body) if self.decoder == 'orjson' else msgspec.json.decode(body)
+            except ValueError:
+                pass
+        return json.loads(body)
+
+    def dumps(self, payload):
+        """Сериализация ответа в байты"""
+        if self.encoder == 'orjson':
+            return orjson.dumps(payload, option=orjson.OPT_SORT_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+        if self.encoder == 'msgspec':
+            return self._encoder.encode(payload)
+        return json.dumps(payload, ensure_ascii=True, sort_keys=True, separators=(',', ':')).encode()
+
+    def decode_samples(self, body):
+        """Матрица признаков (n, 12) пакета или None, если нужен обычный разбор"""
+        if self.decoder != 'msgspec':
+            return None
+        try:
+            samples = self._batch_decoder.decode(body).samples
+        except ValueError:
+            return None
+        values = itertools.chain.from_iterable(map(msgspec.structs.astuple, samples))
+        features = np.fromiter(values, dtype=np.float64, count=len(samples) * len(FEATURE_NAMES))
+        return features.reshape(len(samples), len(FEATURE_NAMES))
+
+    def encode_batch_results(self, predictions, confidences, timestamp, ood_scores=None):
+        """Ответ пакетного предсказания, в котором все образцы корректны"""
+        if self.encoder != 'orjson':
+            results = [
+                {'index': i, 'prediction': prediction, 'confidence': confidence}
+                for i, (prediction, confidence) in enumerate(zip(
+                    np.asarray(predictions, dtype=np.int64).tolist(),
+                    np.asarray(confidences, dtype=np.float64).tolist()))
+            ]
+            if ood_scores is not None:
+                for result, score in zip(results, np.asarray(ood_scores, dtype=np.float64).tolist()):
+                    result['ood_score'] = score
+            return self.dumps({'results': results, 'timestamp': timestamp})
+
+        # Столбцы сериализуются orjson целиком и разрезаются на готовые числа
+        def column(values, dtype):
+            encoded = orjson.dumps(np.ascontiguousarray(values, dtype=dtype), option=orjson.OPT_SERIALIZE_NUMPY)
+            return encoded[1:-1].split(b',') if len(values) else []
+
+        if ood_scores is None:
+            rows = zip(column(confidences, np.float64), column(np.arange(len(predictions)), np.int64),
+                       column(predictions, np.int64))
+            results = b','.join([b'{"confidence":%b,"index":%b,"prediction":%b}' % row for row in rows])
+        else:
+            rows = zip(column(confidences, np.float64), column(np.arange(len(predictions)), np.int64),
+                       column(ood_scores, np.float64), column(predictions, np.int64))
+            results = b','.join([b'{"confidence":%b,"index":%b,"ood_score":%b,"prediction":%b}' % row
+                                 for row in rows])
+        return b'{"results":[' + results + b'],"timestamp":' + orjson.dumps(timestamp) + b'}'
+
+
+def create_codec(name='auto'):
+    """Кодек по имени; 'auto' - самые быстрые из установленных библиотек"""
+    if name not in CODEC_NAMES:
+        raise ValueError(f"Неизвестный кодек {name}, доступны: {', '.join(CODEC_NAMES)}")
+    if name == 'auto':
+        decoder = 'msgspec' if MSGSPEC_AVAILABLE else 'orjson' if ORJSON_AVAILABLE else 'json'
+        encoder = 'orjson' if ORJSON_AVAILABLE else 'msgspec' if MSGSPEC_AVAILABLE else 'json'
+        return Codec(decoder, encoder)
+    if (name == 'orjson' and not ORJSON_AVAILABLE) or (name == 'msgspec' and not MSGSPEC_AVAILABLE):
+        raise ValueError(f"Библиотека {name} не установлена")
+    return Codec(name, name)
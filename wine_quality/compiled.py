@@ -0,0 +1,654 @@
+"""
+Скомпилированные модели для инференса без scikit-learn
+
+Модель-победитель разворачивается в непрерывные массивы NumPy, которые
+сохраняются в каталог из .npy файлов:
+
+- ансамбль деревьев (RandomForest, одиночное дерево): признак, порог,
+  левый/правый потомок и распределение классов в листе для всех узлов;
+  вычислитель обходит все деревья сразу для всего пакета и дает результат,
+  побитово совпадающий с predict_proba из scikit-learn;
+- логистическая регрессия: коэффициенты и свободные члены;
+- SVC(probability=True): опорные векторы и матрица коэффициентов всех пар
+  классов один-против-одного, поэтому решающие функции всех пар считаются
+  одним матричным умножением ядра, а калибровка Платта и попарное сведение
+  вероятностей (как в libsvm) выполняются для всего пакета сразу;
+- KNeighborsClassifier: обучающая выборка и ее квадраты норм; соседи ищутся
+  блочным умножением матриц (BLAS), кандидаты уточняются точными расстояниями.
+
+StandardScaler вкладывается в модель при экспорте: для деревьев пороги
+переводятся в исходные единицы признаков, для линейных моделей пересчитываются
+коэффициенты. Поэтому сервис подает в модель сырые признаки без масштабирования.
+SVC и ближайшие соседи хранят среднее и масштаб скейлера и применяют их сами.
+
+Массивы можно загрузить с mmap_mode='r': тогда страницы модели берутся из
+страничного кэша ОС и делятся между всеми воркерами сервиса.
+"""
+
+import json
+import shutil
+from pathlib import Path
+
+import numpy as np
+
+FORMAT_VERSION = 2
+
+# Сколько пар (образец, дерево) обходить за один проход
+CHUNK_SIZE = 1 << 16
+
+# Через сколько шагов обхода отбрасывать пары, уже дошедшие до листа
+COMPACT_EVERY = 4
+
+# Сколько значений ядра или расстояний держать в памяти за один блок
+KERNEL_BLOCK_SIZE = 1 << 21
+
+# Сколько лишних кандидатов в соседи уточнять точными расстояниями
+NEIGHBOR_CANDIDATES = 8
+
+# Границы попарных вероятностей и предел итераций, как в libsvm
+SVC_MIN_PROBABILITY = 1e-7
+SVC_MIN_ITERATIONS = 100
+
+_SIGN_BIT = np.uint64(1 << 63)
+
+
+def _leaf_distributions(tree):
+    """Распределения классов в узлах дерева так, как их возвращает predict_proba"""
+    import sklearn
+
+    value = tree.tree_.value[:, 0, :tree.n_classes_]
+    sklearn_version = tuple(int(part) for part in sklearn.__version__.split('.')[:2])
+    if sklearn_version >= (1, 4):
+        # Начиная с 1.4 в листьях уже хранятся доли классов
+        return np.array(value, dtype=np.float64)
+
+    # В старых версиях хранятся счетчики, и predict_proba нормирует их сам
+    proba = np.array(value, dtype=np.float64)
+    normalizer = proba.sum(axis=1)[:, np.newaxis]
+    normalizer[normalizer == 0.0] = 1.0
+    proba /= normalizer
+    return proba
+
+
+def _ordered_keys(values):
+    """Отображение float64 в uint64 с сохранением порядка"""
+    bits = values.view(np.uint64)
+    return np.where(bits & _SIGN_BIT, ~bits, bits | _SIGN_BIT)
+
+
+def _from_ordered_keys(keys):
+    """Обратное к _ordered_keys отображение"""
+    bits = np.where(keys & _SIGN_BIT, keys & ~_SIGN_BIT, ~keys)
+    return bits.view(np.float64)
+
+
+def fold_thresholds(threshold, mean, scale):
+    """Пороги деревьев в исходных единицах признаков
+
+    scikit-learn идет вправо, если float32((x - mean) / scale) > t. Это
+    выражение монотонно по x, поэтому для каждого порога двоичным поиском по
+    всем float64 находится наибольшее T, при котором оно еще не превосходит t.
+    Сравнение x > T дает в точности те же ветви без масштабирования и без
+    приведения к float32.
+    """
+    threshold = np.asarray(threshold, dtype=np.float64)
+
+    def scaled(x):
+        # Края поиска (±max float64) переполняются до ±inf: так и должно быть,
+        # сравнения с порогом от этого не меняются
+        with np.errstate(over='ignore'):
+            return ((x - mean) / scale).astype(np.float32)
+
+    max_value = np.finfo(np.float64).max
+    lowest = np.full(threshold.shape, -max_value)
+    highest = np.full(threshold.shape, max_value)
+    all_right = scaled(lowest) > threshold
+    all_left = scaled(highest) <= threshold
+
+    # Инвариант поиска: scaled(lo) <= t < scaled(hi)
+    lo = _ordered_keys(lowest)
+    hi = _ordered_keys(highest)
+    searching = ~(all_right | all_left)
+    while True:
+        gap = hi - lo
+        active = searching & (gap > np.uint64(1))
+        if not active.any():
+            break
+        mid = lo + gap // np.uint64(2)
+        fits = scaled(_from_ordered_keys(mid)) <= threshold
+        lo = np.where(active & fits, mid, lo)
+        hi = np.where(active & ~fits, mid, hi)
+
+    folded = _from_ordered_keys(lo)
+    folded[all_right] = -np.inf
+    folded[all_left] = max_value
+    return folded
+
+
+def model_kind(model):
+    """Тип скомпилированной модели или None, если модель не поддерживается"""
+    estimators = getattr(model, 'estimators_', [model])
+    if (
+        hasattr(model, 'classes_')
+        and isinstance(estimators, list)
+        and all(hasattr(tree, 'tree_') and getattr(tree, 'n_outputs_', 1) == 1 for tree in estimators)
+    ):
+        return 'forest'
+    if type(model).__name__ == 'LogisticRegression':
+        return 'linear'
+    if (
+        type(model).__name__ == 'SVC'
+        and model.get_params().get('probability')
+        and model.kernel in ('rbf', 'linear', 'poly', 'sigmoid')
+    ):
+        return 'svc'
+    if (
+        type(model).__name__ == 'KNeighborsClassifier'
+        and getattr(model, 'effective_metric_', None) == 'euclidean'
+        and model.weights in ('uniform', 'distance')
+        and getattr(model, 'outputs_2d_', False) is False
+    ):
+        return 'neighbors'
+    return None
+
+
+def _scaler_params(scaler, n_features):
+    """Среднее и масштаб StandardScaler (тождественное преобразование без скейлера)"""
+    if scaler is None:
+        return np.zeros(n_features), np.ones(n_features)
+    return np.asarray(scaler.mean_, dtype=np.float64), np.asarray(scaler.scale_, dtype=np.float64)
+
+
+def _forest_arrays(model, scaler):
+    """Массивы узлов ансамбля с порогами в исходных единицах признаков"""
+    estimators = getattr(model, 'estimators_', [model])
+    mean, scale = _scaler_params(scaler, estimators[0].n_features_in_)
+    features, thresholds, lefts, rights, missing_left, leaves, roots = [], [], [], [], [], [], []
+    offset = 0
+    max_depth = 0
+
+    for tree in estimators:
+        nodes = tree.tree_
+        node_ids = np.arange(nodes.node_count, dtype=np.int64)
+        is_leaf = nodes.children_left == -1
+        split = ~is_leaf
+
+        # Листья ссылаются сами на себя, поэтому лишние шаги обхода оставляют пару в листе
+        feature = np.where(is_leaf, 0, nodes.feature).astype(np.int64)
+        threshold = np.full(nodes.node_count, np.inf)
+        threshold[split] = fold_thresholds(nodes.threshold[split], mean[feature[split]], scale[feature[split]])
+        left = np.where(is_leaf, node_ids, nodes.children_left).astype(np.int64) + offset
+        right = np.where(is_leaf, node_ids, nodes.children_right).astype(np.int64) + offset
+        if hasattr(nodes, 'missing_go_to_left'):
+            go_left = np.asarray(nodes.missing_go_to_left, dtype=bool) & split
+        else:
+            go_left = np.zeros(nodes.node_count, dtype=bool)
+
+        features.append(feature)
+        thresholds.append(threshold)
+        lefts.append(left)
+        rights.append(right)
+        missing_left.append(go_left)
+        leaves.append(_leaf_distributions(tree))
+        roots.append(offset)
+        offset += nodes.node_count
+        max_depth = max(max_depth, int(nodes.max_depth))
+
+    arrays = {
+        'feature': np.concatenate(features),
+        'threshold': np.concatenate(thresholds),
+        'children': np.stack([np.concatenate(lefts), np.concatenate(rights)], axis=1),
+        'missing_left': np.concatenate(missing_left),
+        'leaf_proba': np.concatenate(leaves),
+        'roots': np.array(roots, dtype=np.int64),
+    }
+    meta = {
+        'n_features': int(estimators[0].n_features_in_),
+        'n_trees': len(estimators),
+        'n_nodes': int(offset),
+        'max_depth': max_depth,
+    }
+    return arrays, meta
+
+
+def _linear_arrays(model, scaler):
+    """Коэффициенты логистической регрессии с вложенным масштабированием"""
+    coef = np.asarray(model.coef_, dtype=np.float64)
+    intercept = np.asarray(model.intercept_, dtype=np.float64)
+    mean, scale = _scaler_params(scaler, coef.shape[1])
+
+    # w·((x - m) / s) + b = (w / s)·x + (b - w·(m / s))
+    folded_coef = coef / scale
+    folded_intercept = intercept - coef @ (mean / scale)
+
+    # Та же логика выбора схемы, что и в LogisticRegression.predict_proba
+    multi_class = getattr(model, 'multi_class', 'auto')
+    ovr = multi_class in ('ovr', 'warn') or (
+        multi_class in ('auto', 'deprecated')
+        and (len(model.classes_) <= 2 or getattr(model, 'solver', None) == 'liblinear')
+    )
+    arrays = {'coef': folded_coef, 'intercept': folded_intercept}
+    meta = {'n_features': int(coef.shape[1]), 'ovr': bool(ovr)}
+    return arrays, meta
+
+
+def _svc_arrays(model, scaler):
+    """Опорные векторы и коэффициенты пар классов SVC в том виде, в каком их хранит libsvm"""
+    support_vectors = np.asarray(model.support_vectors_, dtype=np.float64)
+    # Сырые коэффициенты и свободные члены libsvm: для двух классов публичные
+    # dual_coef_ и intercept_ scikit-learn хранит с обратным знаком
+    dual_coef = np.asarray(model._dual_coef_, dtype=np.float64)
+    intercept = np.asarray(model._intercept_, dtype=np.float64)
+    n_classes = len(model.classes_)
+    starts = np.concatenate([[0], np.cumsum(model.n_support_)])
+
+    # Столбец пары (i, j): коэффициенты опорных векторов классов i и j, остальные нули
+    pair_coef = np.zeros((len(support_vectors), len(intercept)))
+    pair = 0
+    for i in range(n_classes):
+        for j in range(i + 1, n_classes):
+            pair_coef[starts[i]:starts[i + 1], pair] = dual_coef[j - 1, starts[i]:starts[i + 1]]
+            pair_coef[starts[j]:starts[j + 1], pair] = dual_coef[i, starts[j]:starts[j + 1]]
+            pair += 1
+
+    mean, scale = _scaler_params(scaler, support_vectors.shape[1])
+    arrays = {
+        'support_vectors': support_vectors,
+        'support_norms': np.einsum('ij,ij->i', support_vectors, support_vectors),
+        'pair_coef': pair_coef,
+        'intercept': intercept,
+        'prob_a': np.asarray(model._probA, dtype=np.float64),
+        'prob_b': np.asarray(model._probB, dtype=np.float64),
+        'mean': mean,
+        'scale': scale,
+    }
+    meta = {
+        'n_features': int(support_vectors.shape[1]),
+        'n_support_vectors': int(len(support_vectors)),
+        'kernel': model.kernel,
+        'gamma': float(model._gamma),
+        'coef0': float(model.coef0),
+        'degree': int(model.degree),
+    }
+    return arrays, meta
+
+
+def _neighbors_arrays(model, scaler):
+    """Обучающая выборка ближайших соседей (в масштабированных признаках) и ее метки"""
+    fit_x = np.asarray(model._fit_X, dtype=np.float64)
+    mean, scale = _scaler_params(scaler, fit_x.shape[1])
+    arrays = {
+        'fit_x': fit_x,
+        'fit_norms': np.einsum('ij,ij->i', fit_x, fit_x),
+        'fit_labels': np.asarray(model._y, dtype=np.int64),
+        'mean': mean,
+        'scale': scale,
+    }
+    meta = {
+        'n_features': int(fit_x.shape[1]),
+        'n_samples_fit': int(len(fit_x)),
+        'n_neighbors': int(model.n_neighbors),
+        'weights': model.weights,
+    }
+    return arrays, meta
+
+
+def export_compiled_model(model, scaler, output_dir):
+    """Экспорт модели со вложенным скейлером в каталог .npy файлов"""
+    kind = model_kind(model)
+    if kind == 'forest':
+        arrays, meta = _forest_arrays(model, scaler)
+    elif kind == 'linear':
+        arrays, meta = _linear_arrays(model, scaler)
+    elif kind == 'svc':
+        arrays, meta = _svc_arrays(model, scaler)
+    elif kind == 'neighbors':
+        arrays, meta = _neighbors_arrays(model, scaler)
+    else:
+        raise ValueError(f"Модель {type(model).__name__} не поддерживает компиляцию")
+
+    meta = {
+        'format_version': FORMAT_VERSION,
+        'kind': kind,
+        'model_type': type(model).__name__,
+        'classes': [int(cls) for cls in model.classes_],
+        'scaler_fused': scaler is not None,
+        **meta,
+    }
+
+    # Пишем во временный каталог и подменяем целиком, чтобы сервис не увидел половину файлов
+    output_dir = Path(output_dir)
+    tmp_dir = output_dir.with_name(output_dir.name + '.tmp')
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    tmp_dir.mkdir(parents=True)
+    for name, array in arrays.items():
+        np.save(tmp_dir / f"{name}.npy", np.ascontiguousarray(array))
+    with open(tmp_dir / 'meta.json', 'w') as f:
+        json.dump(meta, f, indent=2)
+
+    shutil.rmtree(output_dir, ignore_errors=True)
+    tmp_dir.rename(output_dir)
+    return meta
+
+
+def _check_features(X, n_features):
+    """Приведение входа к матрице float64 нужной ширины"""
+    X = np.asarray(X, dtype=np.float64)
+    if X.ndim != 2 or X.shape[1] != n_features:
+        raise ValueError(f"Ожидается матрица (n, {n_features}), получено {X.shape}")
+    return X
+
+
+class CompiledForest:
+    """Вычислитель развернутого ансамбля деревьев с интерфейсом predict_proba"""
+
+    def __init__(self, arrays, meta):
+        self.meta = meta
+        self.classes_ = np.array(meta['classes'])
+        self.n_features_in_ = meta['n_features']
+        self.feature = arrays['feature']
+        self.threshold = arrays['threshold']
+        self.children = arrays['children']
+        self.children_flat = self.children.ravel()
+        self.is_internal = self.children[:, 0] != np.arange(len(self.children))
+        self.missing_left = arrays['missing_left']
+        self.leaf_proba = arrays['leaf_proba']
+        self.roots = arrays['roots']
+
+    def predict_proba(self, X):
+        """Вероятности классов для всего пакета сырых признаков"""
+        X = np.ascontiguousarray(_check_features(X, self.n_features_in_))
+        n_trees = len(self.roots)
+        proba = np.empty((len(X), len(self.classes_)), dtype=np.float64)
+        chunk = max(1, CHUNK_SIZE // n_trees)
+
+        for start in range(0, len(X), chunk):
+            block = X[start:start + chunk]
+            leaves = self._apply(block)
+
+            # Суммируем деревья по порядку, как это делает RandomForestClassifier
+            if len(block) < n_trees:
+                proba[start:start + chunk] = np.cumsum(self.leaf_proba[leaves], axis=1)[:, -1]
+            else:
+                accumulated = np.zeros((len(block), len(self.classes_)), dtype=np.float64)
+                for tree_leaves in np.ascontiguousarray(leaves.T):
+                    accumulated += self.leaf_proba[tree_leaves]
+                proba[start:start + chunk] = accumulated
+
+        proba /= n_trees
+        return proba
+
+    def _apply(self, X):
+        """Номера листьев для каждой пары (образец, дерево)
+
+        Пары, дошедшие до листа, периодически исключаются из обхода, поэтому
+        работа пропорциональна средней, а не максимальной глубине деревьев.
+        """
+        n_samples, n_features = X.shape
+        n_trees = len(self.roots)
+        flat = X.ravel()
+        has_missing = np.isnan(flat).any()
+
+        leaves = np.empty(n_samples * n_trees, dtype=np.int64)
+        nodes = np.tile(self.roots, n_samples)
+        row_offset = np.repeat(np.arange(n_samples, dtype=np.int64) * n_features, n_trees)
+        positions = np.arange(n_samples * n_trees, dtype=np.int64)
+
+        # np.take заметно быстрее обычной индексации массивом на таких объемах
+        while len(nodes):
+            for _ in range(COMPACT_EVERY):
+                index = np.take(self.feature, nodes)
+                index += row_offset
+                values = np.take(flat, index)
+                go_right = values > np.take(self.threshold, nodes)
+                if has_missing:
+                    missing = np.isnan(values)
+                    go_right[missing] = ~np.take(self.missing_left, nodes[missing])
+                nodes *= 2
+                nodes += go_right
+                nodes = np.take(self.children_flat, nodes)
+
+            internal = np.take(self.is_internal, nodes)
+            done = np.flatnonzero(~internal)
+            leaves[np.take(positions, done)] = np.take(nodes, done)
+            active = np.flatnonzero(internal)
+            nodes = np.take(nodes, active)
+            row_offset = np.take(row_offset, active)
+            positions = np.take(positions, active)
+
+        return leaves.reshape(n_samples, n_trees)
+
+
+class CompiledLinear:
+    """Логистическая регрессия со вложенным масштабированием"""
+
+    def __init__(self, arrays, meta):
+        self.meta = meta
+        self.classes_ = np.array(meta['classes'])
+        self.n_features_in_ = meta['n_features']
+        self.coef = arrays['coef']
+        self.intercept = arrays['intercept']
+        self.ovr = meta['ovr']
+
+    def predict_proba(self, X):
+        """Вероятности классов для всего пакета сырых признаков"""
+        X = _check_features(X, self.n_features_in_)
+        decision = X @ self.coef.T + self.intercept
+
+        if self.ovr:
+            proba = 1.0 / (1.0 + np.exp(-decision))
+            if proba.shape[1] == 1:
+                return np.hstack([1.0 - proba, proba])
+            return proba / proba.sum(axis=1, keepdims=True)
+
+        if decision.shape[1] == 1:
+            decision = np.hstack([-decision, decision])
+        decision -= decision.max(axis=1, keepdims=True)
+        proba = np.exp(decision)
+        return proba / proba.sum(axis=1, keepdims=True)
+
+
+def _squared_distances(X, X_norms, points, point_norms):
+    """Квадраты евклидовых расстояний через ||x||² + ||y||² - 2·x·y (одно умножение матриц)"""
+    distances = X @ points.T
+    distances *= -2.0
+    distances += X_norms[:, np.newaxis]
+    distances += point_norms
+    np.maximum(distances, 0.0, out=distances)
+    return distances
+
+
+def _sigmoid_predict(decision, a, b):
+    """Калибровка Платта, как sigmoid_predict в libsvm"""
+    f_apb = decision * a + b
+    exp = np.exp(-np.abs(f_apb))
+    return np.where(f_apb >= 0, exp / (1.0 + exp), 1.0 / (1.0 + exp))
+
+
+def pairwise_coupling(pairwise):
+    """Вероятности классов по попарным (метод 2 Wu, Lin, Weng, как в libsvm)
+
+    pairwise - (n, k, k), pairwise[:, i, j] - вероятность класса i против j.
+    Итерации выполняются сразу для всего пакета; строки, достигшие точности
+    libsvm, исключаются из дальнейших итераций.
+    """
+    n, k = pairwise.shape[:2]
+    # Q[t, t] = sum_{j != t} r[j, t]^2, Q[t, j] = -r[j, t] * r[t, j]
+    transposed = pairwise.transpose(0, 2, 1)
+    Q = -transposed * pairwise
+    diagonal = np.arange(k)
+    Q[:, diagonal, diagonal] = (transposed ** 2).sum(axis=2)
+
+    proba = np.full((n, k), 1.0 / k)
+    eps = 0.005 / k
+    rows = np.arange(n)
+    for _ in range(max(SVC_MIN_ITERATIONS, k)):
+        q, p = Q[rows], proba[rows]
+        Qp = np.einsum('nij,nj->ni', q, p)
+        pQp = np.einsum('ni,ni->n', p, Qp)
+        active = np.abs(Qp - pQp[:, np.newaxis]).max(axis=1) >= eps
+        if not active.any():
+            break
+        rows, q, p, Qp, pQp = rows[active], q[active], p[active], Qp[active], pQp[active]
+
+        # Покоординатные шаги по классам, как в libsvm
+        for t in range(k):
+            q_tt = q[:, t, t]
+            diff = (pQp - Qp[:, t]) / q_tt
+            p[:, t] += diff
+            scale = 1.0 + diff
+            pQp = (pQp + diff * (diff * q_tt + 2.0 * Qp[:, t])) / scale / scale
+            Qp = (Qp + diff[:, np.newaxis] * q[:, t, :]) / scale[:, np.newaxis]
+            p /= scale[:, np.newaxis]
+        proba[rows] = p
+    return proba
+
+
+class CompiledSVC:
+    """SVC с калибровкой Платта: решающие функции всех пар одним умножением матриц"""
+
+    def __init__(self, arrays, meta):
+        self.meta = meta
+        self.classes_ = np.array(meta['classes'])
+        self.n_features_in_ = meta['n_features']
+        self.support_vectors = arrays['support_vectors']
+        self.support_norms = arrays['support_norms']
+        self.pair_coef = arrays['pair_coef']
+        self.intercept = arrays['intercept']
+        self.prob_a = arrays['prob_a']
+        self.prob_b = arrays['prob_b']
+        self.mean = arrays['mean']
+        self.scale = arrays['scale']
+
+    def _kernel(self, X):
+        """Значения ядра между пакетом и всеми опорными векторами"""
+        kernel, gamma = self.meta['kernel'], self.meta['gamma']
+        if kernel == 'rbf':
+            X_norms = np.einsum('ij,ij->i', X, X)
+            values = _squared_distances(X, X_norms, self.support_vectors, self.support_norms)
+            values *= -gamma
+            return np.exp(values, out=values)
+        values = X @ self.support_vectors.T
+        if kernel == 'poly':
+            # Целая степень умножениями, как powi в libsvm: pow() в NumPy намного медленнее
+            base = gamma * values + self.meta['coef0']
+            values = np.ones_like(base)
+            for _ in range(self.meta['degree']):
+                values *= base
+            return values
+        if kernel == 'sigmoid':
+            return np.tanh(gamma * values + self.meta['coef0'])
+        return values
+
+    def decision_pairs(self, X):
+        """Решающие функции всех пар классов (n, k(k-1)/2) в порядке libsvm"""
+        X = (_check_features(X, self.n_features_in_) - self.mean) / self.scale
+        decision = np.empty((len(X), len(self.intercept)))
+        block = max(1, KERNEL_BLOCK_SIZE // max(1, len(self.support_vectors)))
+        for start in range(0, len(X), block):
+            decision[start:start + block] = self._kernel(X[start:start + block]) @ self.pair_coef
+        decision += self.intercept
+        return decision
+
+    def predict_proba(self, X):
+        """Вероятности классов для всего пакета сырых признаков"""
+        pair_proba = _sigmoid_predict(self.decision_pairs(X), self.prob_a, self.prob_b)
+        np.clip(pair_proba, SVC_MIN_PROBABILITY, 1.0 - SVC_MIN_PROBABILITY, out=pair_proba)
+
+        k = len(self.classes_)
+        if k == 2:
+            return np.column_stack([pair_proba[:, 0], 1.0 - pair_proba[:, 0]])
+        upper_i, upper_j = np.triu_indices(k, 1)
+        pairwise = np.zeros((len(pair_proba), k, k))
+        pairwise[:, upper_i, upper_j] = pair_proba
+        pairwise[:, upper_j, upper_i] = 1.0 - pair_proba
+        return pairwise_coupling(pairwise)
+
+
+class CompiledNeighbors:
+    """k ближайших соседей: блочные расстояния через BLAS и точное уточнение кандидатов
+
+    Кандидаты (n_neighbors + NEIGHBOR_CANDIDATES ближайших по быстрой формуле)
+    пересчитываются точной разностью, при равных расстояниях раньше идет
+    обучающий образец с меньшим номером.
+    """
+
+    def __init__(self, arrays, meta):
+        self.meta = meta
+        self.classes_ = np.array(meta['classes'])
+        self.n_features_in_ = meta['n_features']
+        self.n_neighbors = meta['n_neighbors']
+        self.weights = meta['weights']
+        self.fit_x = arrays['fit_x']
+        self.fit_norms = arrays['fit_norms']
+        self.fit_labels = arrays['fit_labels']
+        self.mean = arrays['mean']
+        self.scale = arrays['scale']
+
+    def kneighbors(self, X):
+        """Расстояния до соседей и их номера в обучающей выборке, по возрастанию"""
+        X = (_check_features(X, self.n_features_in_) - self.mean) / self.scale
+        k = self.n_neighbors
+        n_candidates = min(k + NEIGHBOR_CANDIDATES, len(self.fit_x))
+        distances = np.empty((len(X), k))
+        indices = np.empty((len(X), k), dtype=np.int64)
+        block = max(1, KERNEL_BLOCK_SIZE // len(self.fit_x))
+
+        for start in range(0, len(X), block):
+            rows = X[start:start + block]
+            # ||x||² одинакова для всей строки и не меняет порядок кандидатов
+            approximate = rows @ self.fit_x.T
+            approximate *= -2.0
+            approximate += self.fit_norms
+            if n_candidates < len(self.fit_x):
+                candidates = np.argpartition(approximate, n_candidates - 1, axis=1)[:, :n_candidates]
+            else:
+                candidates = np.broadcast_to(np.arange(len(self.fit_x)), approximate.shape)
+            exact = ((rows[:, np.newaxis, :] - self.fit_x[candidates]) ** 2).sum(axis=2)
+            order = np.lexsort((candidates, exact))[:, :k]
+            distances[start:start + block] = np.sqrt(np.take_along_axis(exact, order, axis=1))
+            indices[start:start + block] = np.take_along_axis(candidates, order, axis=1)
+        return distances, indices
+
+    def predict_proba(self, X):
+        """Вероятности классов для всего пакета сырых признаков"""
+        distances, indices = self.kneighbors(X)
+        if self.weights == 'distance':
+            # Как в scikit-learn: при нулевом расстоянии учитываются только совпавшие образцы
+            with np.errstate(divide='ignore'):
+                weights = 1.0 / distances
+            exact_match = np.isinf(weights)
+            matched_rows = exact_match.any(axis=1)
+            weights[matched_rows] = exact_match[matched_rows]
+        else:
+            weights = np.ones_like(distances)
+
+        labels = self.fit_labels[indices]
+        proba = np.stack([(weights * (labels == c)).sum(axis=1) for c in range(len(self.classes_))], axis=1)
+        normalizer = proba.sum(axis=1, keepdims=True)
+        normalizer[normalizer == 0.0] = 1.0
+        return proba / normalizer
+
+
+COMPILED_MODELS = {
+    'forest': CompiledForest,
+    'linear': CompiledLinear,
+    'svc': CompiledSVC,
+    'neighbors': CompiledNeighbors,
+}
+
+
+def load_compiled_model(model_dir, mmap_mode=None):
+    """Загрузка скомпилированной модели из каталога
+
+    При mmap_mode='r' массивы отображаются в память только для чтения.
+    """
+    model_dir = Path(model_dir)
+    with open(model_dir / 'meta.json') as f:
+        meta = json.load(f)
+
+    if meta.get('format_version') != FORMAT_VERSION:
+        raise ValueError(f"Неподдерживаемая версия формата: {meta.get('format_version')}")
+
+    arrays = {path.stem: np.load(path, mmap_mode=mmap_mode) for path in model_dir.glob('*.npy')}
+    return COMPILED_MODELS[meta['kind']](arrays, meta)
@@ -0,0 +1,174 @@
+"""
+Бинарный колоночный кэш датасета Wine Quality
+
+При первом обращении CSV файлы красных и белых вин разбираются, объединяются
+(сначала красные, затем белые) и сохраняются в каталог data/cache: по одному
+.npy файлу на столбец плюс manifest.json с размером и временем модификации
+исходных CSV. Последующие загрузки отображают .npy файлы в память без
+разбора текста и без копирования. Если CSV изменился, кэш пересобирается.
+
+Новые размеченные образцы дописываются в отдельный файл NEW_SAMPLES (тот же
+формат плюс столбец wine_type_red) и идут в кэше после белых вин, поэтому
+строки исходного датасета сохраняют свои позиции.
+"""
+
+import csv
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+
+FORMAT_VERSION = 2
+
+DATA_DIR = Path(__file__).resolve().parent.parent / "data"
+
+SOURCES = {
+    'red': 'winequality-red.csv',
+    'white': 'winequality-white.csv',
+}
+
+# Дописываемые образцы (необязательный файл)
+NEW_SAMPLES = 'winequality-new.csv'
+
+# Целочисленные столбцы; остальные признаки хранятся как float64
+INTEGER_COLUMNS = ('quality', 'wine_type_red')
+
+
+def _source_signature(data_dir):
+    """Размер и время модификации исходных CSV"""
+    signature = {}
+    for wine_type, filename in SOURCES.items():
+        stat = os.stat(data_dir / filename)
+        signature[wine_type] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+    if (data_dir / NEW_SAMPLES).exists():
+        stat = os.stat(data_dir / NEW_SAMPLES)
+        signature['new'] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+    return signature
+
+
+def _read_csv(path):
+    """Разбор CSV датасета (разделитель ';', заголовок в кавычках)"""
+    with open(path, newline='') as f:
+        header = next(csv.reader(f, delimiter=';'))
+    values = np.loadtxt(path, delimiter=';', skiprows=1, dtype=np.float64, ndmin=2)
+    return header, values
+
+
+def _read_manifest(cache_dir):
+    """Манифест кэша или None, если кэша нет"""
+    try:
+        with open(cache_dir / 'manifest.json') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def build_cache(data_dir=DATA_DIR, cache_dir=None):
+    """Разбор CSV и запись колоночного кэша"""
+    data_dir = Path(data_dir)
+    cache_dir = Path(cache_dir) if cache_dir else data_dir / "cache"
+    cache_dir.mkdir(parents=True, exist_ok=True)
+
+    signature = _source_signature(data_dir)
+    red_header, red = _read_csv(data_dir / SOURCES['red'])
+    white_header, white = _read_csv(data_dir / SOURCES['white'])
+    if red_header != white_header:
+        raise ValueError("Столбцы файлов красных и белых вин не совпадают")
+
+    new_header, new = red_header + ['wine_type_red'], np.empty((0, len(red_header) + 1))
+    if 'new' in signature:
+        new_header, new = _read_csv(data_dir / NEW_SAMPLES)
+    if new_header != red_header + ['wine_type_red']:
+        raise ValueError(f"Столбцы файла {NEW_SAMPLES} не совпадают с датасетом")
+
+    values = np.concatenate([red, white, new[:, :-1]])
+    columns = {name: values[:, i] for i, name in enumerate(red_header)}
+    columns['wine_type_red'] = np.concatenate([np.ones(len(red)), np.zeros(len(white)), new[:, -1]])
+
+    # Каждый файл подменяется атомарно, манифест пишется последним,
+    # поэтому параллельные воркеры не увидят недописанный кэш
+    entries = []
+    for i, (name, column) in enumerate(columns.items()):
+        dtype = np.int64 if name in INTEGER_COLUMNS else np.float64
+        filename = f"column_{i:02d}.npy"
+        tmp_path = cache_dir / f"{filename}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.save(f, np.ascontiguousarray(column, dtype=dtype))
+        os.replace(tmp_path, cache_dir / filename)
+        entries.append({'name': name, 'file': filename, 'dtype': np.dtype(dtype).str})
+
+    manifest = {
+        'format_version': FORMAT_VERSION,
+        'sources': signature,
+        'rows': {'red': int(len(red)), 'white': int(len(white)), 'new': int(len(new))},
+        'columns': entries,
+    }
+    tmp_manifest = cache_dir / f"manifest.json.{os.getpid()}.tmp"
+    with open(tmp_manifest, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_manifest, cache_dir / 'manifest.json')
+    return manifest
+
+
+def load_wine_columns(data_dir=DATA_DIR, cache_dir=None):
+    """Столбцы датасета в виде отображенных в память массивов только для чтения
+
+    Имена столбцов совпадают с заголовком CSV, добавлен столбец wine_type_red.
+    """
+    data_dir = Path(data_dir)
+    cache_dir = Path(cache_dir) if cache_dir else data_dir / "cache"
+
+    manifest = _read_manifest(cache_dir)
+    if (
+        manifest is None
+        or manifest.get('format_version') != FORMAT_VERSION
+        or manifest.get('sources') != _source_signature(data_dir)
+    ):
+        manifest = build_cache(data_dir, cache_dir)
+
+    return {
+        entry['name']: np.load(cache_dir / entry['file'], mmap_mode='r')
+        for entry in manifest['columns']
+    }
+
+
+def append_samples(columns, data_dir=DATA_DIR):
+    """Дописывание размеченных образцов {столбец: значения} в NEW_SAMPLES
+
+    Нужны все столбцы датасета (как в заголовке CSV) и wine_type_red.
+    Кэш пересоберется при следующей загрузке.
+    """
+    data_dir = Path(data_dir)
+    with open(data_dir / SOURCES['red'], newline='') as f:
+        header = next(csv.reader(f, delimiter=';')) + ['wine_type_red']
+    missing = [name for name in header if name not in columns]
+    if missing:
+        raise ValueError(f"Нет столбцов: {', '.join(missing)}")
+
+    values = np.column_stack([np.asarray(columns[name], dtype=np.float64) for name in header])
+    path = data_dir / NEW_SAMPLES
+    write_header = not path.exists()
+    with open(path, 'a', newline='') as f:
+        writer = csv.writer(f, delimiter=';', quoting=csv.QUOTE_NONNUMERIC)
+        if write_header:
+            writer.writerow(header)
+        writer.writerows(values.tolist())
+    return len(values)
+
+
+def to_feature_name(name):
+    """Имя столбца из заголовка CSV в имя признака API (fixed acidity -> fixed_acidity)"""
+    return name.strip().replace(' ', '_')
+
+
+def to_feature_names(columns):
+    """Переименование столбцов из заголовка CSV в имена признаков API"""
+    return {to_feature_name(name): column for name, column in columns.items()}
+
+
+def load_wine_frame(data_dir=DATA_DIR, cache_dir=None):
+    """Датасет в виде pandas DataFrame (для обучения и анализа)"""
+    import pandas as pd
+
+    return pd.DataFrame(load_wine_columns(data_dir, cache_dir))
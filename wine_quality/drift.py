@@ -0,0 +1,233 @@
+"""
+Оценка входов вне распределения обучающей выборки и сводка дрейфа
+
+input_distribution() при обучении сохраняет в model_metadata.json среднее и
+обратную ковариационную матрицу признаков, расстояние Махаланобиса, которое
+не превышают OOD_QUANTILE обучающих строк, и границы квантильных корзин
+каждого признака с долями обучающей выборки в них.
+
+InputMonitor в сервисе оценивает всю матрицу запроса сразу: ood_score строки -
+расстояние Махаланобиса, деленное на порог обучающей выборки (больше 1 - вне
+распределения). Обратная ковариация заранее раскладывается в проекцию W
+(W Wᵀ = Σ⁻¹, порог уже учтен), и оценка - норма строки XW - μW: одно
+умножение матриц на пакет. Корзины всех признаков
+считаются сравнениями матрицы с каждым столбцом границ и одним bincount;
+одиночные строки копятся до OBSERVE_BATCH_ROWS и учитываются пачкой, чтобы
+накладные расходы NumPy не ложились на каждый запрос. Счетчики хранятся в
+кольце из DRIFT_BUCKETS частей скользящего окна; из пакета больше одной части
+в окно попадают равномерно взятые строки, поэтому окно не вытесняется одним
+большим пакетом. summary() сравнивает доли окна с обучающими по PSI.
+"""
+
+import threading
+
+import numpy as np
+
+# Квантиль расстояний обучающей выборки, принятый за границу распределения
+OOD_QUANTILE = 0.99
+
+# Квантильных корзин на признак
+DRIFT_BINS = 10
+
+# Пороги PSI: заметный сдвиг и дрейф
+PSI_WARNING = 0.1
+PSI_ALERT = 0.25
+
+# Меньше строк в окне - PSI вычисляется, но статус признака не присваивается
+DRIFT_MIN_ROWS = 500
+
+# Нижняя граница долей корзин в PSI (пустая корзина дала бы бесконечность)
+PSI_EPSILON = 1e-4
+
+# Частей скользящего окна: окно сдвигается на 1/DRIFT_BUCKETS своего размера
+DRIFT_BUCKETS = 10
+
+# Строк, после которых отложенные малые пакеты учитываются в окне
+OBSERVE_BATCH_ROWS = 256
+
+
+def _bin_counts(features, edges, n_bins):
+    """Число строк в каждой корзине каждого признака, (признаков, n_bins)
+
+    edges - границы (признаков, n_bins - 1); значение на границе относится к
+    нижней корзине.
+    """
+    n_features = features.shape[1]
+    indices = np.broadcast_to(np.arange(n_features) * n_bins, features.shape).copy()
+    for column in edges.T:
+        indices += features > column
+    return np.bincount(indices.ravel(), minlength=n_features * n_bins).reshape(n_features, n_bins)
+
+
+def input_distribution(columns, to_name=None, bins=DRIFT_BINS):
+    """Статистика обучающей выборки для model_metadata.json
+
+    columns - отображение имя -> значения (например, DataFrame), to_name -
+    перевод имени столбца в имя признака API.
+    """
+    names = [to_name(column) if to_name else column for column, _ in columns.items()]
+    X = np.column_stack([np.asarray(values, dtype=np.float64) for _, values in columns.items()])
+
+    mean = X.mean(axis=0)
+    # Псевдообратная матрица устойчива к вырожденной ковариации
+    inverse_covariance = np.linalg.pinv(np.cov(X, rowvar=False))
+    diff = X - mean
+    distances = np.sqrt(np.maximum(((diff @ inverse_covariance) * diff).sum(axis=1), 0))
+
+    edges = np.quantile(X, np.arange(1, bins) / bins, axis=0).T
+    expected = _bin_counts(X, edges, bins) / len(X)
+
+    return {
+        'features': names,
+        'mean': mean.tolist(),
+        'inverse_covariance': inverse_covariance.tolist(),
+        'ood_distance': float(np.quantile(distances, OOD_QUANTILE)),
+        'bin_edges': edges.tolist(),
+        'bin_expected': expected.tolist(),
+        'rows': int(len(X)),
+    }
+
+
+class InputMonitor:
+    """Оценки OOD и скользящая сводка дрейфа входов одной версии модели
+
+    distribution - результат input_distribution(); names задает порядок
+    столбцов матрицы запроса. Счетчики свои у каждого процесса.
+    """
+
+    def __init__(self, distribution, names, window_rows=10000, buckets=DRIFT_BUCKETS):
+        order = [distribution['features'].index(name) for name in names]
+        self.names = list(names)
+        self.mean = np.asarray(distribution['mean'], dtype=np.float64)[order]
+        inverse_covariance = np.asarray(distribution['inverse_covariance'], dtype=np.float64)[
+            np.ix_(order, order)]
+        self.ood_distance = float(distribution['ood_distance'])
+        # Σ⁻¹ симметрична и неотрицательно определена: W = V·sqrt(λ) по собственным векторам
+        eigenvalues, eigenvectors = np.linalg.eigh(inverse_covariance)
+        self._projection = eigenvectors * np.sqrt(np.maximum(eigenvalues, 0)) / self.ood_distance
+        self._offset = self.mean @ self._projection
+        self.edges = np.asarray(distribution['bin_edges'], dtype=np.float64)[order]
+        self.expected = np.asarray(distribution['bin_expected'], dtype=np.float64)[order]
+        self.n_bins = self.expected.shape[1]
+
+        self.window_rows = window_rows
+        self.bucket_rows = max(1, window_rows // buckets)
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Очистка окна (после прогрева сервиса)"""
+        with self._lock:
+            self._ring = []
+            self._current = self._empty_bucket()
+            self._pending = []
+            self._pending_rows = 0
+            self._pending_ood = 0
+            self.total_rows = 0
+            self.total_ood = 0
+
+    def _empty_bucket(self):
+        return {'rows': 0, 'ood': 0, 'counts': np.zeros((len(self.names), self.n_bins), dtype=np.int64),
+                'sums': np.zeros(len(self.names))}
+
+    def score(self, features):
+        """ood_score строк матрицы: расстояние Махаланобиса в долях порога"""
+        projected = features @ self._projection
+        projected -= self._offset
+        return np.sqrt((projected * projected).sum(axis=1))
+
+    def observe(self, features, scores):
+        """Учет строк в скользящем окне; возвращает число строк вне распределения"""
+        outside = scores > 1
+        ood = total_ood = int(np.count_nonzero(outside))
+        rows = len(features)
+        if rows > self.bucket_rows:
+            step = -(-rows // self.bucket_rows)
+            features = features[::step]
+            ood = int(np.count_nonzero(outside[::step]))
+
+        with self._lock:
+            self.total_rows += rows
+            self.total_ood += total_ood
+            if len(features) < OBSERVE_BATCH_ROWS:
+                self._pending.append(features)
+                self._pending_rows += len(features)
+                self._pending_ood += ood
+                if self._pending_rows < OBSERVE_BATCH_ROWS:
+                    return total_ood
+                features, ood = self._take_pending()
+        self._add(features, ood)
+        return total_ood
+
+    def _take_pending(self):
+        """Отложенные строки одной матрицей (под блокировкой)"""
+        features = np.concatenate(self._pending)
+        ood = self._pending_ood
+        self._pending = []
+        self._pending_rows = 0
+        self._pending_ood = 0
+        return features, ood
+
+    def _add(self, features, ood):
+        """Счетчики корзин и суммы строк в текущую часть окна"""
+        counts = _bin_counts(features, self.edges, self.n_bins)
+        sums = features.sum(axis=0)
+        with self._lock:
+            bucket = self._current
+            bucket['rows'] += len(features)
+            bucket['ood'] += ood
+            bucket['counts'] += counts
+            bucket['sums'] += sums
+            if bucket['rows'] >= self.bucket_rows:
+                self._ring = (self._ring + [bucket])[1 - self.buckets:] if self.buckets > 1 else []
+                self._current = self._empty_bucket()
+
+    def assess(self, features):
+        """Оценки OOD строк и их учет в окне; (оценки, число строк вне распределения)"""
+        scores = self.score(features)
+        return scores, self.observe(features, scores)
+
+    def summary(self):
+        """Доля строк вне распределения и PSI каждого признака по скользящему окну"""
+        with self._lock:
+            pending = self._take_pending() if self._pending else None
+        if pending is not None:
+            self._add(*pending)
+
+        with self._lock:
+            buckets = self._ring + [self._current]
+            rows = sum(bucket['rows'] for bucket in buckets)
+            ood = sum(bucket['ood'] for bucket in buckets)
+            counts = sum(bucket['counts'] for bucket in buckets)
+            sums = sum(bucket['sums'] for bucket in buckets)
+            total_rows, total_ood = self.total_rows, self.total_ood
+
+        result = {
+            'window_rows': rows,
+            'window_size': self.window_rows,
+            'ood_rate': ood / rows if rows else None,
+            'ood_distance': self.ood_distance,
+            'total_rows': total_rows,
+            'total_ood': total_ood,
+            'features': {},
+        }
+        if not rows:
+            return result
+
+        actual = np.maximum(counts / rows, PSI_EPSILON)
+        expected = np.maximum(self.expected, PSI_EPSILON)
+        psi = ((actual - expected) * np.log(actual / expected)).sum(axis=1)
+        for name, value, mean, reference in zip(self.names, psi.tolist(), (sums / rows).tolist(),
+                                                self.mean.tolist()):
+            if rows < DRIFT_MIN_ROWS:
+                status = 'insufficient_data'
+            else:
+                status = 'drift' if value >= PSI_ALERT else 'warning' if value >= PSI_WARNING else 'stable'
+            result['features'][name] = {
+                'psi': value,
+                'status': status,
+                'mean': mean,
+                'reference_mean': reference,
+            }
+        return result
@@ -0,0 +1,136 @@
+"""
+Инкрементальное обновление обученной модели новыми размеченными образцами
+
+Деревья не зависят от масштаба признаков, поэтому ансамбль сохраняет
+прежний StandardScaler и достраивается через warm_start новыми деревьями,
+обученными на выборке с новыми строками; старые деревья не меняются.
+Перевод порогов в новое масштабирование менял бы предсказания: пороги
+лежат между соседними значениями данных, и после повторной стандартизации
+такие значения совпадают в float32.
+
+Для логистической регрессии скейлер обновляется по новым строкам
+(partial_fit: накопленные среднее и дисперсия), коэффициенты пересчитываются
+в новое масштабирование, и модель дообучается с текущих коэффициентов.
+check_rescaled() подтверждает, что пересчитанная модель дает прежние
+вероятности, до дообучения.
+
+scikit-learn импортируется внутри функций: модуль, как и весь пакет,
+импортируется без него.
+"""
+
+import copy
+
+import numpy as np
+
+# Модели, которые умеют обновляться; остальные требуют полного переобучения
+FOREST_MODELS = ('RandomForestClassifier', 'ExtraTreesClassifier', 'GradientBoostingClassifier')
+LINEAR_MODELS = ('LogisticRegression',)
+
+# Минимум новых деревьев за одно обновление
+MIN_NEW_TREES = 10
+
+# Допустимое расхождение вероятностей модели до и после перевода в новый масштаб
+RESCALE_TOLERANCE = 1e-6
+
+
+def supports_update(model):
+    """True, если модель можно обновить без полного переобучения"""
+    return type(model).__name__ in FOREST_MODELS + LINEAR_MODELS
+
+
+def update_scaler(scaler, X_new):
+    """Копия StandardScaler с учетом новых строк (накопленные среднее и дисперсия)"""
+    scaler = copy.deepcopy(scaler)
+    scaler.partial_fit(X_new)
+    return scaler
+
+
+def mean_shift(X_reference, X_new, by=None):
+    """Наибольший сдвиг среднего новых строк по признаку, в стандартных отклонениях
+
+    by - столбец группы (например, wine_type_red): новые строки каждой группы
+    сравниваются со строками той же группы, иначе партия одного типа вина
+    выглядела бы сдвигом относительно смеси.
+    """
+    if by is None:
+        groups = [(X_reference, X_new)]
+    else:
+        groups = [(X_reference[X_reference[by] == value], X_new[X_new[by] == value])
+                  for value in np.unique(X_new[by])]
+
+    shift = 0.0
+    for reference, new in groups:
+        reference = np.asarray(reference, dtype=np.float64)
+        new = np.asarray(new, dtype=np.float64)
+        if len(reference) < 2:
+            return float('inf')
+        std = reference.std(axis=0)
+        std[std == 0.0] = 1.0
+        shift = max(shift, float(np.max(np.abs(new.mean(axis=0) - reference.mean(axis=0)) / std)))
+    return shift
+
+
+def _trees(model):
+    """Все деревья ансамбля (у GradientBoosting - двумерный массив)"""
+    return list(np.ravel(model.estimators_))
+
+
+def rescale_model(model, old_scaler, new_scaler):
+    """Копия линейной модели, принимающая признаки в масштабе new_scaler
+
+    Решающие функции те же с точностью до округления.
+    """
+    if type(model).__name__ not in LINEAR_MODELS:
+        raise ValueError(f"Модель {type(model).__name__} не переводится в новый масштаб")
+    model = copy.deepcopy(model)
+    old_mean, old_scale = np.asarray(old_scaler.mean_), np.asarray(old_scaler.scale_)
+    new_mean, new_scale = np.asarray(new_scaler.mean_), np.asarray(new_scaler.scale_)
+
+    # w·((x - m) / s) + b = (w·s'/s)·((x - m') / s') + b + w·((m' - m) / s)
+    coef = np.asarray(model.coef_, dtype=np.float64)
+    model.intercept_ = model.intercept_ + coef @ ((new_mean - old_mean) / old_scale)
+    model.coef_ = coef * (new_scale / old_scale)
+    return model
+
+
+def prepare_update(model, scaler, X_new):
+    """Копии модели и скейлера, с которых начинается обновление новыми строками
+
+    Ансамбль деревьев остается в прежнем масштабе; для линейной модели
+    скейлер учитывает X_new, а модель переводится в его масштаб.
+    """
+    if type(model).__name__ in FOREST_MODELS:
+        return copy.deepcopy(model), copy.deepcopy(scaler)
+    if type(model).__name__ in LINEAR_MODELS:
+        new_scaler = update_scaler(scaler, X_new)
+        return rescale_model(model, scaler, new_scaler), new_scaler
+    raise ValueError(f"Модель {type(model).__name__} не поддерживает обновление")
+
+
+def check_rescaled(model, scaler, updated, new_scaler, X):
+    """Наибольшее расхождение вероятностей модели до и после prepare_update на строках X"""
+    before = model.predict_proba(scaler.transform(X))
+    after = updated.predict_proba(new_scaler.transform(X))
+    return float(np.max(np.abs(after - before))) if len(before) else 0.0
+
+
+def grow_model(model, X, y, new_rows):
+    """Дообучение модели в новом масштабе на выборке X, y с new_rows новыми строками
+
+    Ансамбль получает новые деревья пропорционально приросту данных (не меньше
+    MIN_NEW_TREES), старые деревья не меняются. Возвращает модель и число
+    добавленных деревьев (0 для линейной модели).
+    """
+    params = model.get_params()
+    if type(model).__name__ in FOREST_MODELS:
+        n_trees = params['n_estimators']
+        added = max(MIN_NEW_TREES, int(np.ceil(n_trees * new_rows / max(len(X) - new_rows, 1))))
+        model.set_params(warm_start=True, n_estimators=n_trees + added)
+        model.fit(X, y)
+        model.set_params(warm_start=params['warm_start'])
+        return model, added
+
+    model.set_params(warm_start=True)
+    model.fit(X, y)
+    model.set_params(warm_start=params['warm_start'])
+    return model, 0
@@ -0,0 +1,212 @@
+"""
+Метрики сервиса в текстовом формате Prometheus
+
+Гистограммы с фиксированными границами и счетчики хранятся в памяти процесса:
+наблюдение - бинарный поиск корзины и два сложения под блокировкой потоков.
+
+Воркеры gunicorn - отдельные процессы, поэтому при заданном каталоге каждый
+процесс раз в flush_interval секунд записывает в него снимок своих метрик
+(<pid>.json, атомарная подмена файла). render() в любом воркере складывает
+свои текущие значения со снимками остальных процессов: корзины гистограмм и
+счетчики аддитивны, поэтому сумма равна тому, что собрал бы один процесс.
+Снимки завершившихся воркеров остаются, и счетчики не убывают при перезапуске
+воркера; каталог очищается при старте сервера (docker/gunicorn.conf.py).
+"""
+
+import bisect
+import json
+import math
+import os
+import threading
+import time
+from pathlib import Path
+
+# Границы гистограмм времени (секунды) и размеров пакетов (строки)
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 50000)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _process_alive(pid):
+    """True, если процесс с таким pid существует"""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _format_value(value):
+    """Число в формате Prometheus"""
+    if value == math.inf:
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(names, values):
+    """{name="value",...} с экранированием значений"""
+    if not names:
+        return ''
+    pairs = []
+    for name, value in zip(names, values):
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pairs.append(f'{name}="{value}"')
+    return '{' + ','.join(pairs) + '}'
+
+
+class Metrics:
+    """Реестр гистограмм и счетчиков одного сервиса
+
+    Серия метрики - набор значений меток в порядке, заданном при объявлении.
+    info - функция без аргументов, возвращающая метки процесса (например,
+    версию модели); они выводятся метрикой <prefix>_process_info для каждого
+    живого процесса.
+    """
+
+    def __init__(self, directory=None, flush_interval=1.0, info=None, prefix='wine'):
+        self.directory = Path(directory) if directory else None
+        self.flush_interval = flush_interval
+        self.info = info
+        self.prefix = prefix
+        self._families = {}
+        self._series = {}
+        self._lock = threading.Lock()
+        self._pid = None
+        self._dirty = False
+
+    def histogram(self, name, help_text, labels, buckets):
+        """Объявление гистограммы"""
+        self._families[name] = ('histogram', help_text, tuple(labels), tuple(buckets))
+
+    def counter(self, name, help_text, labels):
+        """Объявление счетчика"""
+        self._families[name] = ('counter', help_text, tuple(labels), None)
+
+    def observe(self, name, labels, value):
+        """Наблюдение гистограммы: labels - кортеж значений меток"""
+        self._ensure_process()
+        buckets = self._families[name][3]
+        key = (name, labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # Счетчики корзин (последняя - +Inf) и сумма наблюдений
+                series = self._series[key] = [0] * (len(buckets) + 1) + [0.0]
+            series[bisect.bisect_left(buckets, value)] += 1
+            series[-1] += value
+            self._dirty = True
+
+    def inc(self, name, labels, amount=1):
+        """Увеличение счетчика"""
+        self._ensure_process()
+        key = (name, labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0]
+            series[0] += amount
+            self._dirty = True
+
+    def snapshot(self):
+        """Значения метрик этого процесса"""
+        with self._lock:
+            series = [[name, list(labels), list(values)] for (name, labels), values in self._series.items()]
+        return {'pid': os.getpid(), 'info': self.info() if self.info else {}, 'series': series}
+
+    def render(self):
+        """Метрики всех процессов в текстовом формате Prometheus"""
+        snapshots = [self.snapshot()] + self._other_snapshots()
+
+        merged = {}
+        for snapshot in snapshots:
+            for name, labels, values in snapshot['series']:
+                if name not in self._families:
+                    continue
+                key = (name, tuple(labels))
+                total = merged.get(key)
+                if total is None:
+                    merged[key] = list(values)
+                elif len(total) == len(values):
+                    merged[key] = [a + b for a, b in zip(total, values)]
+
+        lines = []
+        for name, (kind, help_text, label_names, buckets) in self._families.items():
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            for labels, values in sorted((key[1], values) for key, values in merged.items() if key[0] == name):
+                if kind == 'counter':
+                    lines.append(f'{name}{_format_labels(label_names, labels)} {_format_value(values[0])}')
+                    continue
+                cumulative = 0
+                for bound, count in zip(buckets + (math.inf,), values):
+                    cumulative += count
+                    bucket_labels = _format_labels(label_names + ('le',), labels + (_format_value(bound),))
+                    lines.append(f'{name}_bucket{bucket_labels} {cumulative}')
+                series_labels = _format_labels(label_names, labels)
+                lines.append(f'{name}_sum{series_labels} {_format_value(values[-1])}')
+                lines.append(f'{name}_count{series_labels} {cumulative}')
+
+        # Метки каждого живого процесса (версия модели и т.п.)
+        info_name = f'{self.prefix}_process_info'
+        lines.append(f'# HELP {info_name} Процесс сервиса и его метки')
+        lines.append(f'# TYPE {info_name} gauge')
+        for snapshot in snapshots:
+            if snapshot['pid'] != os.getpid() and not _process_alive(snapshot['pid']):
+                continue
+            info = {'pid': snapshot['pid'], **snapshot['info']}
+            lines.append(f'{info_name}{_format_labels(tuple(info), tuple(info.values()))} 1')
+        return '\n'.join(lines) + '\n'
+
+    def _other_snapshots(self):
+        """Последние снимки остальных процессов из каталога"""
+        if self.directory is None:
+            return []
+        snapshots = []
+        for path in self.directory.glob('*.json'):
+            if path.stem == str(os.getpid()):
+                continue
+            try:
+                with open(path) as f:
+                    snapshots.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        return snapshots
+
+    def _ensure_process(self):
+        """После fork метрики родителя сбрасываются, поток записи снимков запускается заново"""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self._series = {}
+                self._pid = os.getpid()
+                if self.directory is not None:
+                    threading.Thread(target=self._flush_loop, name='metrics-flush', daemon=True).start()
+
+    def _flush_loop(self):
+        """Периодическая запись снимка процесса"""
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except OSError:
+                continue
+
+    def flush(self):
+        """Запись снимка процесса в каталог, если метрики изменились"""
+        if self.directory is None or not self._dirty:
+            return
+        self._dirty = False
+        snapshot = self.snapshot()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.directory / f'{snapshot["pid"]}.json'
+        tmp_path = path.with_suffix('.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(snapshot, f)
+        os.replace(tmp_path, path)
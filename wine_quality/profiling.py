@@ -0,0 +1,198 @@
+"""
+Профилирование обучения по этапам
+
+TrainingProfiler.stage(name) - контекстный менеджер, который записывает для
+этапа время по часам, процессорное время (вместе с дочерними процессами,
+завершившимися за этап, - так учитывается параллельное обучение кандидатов),
+пиковый RSS процесса и число обучений моделей, о которых сообщает код этапа
+(add_fits). В подробном режиме tracemalloc измеряет пик памяти, выделенной на
+этапе (Python и NumPy), а с cprofile=True каждый этап профилируется cProfile и
+сохраняется профиль самого долгого этапа. cProfile видит только этот процесс:
+обучение кандидатов в дочерних процессах в нем выглядит ожиданием.
+
+Отчет - словарь для model_metadata.json, а также отдельные JSON и HTML файлы.
+"""
+
+import cProfile
+import html
+import io
+import json
+import os
+import pstats
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# SVC(probability=True) дополнительно обучается на 5 фолдах для калибровки Платта
+PLATT_FOLDS = 5
+
+
+def fits_per_fit(estimator):
+    """Сколько обучений модели выполняет один вызов fit"""
+    if type(estimator).__name__ in ('SVC', 'NuSVC') and estimator.get_params().get('probability'):
+        return 1 + PLATT_FOLDS
+    return 1
+
+
+def peak_rss_mb():
+    """Пиковый RSS этого процесса, МБ (None, если недоступен)"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # В Linux ru_maxrss в килобайтах, в macOS - в байтах
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def _cpu_seconds():
+    """Процессорное время процесса и его завершившихся потомков"""
+    times = os.times()
+    return times.user + times.system + times.children_user + times.children_system
+
+
+class TrainingProfiler:
+    """Время, память и число обучений по этапам и кандидатам
+
+    memory - пик выделенной памяти через tracemalloc (замедляет обучение);
+    cprofile - профиль cProfile каждого этапа.
+    """
+
+    def __init__(self, memory=False, cprofile=False):
+        self.memory = memory
+        self.cprofile = cprofile
+        self.stages = []
+        self.candidates = {}
+        self._profiles = {}
+        self._current = None
+        self._start = time.perf_counter()
+        if memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    @contextmanager
+    def stage(self, name):
+        """Замер этапа"""
+        record = {'name': name, 'fits': 0}
+        self._current = record
+        if self.memory:
+            tracemalloc.reset_peak()
+            traced_before = tracemalloc.get_traced_memory()[0]
+        profile = cProfile.Profile() if self.cprofile else None
+        cpu_start = _cpu_seconds()
+        wall_start = time.perf_counter()
+        if profile is not None:
+            profile.enable()
+        try:
+            yield record
+        finally:
+            if profile is not None:
+                profile.disable()
+                self._profiles[name] = profile
+            record['wall_seconds'] = time.perf_counter() - wall_start
+            record['cpu_seconds'] = _cpu_seconds() - cpu_start
+            record['peak_rss_mb'] = peak_rss_mb()
+            if self.memory:
+                record['peak_allocated_mb'] = (tracemalloc.get_traced_memory()[1] - traced_before) / 2**20
+            self.stages.append(record)
+            self._current = None
+
+    def add_fits(self, count):
+        """Учет обучений моделей в текущем этапе"""
+        if self._current is not None:
+            self._current['fits'] += int(count)
+
+    def add_candidate(self, name, **values):
+        """Показатели модели-кандидата (время обучения, число обучений и т.п.)"""
+        self.candidates.setdefault(name, {}).update(values)
+
+    def slowest_stage(self):
+        """Самый долгий этап или None"""
+        return max(self.stages, key=lambda record: record['wall_seconds'], default=None)
+
+    def report(self):
+        """Отчет для метаданных модели"""
+        slowest = self.slowest_stage()
+        return {
+            'total_wall_seconds': time.perf_counter() - self._start,
+            'slowest_stage': slowest['name'] if slowest else None,
+            'memory_traced': self.memory,
+            'stages': list(self.stages),
+            'candidates': dict(self.candidates),
+        }
+
+    def write(self, output_dir, name):
+        """Отчет в <name>.json и <name>.html, профиль самого долгого этапа в <name>.prof
+
+        Возвращает список записанных файлов.
+        """
+        output_dir = Path(output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
+        report = self.report()
+        paths = [output_dir / f'{name}.json', output_dir / f'{name}.html']
+        with open(paths[0], 'w') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        with open(paths[1], 'w', encoding='utf-8') as f:
+            f.write(render_html(report, name))
+
+        profile = self._profiles.get(report['slowest_stage'])
+        if profile is not None:
+            paths.append(output_dir / f'{name}.prof')
+            profile.dump_stats(paths[-1])
+        return paths
+
+    def top_functions(self, limit=20):
+        """Текст самых затратных функций самого долгого этапа (собственное время)"""
+        slowest = self.slowest_stage()
+        profile = self._profiles.get(slowest['name']) if slowest else None
+        if profile is None:
+            return ''
+        stream = io.StringIO()
+        pstats.Stats(profile, stream=stream).sort_stats('tottime').print_stats(limit)
+        return stream.getvalue()
+
+
+def _cell(value):
+    if value is None:
+        return '—'
+    if isinstance(value, float):
+        return f'{value:.2f}'
+    return html.escape(str(value))
+
+
+def _table(rows, columns):
+    head = ''.join(f'<th>{html.escape(title)}</th>' for _, title in columns)
+    body = ''.join(
+        '<tr>' + ''.join(f'<td>{_cell(row.get(key))}</td>' for key, _ in columns) + '</tr>'
+        for row in rows
+    )
+    return f'<table><tr>{head}</tr>{body}</table>'
+
+
+def render_html(report, title):
+    """HTML отчет: таблицы этапов и кандидатов"""
+    stage_columns = [('name', 'Этап'), ('wall_seconds', 'Время, с'), ('cpu_seconds', 'CPU, с'),
+                     ('fits', 'Обучений'), ('peak_rss_mb', 'Пик RSS, МБ')]
+    if report['memory_traced']:
+        stage_columns.append(('peak_allocated_mb', 'Пик выделения, МБ'))
+    candidate_columns = [('name', 'Кандидат'), ('fit_seconds', 'Время, с'), ('cpu_seconds', 'CPU, с'),
+                         ('fits', 'Обучений'), ('peak_rss_mb', 'Пик RSS, МБ'), ('from_cache', 'Из кэша'),
+                         ('val_accuracy', 'Val Accuracy')]
+    candidates = [{'name': name, **values} for name, values in report['candidates'].items()]
+    return f"""<!DOCTYPE html>
+<html lang="ru"><head><meta charset="utf-8"><title>Профиль обучения {html.escape(title)}</title>
+<style>body{{font-family:sans-serif;margin:2em}}table{{border-collapse:collapse;margin-bottom:2em}}
+td,th{{border:1px solid #ccc;padding:4px 10px;text-align:right}}td:first-child,th:first-child{{text-align:left}}</style>
+</head><body>
+<h1>Профиль обучения {html.escape(title)}</h1>
+<p>Всего: {report['total_wall_seconds']:.1f} с, самый долгий этап: {_cell(report['slowest_stage'])}</p>
+<h2>Этапы</h2>
+{_table(report['stages'], stage_columns)}
+<h2>Кандидаты</h2>
+{_table(candidates, candidate_columns)}
+</body></html>
+"""
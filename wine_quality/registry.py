@@ -0,0 +1,97 @@
+"""
+Реестр версий модели
+
+Каждая версия - неизменяемый каталог models/versions/<версия>/ с моделью
+(best_wine_model.pkl), скейлером (scaler.pkl), model_metadata.json и, если
+модель компилируется, compiled_model/. Версия собирается во временном
+каталоге и появляется в versions/ одним переименованием.
+
+Активную версию задает файл-указатель models/CURRENT с именем версии. Он
+подменяется атомарно (os.replace), поэтому читатель всегда видит либо
+прежнюю, либо новую версию целиком. Если указателя нет, действует прежняя
+плоская раскладка: файлы модели прямо в models/.
+"""
+
+import os
+import shutil
+from datetime import datetime
+from pathlib import Path
+
+VERSIONS_DIRNAME = 'versions'
+CURRENT_FILENAME = 'CURRENT'
+
+MODEL_FILENAME = 'best_wine_model.pkl'
+SCALER_FILENAME = 'scaler.pkl'
+METADATA_FILENAME = 'model_metadata.json'
+COMPILED_DIRNAME = 'compiled_model'
+
+
+def version_dir(models_dir, version):
+    """Каталог версии"""
+    return Path(models_dir) / VERSIONS_DIRNAME / version
+
+
+def list_versions(models_dir):
+    """Опубликованные версии по возрастанию (имена упорядочены по времени)"""
+    versions_dir = Path(models_dir) / VERSIONS_DIRNAME
+    if not versions_dir.is_dir():
+        return []
+    return sorted(path.name for path in versions_dir.iterdir()
+                  if path.is_dir() and not path.name.startswith('.'))
+
+
+def current_version(models_dir):
+    """Имя активной версии или None, если указателя нет"""
+    try:
+        with open(Path(models_dir) / CURRENT_FILENAME) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def active_model_dir(models_dir):
+    """(версия, каталог файлов модели); для плоской раскладки версия None"""
+    version = current_version(models_dir)
+    if version is None:
+        return None, Path(models_dir)
+    return version, version_dir(models_dir, version)
+
+
+def set_current(models_dir, version):
+    """Атомарное переключение указателя на опубликованную версию"""
+    if not version_dir(models_dir, version).is_dir():
+        raise ValueError(f"Версия {version} не найдена")
+    pointer = Path(models_dir) / CURRENT_FILENAME
+    tmp_pointer = pointer.with_name(f"{CURRENT_FILENAME}.{os.getpid()}.tmp")
+    with open(tmp_pointer, 'w') as f:
+        f.write(version + '\n')
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_pointer, pointer)
+
+
+def create_version(models_dir):
+    """Новая версия: (имя, временный каталог для ее файлов)"""
+    versions_dir = Path(models_dir) / VERSIONS_DIRNAME
+    versions_dir.mkdir(parents=True, exist_ok=True)
+    base = datetime.now().strftime('%Y%m%d-%H%M%S')
+    version, suffix = base, 1
+    while (versions_dir / version).exists() or (versions_dir / f'.{version}.tmp').exists():
+        suffix += 1
+        version = f'{base}-{suffix}'
+    staging_dir = versions_dir / f'.{version}.tmp'
+    staging_dir.mkdir()
+    return version, staging_dir
+
+
+def publish_version(models_dir, version, activate=True):
+    """Публикация собранной версии и, по умолчанию, переключение на нее"""
+    staging_dir = Path(models_dir) / VERSIONS_DIRNAME / f'.{version}.tmp'
+    staging_dir.rename(version_dir(models_dir, version))
+    if activate:
+        set_current(models_dir, version)
+
+
+def discard_version(models_dir, version):
+    """Удаление несобранной версии"""
+    shutil.rmtree(Path(models_dir) / VERSIONS_DIRNAME / f'.{version}.tmp', ignore_errors=True)
@@ -0,0 +1,100 @@
+"""
+Снимок статистики датасета для эндпоинта /api/best-worst-wines
+
+Датасет после запуска сервиса не меняется, поэтому лучшее/худшее вино и
+сводная статистика считаются один раз, а ответ хранится уже сериализованным
+в JSON вместе с ETag. Снимок пересчитывается, только если изменились файлы
+данных (размер или время модификации).
+"""
+
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime
+
+import numpy as np
+
+from wine_quality import FEATURE_NAMES
+
+# Характеристики вина в ответе (тип вина выводится отдельно)
+CHARACTERISTICS = [name for name in FEATURE_NAMES if name != 'wine_type_red']
+
+
+def _wine_to_dict(columns, index):
+    """Описание одного вина из датасета"""
+    return {
+        'quality': int(columns['quality'][index]),
+        'wine_type': 'Красное' if columns['wine_type_red'][index] == 1 else 'Белое',
+        'characteristics': {name: float(columns[name][index]) for name in CHARACTERISTICS}
+    }
+
+
+def compute_best_worst(columns):
+    """Лучшее и худшее вино по качеству и сводная статистика датасета"""
+    quality = np.asarray(columns['quality'])
+    is_red = np.asarray(columns['wine_type_red']) == 1
+    red_count = int(np.count_nonzero(is_red))
+
+    return {
+        'best_wine': _wine_to_dict(columns, int(quality.argmax())),
+        'worst_wine': _wine_to_dict(columns, int(quality.argmin())),
+        'statistics': {
+            'min_quality': int(quality.min()),
+            'max_quality': int(quality.max()),
+            'avg_quality': float(quality.mean()),
+            'total_wines': int(len(quality)),
+            'red_wines': red_count,
+            'white_wines': int(len(quality)) - red_count
+        },
+        'timestamp': datetime.now().isoformat()
+    }
+
+
+class BestWorstSnapshot:
+    """Заранее сериализованный ответ /api/best-worst-wines с ETag
+
+    optional_paths - файлы данных, которых может еще не быть (дописываемые
+    образцы): их появление тоже пересчитывает снимок.
+    """
+
+    def __init__(self, source_paths, load_data, optional_paths=()):
+        self.source_paths = [str(path) for path in source_paths]
+        self.optional_paths = [str(path) for path in optional_paths]
+        self.load_data = load_data
+        self.signature = None
+        self.body = None
+        self.etag = None
+        self._lock = threading.Lock()
+
+    def _source_signature(self):
+        """Размер и время модификации файлов данных"""
+        signature = []
+        for path in self.source_paths:
+            stat = os.stat(path)
+            signature.append((path, stat.st_mtime_ns, stat.st_size))
+        for path in self.optional_paths:
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                signature.append((path, None, None))
+            else:
+                signature.append((path, stat.st_mtime_ns, stat.st_size))
+        return tuple(signature)
+
+    def _rebuild(self, signature):
+        """Пересчет статистики и сериализация ответа"""
+        payload = compute_best_worst(self.load_data())
+        body = json.dumps(payload, ensure_ascii=True, sort_keys=True, separators=(',', ':')).encode('utf-8')
+        self.body = body
+        self.etag = hashlib.sha1(body).hexdigest()
+        self.signature = signature
+
+    def get(self):
+        """Текущие тело ответа и ETag; при изменении файлов данных снимок пересчитывается"""
+        signature = self._source_signature()
+        if signature != self.signature:
+            with self._lock:
+                if signature != self.signature:
+                    self._rebuild(signature)
+        return self.body, self.etag
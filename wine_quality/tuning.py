@@ -0,0 +1,142 @@
+"""
+Многоуровневый (multi-fidelity) подбор гиперпараметров с сохранением исследования
+
+Конфигурация сначала оценивается кросс-валидацией на малом числе деревьев,
+затем число деревьев растет ступенями (MIN_TREES, x3, x9, ... до n_estimators
+конфигурации). После каждой ступени Optuna сравнивает результат с другими
+конфигурациями на той же ступени (successive halving) и останавливает
+неперспективные, поэтому полный бюджет деревьев получает лишь малая их часть.
+Модели с warm_start (RandomForest, GradientBoosting) на следующей ступени
+достраивают уже обученные деревья, а не обучаются заново.
+
+Исследование хранится в SQLite. Его имя зависит от данных, класса модели,
+пространства поиска и числа фолдов, поэтому повторный запуск на тех же данных
+продолжает исследование: уже завершенные испытания засчитываются в n_trials.
+
+optuna и scikit-learn импортируются внутри функций: модуль, как и весь пакет,
+импортируется без них.
+"""
+
+import hashlib
+import time
+from pathlib import Path
+
+import numpy as np
+
+from wine_quality.zoo import data_fingerprint
+
+# Число деревьев на первой ступени и множитель между ступенями
+MIN_TREES = 25
+REDUCTION_FACTOR = 3
+
+
+def fidelity_steps(n_estimators):
+    """Ступени числа деревьев для конфигурации: 25, 75, 225, ..., n_estimators"""
+    steps = []
+    trees = MIN_TREES
+    while trees < n_estimators:
+        steps.append(trees)
+        trees *= REDUCTION_FACTOR
+    steps.append(n_estimators)
+    return steps
+
+
+def _take(values, index):
+    """Строки DataFrame, Series или массива по позициям"""
+    return values.iloc[index] if hasattr(values, 'iloc') else values[index]
+
+
+def study_name(estimator, param_grid, X_train, y_train, cv):
+    """Имя исследования: данные, класс модели, пространство поиска и фолды"""
+    description = repr((
+        data_fingerprint(X_train, y_train), cv,
+        f'{type(estimator).__module__}.{type(estimator).__qualname__}',
+        sorted((name, list(choices)) for name, choices in param_grid.items()),
+    ))
+    return f'{type(estimator).__name__}-{hashlib.sha256(description.encode()).hexdigest()[:16]}'
+
+
+def tune_successive_halving(estimator, param_grid, X_train, y_train, n_trials=30, cv=3,
+                            storage_path=None, random_state=42, log=print):
+    """Подбор параметров estimator по сетке param_grid {параметр: варианты}
+
+    storage_path - файл SQLite для исследования; None - исследование в памяти.
+    Возвращает словарь: модель с лучшими параметрами, обученная на всей
+    обучающей выборке, лучшие параметры и CV score, число завершенных и
+    остановленных испытаний, число вызовов fit в этом запуске и время подбора.
+    """
+    import optuna
+    from sklearn.base import clone
+    from sklearn.metrics import accuracy_score
+    from sklearn.model_selection import StratifiedKFold
+
+    start = time.perf_counter()
+    optuna.logging.set_verbosity(optuna.logging.WARNING)
+
+    folds = list(StratifiedKFold(n_splits=cv).split(np.asarray(X_train), np.asarray(y_train)))
+    warm_start = 'warm_start' in estimator.get_params()
+
+    storage = None
+    if storage_path is not None:
+        Path(storage_path).parent.mkdir(parents=True, exist_ok=True)
+        storage = f'sqlite:///{Path(storage_path).resolve()}'
+    study = optuna.create_study(
+        study_name=study_name(estimator, param_grid, X_train, y_train, cv),
+        storage=storage,
+        load_if_exists=True,
+        direction='maximize',
+        sampler=optuna.samplers.TPESampler(seed=random_state),
+        pruner=optuna.pruners.SuccessiveHalvingPruner(
+            min_resource=MIN_TREES, reduction_factor=REDUCTION_FACTOR),
+    )
+
+    fits = 0
+
+    def objective(trial):
+        nonlocal fits
+        params = {name: trial.suggest_categorical(name, list(choices))
+                  for name, choices in param_grid.items()}
+        models = [clone(estimator).set_params(**params) for _ in folds]
+        steps = fidelity_steps(params['n_estimators']) if 'n_estimators' in params else [None]
+
+        for step in steps:
+            scores = []
+            for model, (train_index, test_index) in zip(models, folds):
+                if step is not None:
+                    model.set_params(n_estimators=step, **({'warm_start': True} if warm_start else {}))
+                model.fit(_take(X_train, train_index), _take(y_train, train_index))
+                fits += 1
+                scores.append(accuracy_score(_take(y_train, test_index),
+                                             model.predict(_take(X_train, test_index))))
+            score = float(np.mean(scores))
+            if step is not None and step != steps[-1]:
+                trial.report(score, step)
+                if trial.should_prune():
+                    raise optuna.TrialPruned()
+        return score
+
+    finished_states = (optuna.trial.TrialState.COMPLETE, optuna.trial.TrialState.PRUNED)
+    finished = len(study.get_trials(deepcopy=False, states=finished_states))
+    remaining = max(0, n_trials - finished)
+    if finished:
+        log(f"  Продолжаем исследование {study.study_name}: завершено испытаний {finished}, "
+            f"осталось {remaining}")
+    if remaining:
+        study.optimize(objective, n_trials=remaining)
+
+    trials = study.get_trials(deepcopy=False, states=finished_states)
+    complete = sum(trial.state == optuna.trial.TrialState.COMPLETE for trial in trials)
+
+    best_model = clone(estimator).set_params(**study.best_params)
+    best_model.fit(X_train, y_train)
+    fits += 1
+
+    return {
+        'model': best_model,
+        'best_params': study.best_params,
+        'best_score': study.best_value,
+        'complete_trials': complete,
+        'pruned_trials': len(trials) - complete,
+        'fits': fits,
+        'seconds': time.perf_counter() - start,
+    }
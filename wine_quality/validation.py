@@ -0,0 +1,223 @@
+"""
+Проверка входных образцов целым пакетом
+
+FeatureSchema проверяет наличие признаков, числовой тип, конечность и
+физическую правдоподобность значений. Отклоняются только невозможные входы:
+границы - min/max всего датасета (feature_ranges в model_metadata.json),
+расширенные на RANGE_MARGIN размахов и суженные до физической области
+признака (PHYSICAL_LIMITS: концентрации не отрицательны, pH от 0 до 14 и
+т.п.); признаки с двумя значениями (wine_type_red) принимают только их.
+Необычные, но возможные вина не отклоняются - их отмечает ood_score
+(wine_quality/drift.py).
+
+Пакет без ошибок проверяется без цикла по признакам в Python: строки
+извлекаются operator.itemgetter, типы всех значений проверяются одним
+множеством, а конечность и диапазоны - масками NumPy по всей матрице
+(несколько строк дешевле сравнить без NumPy). Разбор по отдельным полям
+выполняется только для строк с ошибками.
+Ошибка строки - словарь {'error': сообщение, 'fields': {признак: причина}}.
+"""
+
+import itertools
+import operator
+
+import numpy as np
+
+from wine_quality import FEATURE_NAMES
+
+# Расширение диапазона датасета в размахах: граница - заведомо невозможное значение
+RANGE_MARGIN = 10.0
+
+# Физическая область признаков; остальные признаки датасета - неотрицательные
+# концентрации, и их нижняя граница - ноль
+PHYSICAL_LIMITS = {
+    'density': (0.7, 1.5),
+    'pH': (0.0, 14.0),
+    'alcohol': (0.0, 100.0),
+}
+
+# Признаки с не более чем столькими значениями считаются категориальными
+MAX_CATEGORICAL_VALUES = 2
+
+# Числа JSON; bool в Python - подкласс int, но признаком не считается
+NUMERIC_TYPES = frozenset((int, float))
+
+# Пакеты до стольких строк проверяются сравнениями Python: накладные расходы
+# масок NumPy больше самой проверки одного образца
+SCALAR_MAX_ROWS = 8
+
+# Границы признака без диапазона: отсекают только NaN и бесконечности
+FLOAT_MAX = float(np.finfo(np.float64).max)
+
+
+def feature_ranges(columns, to_name=None):
+    """Диапазоны признаков датасета для model_metadata.json
+
+    columns - отображение имя -> значения (например, DataFrame), to_name -
+    перевод имени столбца в имя признака API.
+    """
+    ranges = {}
+    for column, values in columns.items():
+        values = np.asarray(values, dtype=np.float64)
+        entry = {'min': float(values.min()), 'max': float(values.max())}
+        unique = np.unique(values)
+        if len(unique) <= MAX_CATEGORICAL_VALUES:
+            entry['values'] = unique.tolist()
+        ranges[to_name(column) if to_name else column] = entry
+    return ranges
+
+
+def _to_float(value):
+    """Число в float; целое за пределами float64 - NaN"""
+    try:
+        return float(value)
+    except OverflowError:
+        return np.nan
+
+
+class FeatureSchema:
+    """Допустимые значения признаков модели в порядке FEATURE_NAMES
+
+    ranges - feature_ranges датасета; без них проверяются только наличие, тип
+    и конечность.
+    """
+
+    def __init__(self, ranges=None, margin=RANGE_MARGIN, names=FEATURE_NAMES, limits=PHYSICAL_LIMITS):
+        self.names = list(names)
+        self._getter = operator.itemgetter(*self.names)
+        self.low = np.full(len(self.names), -FLOAT_MAX)
+        self.high = np.full(len(self.names), FLOAT_MAX)
+        self.categories = {}
+        self.ranged = []
+
+        for j, name in enumerate(self.names):
+            entry = (ranges or {}).get(name)
+            if entry is None:
+                continue
+            if 'values' in entry:
+                self.categories[j] = np.array(entry['values'], dtype=np.float64)
+            span = entry['max'] - entry['min']
+            self.low[j] = entry['min'] - margin * span
+            self.high[j] = entry['max'] + margin * span
+            if entry['min'] >= 0:
+                self.low[j] = max(self.low[j], 0.0)
+            if name in limits:
+                self.low[j] = max(self.low[j], limits[name][0])
+                self.high[j] = min(self.high[j], limits[name][1])
+            self.ranged.append(j)
+
+        # Те же границы для проверки отдельных строк без NumPy
+        self._bounds = list(zip(self.low.tolist(), self.high.tolist()))
+        self._allowed = [(j, frozenset(values.tolist())) for j, values in self.categories.items()]
+
+    def describe(self):
+        """Допустимые значения для /api/features"""
+        result = {}
+        for j, name in enumerate(self.names):
+            if j in self.categories:
+                result[name] = {'values': self.categories[j].tolist()}
+            elif j in self.ranged:
+                result[name] = {'min': float(self.low[j]), 'max': float(self.high[j])}
+        return result
+
+    def value_mask(self, features):
+        """Поэлементная маска конечных значений в допустимых границах"""
+        # NaN не проходит сравнения, бесконечности - границы
+        valid = features >= self.low
+        valid &= features <= self.high
+        # Категории сравниваются напрямую: np.isin для пары значений заметно дороже
+        for j, values in self.categories.items():
+            column = features[:, j]
+            allowed = column == values[0]
+            for value in values[1:]:
+                allowed |= column == value
+            valid[:, j] &= allowed
+        return valid
+
+    def row_mask(self, features):
+        """Строки матрицы (n, 12), все значения которых конечны и правдоподобны"""
+        return self.value_mask(features).all(axis=1)
+
+    def row_valid(self, row):
+        """Проверка одной строки (список float) без NumPy"""
+        for value, (low, high) in zip(row, self._bounds):
+            if not low <= value <= high:
+                return False
+        return all(row[j] in values for j, values in self._allowed)
+
+    def value_errors(self, features, rows):
+        """Причины по полям для строк матрицы с номерами rows (только некорректные)"""
+        features = features[rows]
+        finite = np.isfinite(features)
+        valid = self.value_mask(features)
+
+        errors = {}
+        for k, j in zip(*np.nonzero(~valid)):
+            name = self.names[j]
+            if not finite[k, j]:
+                reason = 'должно быть конечным числом'
+            elif j in self.categories:
+                reason = f'допустимые значения: {self.categories[j].tolist()}'
+            else:
+                reason = f'вне допустимого диапазона [{self.low[j]:g}, {self.high[j]:g}]'
+            errors.setdefault(int(rows[k]), {})[name] = reason
+        return errors
+
+    def validate(self, samples):
+        """Проверка пакета образцов (список словарей)
+
+        Возвращает матрицу float64 только для корректных образцов, список их
+        индексов и словарь ошибок {индекс: {'error': ..., 'fields': {...}}}.
+        """
+        features, errors = self._extract(samples)
+        if not errors and len(features) <= SCALAR_MAX_ROWS:
+            if all(map(self.row_valid, features.tolist())):
+                return features, list(range(len(samples))), {}
+        valid = self.row_mask(features)
+        if errors:
+            valid[list(errors)] = False
+        if valid.all():
+            return features, list(range(len(samples))), {}
+
+        for i, fields in self.value_errors(features, np.flatnonzero(~valid)).items():
+            if i not in errors:
+                errors[i] = {'error': f'Некорректные значения признаков: {list(fields)}', 'fields': fields}
+        return features[valid], np.flatnonzero(valid).tolist(), errors
+
+    def _extract(self, samples):
+        """Матрица признаков пакета и ошибки наличия и типа
+
+        В строках с такими ошибками матрица содержит NaN.
+        """
+        try:
+            rows = list(map(self._getter, samples))
+            if set(map(type, itertools.chain.from_iterable(rows))) <= NUMERIC_TYPES:
+                features = np.array(rows, dtype=np.float64).reshape(len(rows), len(self.names))
+                return features, {}
+        except (TypeError, KeyError, OverflowError):
+            pass
+
+        # Есть ошибки наличия или типа: разбираем пакет по строкам
+        features = np.full((len(samples), len(self.names)), np.nan)
+        errors = {}
+        for i, sample in enumerate(samples):
+            if not isinstance(sample, dict):
+                errors[i] = {'error': 'Образец должен быть объектом с признаками'}
+                continue
+            missing = [name for name in self.names if name not in sample]
+            if missing:
+                errors[i] = {'error': f'Отсутствуют признаки: {missing}',
+                             'fields': dict.fromkeys(missing, 'отсутствует')}
+                continue
+            values = [sample[name] for name in self.names]
+            wrong_type = {name: 'ожидается число' for name, value in zip(self.names, values)
+                          if type(value) not in NUMERIC_TYPES}
+            if wrong_type:
+                errors[i] = {'error': f'Некорректные значения признаков: {list(wrong_type)}', 'fields': wrong_type}
+                continue
+            try:
+                features[i] = values
+            except OverflowError:
+                # Целое за пределами float64 остается NaN и отсекается как неконечное
+                features[i] = [_to_float(value) for value in values]
+        return features, errors
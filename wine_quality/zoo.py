@@ -0,0 +1,297 @@
+"""
+Параллельное обучение набора моделей-кандидатов с кэшем результатов
+
+Для каждого кандидата создаются независимые задачи: обучение на всей
+обучающей выборке с оценкой на валидационной и по одной задаче на каждый фолд
+кросс-валидации. Все задачи всех кандидатов выполняются одновременно в
+отдельных процессах (по умолчанию по числу ядер), внутри задачи модель
+обучается в один поток, чтобы процессы не делили ядра.
+
+У кандидата может быть бюджет времени: задача кандидата, работающая дольше
+бюджета, принудительно завершается, а кандидат снимается вместе с остальными
+задачами.
+
+Результат кандидата сохраняется в кэш по ключу из хэша данных, класса и
+параметров модели и версии библиотеки, поэтому при повторном запуске
+неизмененные кандидаты не обучаются заново.
+
+scikit-learn и joblib импортируются внутри функций: модуль, как и весь пакет,
+импортируется без них.
+"""
+
+import hashlib
+import importlib
+import multiprocessing
+import os
+import time
+from collections import deque
+from multiprocessing.connection import wait
+from pathlib import Path
+
+import numpy as np
+
+from wine_quality.profiling import fits_per_fit, peak_rss_mb
+
+# Параметры, не влияющие на результат обучения и не входящие в ключ кэша
+NON_RESULT_PARAMS = ('n_jobs', 'verbose', 'verbosity', 'silent')
+
+
+def _process_context():
+    """fork, где он доступен: данные наследуются процессами без сериализации"""
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context('fork' if 'fork' in methods else None)
+
+
+def _as_array(values):
+    """Данные (DataFrame, Series или массив) как непрерывный массив NumPy"""
+    return np.ascontiguousarray(np.asarray(values))
+
+
+def data_fingerprint(*datasets):
+    """Хэш содержимого выборок и имен признаков первой из них"""
+    digest = hashlib.sha256()
+    for values in datasets:
+        array = _as_array(values)
+        digest.update(str((array.dtype.str, array.shape)).encode())
+        digest.update(array.tobytes())
+    digest.update(repr(list(getattr(datasets[0], 'columns', []))).encode())
+    return digest.hexdigest()
+
+
+def candidate_key(estimator, data_hash, cv):
+    """Ключ кэша кандидата: данные, класс, параметры модели и версия библиотеки"""
+    params = {
+        name: value for name, value in estimator.get_params(deep=True).items()
+        if name not in NON_RESULT_PARAMS
+    }
+    library = type(estimator).__module__.split('.')[0]
+    version = getattr(importlib.import_module(library), '__version__', '')
+    description = repr((
+        data_hash, cv, f'{type(estimator).__module__}.{type(estimator).__qualname__}',
+        library, version, sorted(params.items()),
+    ))
+    return hashlib.sha256(description.encode()).hexdigest()
+
+
+def _single_threaded(estimator):
+    """Копия модели с обучением в один поток"""
+    from sklearn.base import clone
+
+    estimator = clone(estimator)
+    if 'n_jobs' in estimator.get_params():
+        estimator.set_params(n_jobs=1)
+    return estimator
+
+
+def _run_task(conn, task, estimator, X_train, y_train, X_val, y_val):
+    """Тело процесса-задачи: обучение и оценка, результат отправляется в conn"""
+    from sklearn.metrics import accuracy_score
+
+    try:
+        # BLAS/OpenMP внутри процесса тоже в один поток
+        try:
+            from threadpoolctl import threadpool_limits
+            threadpool_limits(1)
+        except ImportError:
+            pass
+
+        start = time.perf_counter()
+        cpu_start = time.process_time()
+        kind, _, train_index, test_index = task
+        if kind == 'full':
+            estimator.fit(X_train, y_train)
+            payload = {
+                'model': estimator,
+                'train_accuracy': accuracy_score(y_train, estimator.predict(X_train)),
+                'val_accuracy': accuracy_score(y_val, estimator.predict(X_val)),
+            }
+        else:
+            X_fold = X_train.iloc[train_index] if hasattr(X_train, 'iloc') else X_train[train_index]
+            y_fold = y_train.iloc[train_index] if hasattr(y_train, 'iloc') else y_train[train_index]
+            X_test = X_train.iloc[test_index] if hasattr(X_train, 'iloc') else X_train[test_index]
+            y_test = y_train.iloc[test_index] if hasattr(y_train, 'iloc') else y_train[test_index]
+            estimator.fit(X_fold, y_fold)
+            payload = {'score': accuracy_score(y_test, estimator.predict(X_test))}
+        payload['seconds'] = time.perf_counter() - start
+        payload['cpu_seconds'] = time.process_time() - cpu_start
+        payload['peak_rss_mb'] = peak_rss_mb()
+        conn.send(('ok', payload))
+    except Exception as e:
+        conn.send(('error', f'{type(e).__name__}: {e}'))
+    finally:
+        conn.close()
+
+
+class _CandidateState:
+    """Ход обучения одного кандидата"""
+
+    def __init__(self, name, estimator, key, n_folds):
+        self.name = name
+        self.estimator = estimator
+        self.key = key
+        self.full = None
+        self.fold_scores = [None] * n_folds
+        self.error = None
+        self.seconds = 0.0
+        self.cpu_seconds = 0.0
+        self.peak_rss_mb = None
+
+    @property
+    def done(self):
+        return self.error is None and self.full is not None and all(
+            score is not None for score in self.fold_scores)
+
+
+def _cache_path(cache_dir, key):
+    return Path(cache_dir) / f'{key}.joblib'
+
+
+def _load_cached(cache_dir, key):
+    """Результат кандидата из кэша или None"""
+    import joblib
+
+    if cache_dir is None or not _cache_path(cache_dir, key).exists():
+        return None
+    try:
+        return joblib.load(_cache_path(cache_dir, key))
+    except Exception:
+        return None
+
+
+def _store_cached(cache_dir, key, result):
+    """Атомарная запись результата кандидата в кэш"""
+    import joblib
+
+    if cache_dir is None:
+        return
+    Path(cache_dir).mkdir(parents=True, exist_ok=True)
+    path = _cache_path(cache_dir, key)
+    tmp_path = path.with_name(f'{path.name}.{os.getpid()}.tmp')
+    joblib.dump(result, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def train_candidates(candidates, X_train, y_train, X_val, y_val, cv=3,
+                     max_workers=None, budgets=None, cache_dir=None, log=print):
+    """Параллельное обучение кандидатов {имя: модель}
+
+    budgets - {имя: секунды} или число для всех кандидатов; None - без лимита.
+    Возвращает {имя: результат} в порядке candidates только для успешно
+    обученных кандидатов. Результат содержит обученную модель, точность на
+    обучающей и валидационной выборках, среднее и разброс точности на фолдах,
+    время и процессорное время обучения, пиковый RSS процессов-задач, число
+    обучений модели и признак from_cache.
+    """
+    from sklearn.model_selection import StratifiedKFold
+
+    max_workers = max_workers or os.cpu_count() or 1
+    if not isinstance(budgets, dict):
+        budgets = dict.fromkeys(candidates, budgets)
+
+    # Те же фолды, что у cross_val_score(cv=3) для классификатора
+    folds = list(StratifiedKFold(n_splits=cv).split(_as_array(X_train), _as_array(y_train)))
+    data_hash = data_fingerprint(X_train, y_train, X_val, y_val)
+
+    states = {}
+    results = {}
+    pending = deque()
+    for name, estimator in candidates.items():
+        key = candidate_key(estimator, data_hash, cv)
+        cached = _load_cached(cache_dir, key)
+        if cached is not None:
+            results[name] = {**cached, 'from_cache': True}
+            log(f"  {name}: взят из кэша (Val Accuracy: {cached['val_accuracy']:.4f})")
+            continue
+        states[name] = _CandidateState(name, estimator, key, len(folds))
+        pending.append((name, ('full', None, None, None)))
+        pending.extend((name, ('fold', i, train, test)) for i, (train, test) in enumerate(folds))
+
+    context = _process_context()
+    running = {}
+
+    def stop_candidate(name, message):
+        state = states[name]
+        if state.error is None:
+            state.error = message
+            log(f"    Ошибка при обучении {name}: {message}")
+        for conn, (task_name, _, process, _) in list(running.items()):
+            if task_name == name:
+                process.terminate()
+                process.join()
+                conn.close()
+                del running[conn]
+
+    while pending or running:
+        while pending and len(running) < max_workers:
+            name, task = pending.popleft()
+            if states[name].error is not None:
+                continue
+            receiver, sender = context.Pipe(duplex=False)
+            process = context.Process(
+                target=_run_task, daemon=True,
+                args=(sender, task, _single_threaded(states[name].estimator), X_train, y_train, X_val, y_val),
+            )
+            process.start()
+            sender.close()
+            budget = budgets.get(name)
+            deadline = time.monotonic() + budget if budget else None
+            running[receiver] = (name, task, process, deadline)
+
+        if not running:
+            # В очереди были только задачи снятых кандидатов
+            continue
+
+        deadlines = [deadline for _, _, _, deadline in running.values() if deadline is not None]
+        timeout = max(0.0, min(deadlines) - time.monotonic()) if deadlines else None
+        for conn in wait(list(running), timeout):
+            if conn not in running:
+                continue
+            name, task, process, _ = running.pop(conn)
+            try:
+                status, payload = conn.recv()
+            except EOFError:
+                status, payload = 'error', f'процесс завершился с кодом {process.exitcode}'
+            process.join()
+            conn.close()
+
+            state = states[name]
+            if status != 'ok':
+                stop_candidate(name, payload)
+                continue
+            state.seconds += payload['seconds']
+            state.cpu_seconds += payload['cpu_seconds']
+            if payload['peak_rss_mb'] is not None:
+                state.peak_rss_mb = max(state.peak_rss_mb or 0.0, payload['peak_rss_mb'])
+            if task[0] == 'full':
+                state.full = payload
+            else:
+                state.fold_scores[task[1]] = payload['score']
+
+            if state.done:
+                cv_scores = np.array(state.fold_scores)
+                model = state.full['model']
+                # Возвращаем исходное число потоков для предсказаний и тюнинга
+                if 'n_jobs' in model.get_params():
+                    model.set_params(n_jobs=state.estimator.get_params()['n_jobs'])
+                result = {
+                    'model': model,
+                    'train_accuracy': state.full['train_accuracy'],
+                    'val_accuracy': state.full['val_accuracy'],
+                    'cv_mean': cv_scores.mean(),
+                    'cv_std': cv_scores.std(),
+                    'fit_seconds': state.seconds,
+                    'cpu_seconds': state.cpu_seconds,
+                    'peak_rss_mb': state.peak_rss_mb,
+                    'fits': (1 + len(folds)) * fits_per_fit(state.estimator),
+                }
+                _store_cached(cache_dir, state.key, result)
+                results[name] = {**result, 'from_cache': False}
+                log(f"  {name}: Val Accuracy: {result['val_accuracy']:.4f} "
+                    f"(CV: {result['cv_mean']:.4f}±{result['cv_std']:.4f}), обучение {state.seconds:.1f} с")
+
+        now = time.monotonic()
+        for name, _, _, deadline in list(running.values()):
+            if deadline is not None and now >= deadline:
+                stop_candidate(name, f'превышен бюджет времени {budgets[name]} с')
+
+    return {name: results[name] for name in candidates if name in results}